@@ -0,0 +1,132 @@
+"""
+author: deadc0de6 (https://github.com/deadc0de6)
+Copyright (c) 2024, deadc0de6
+
+Benchmark catalog saving and loading (time, peak memory
+and compression trade-offs)
+
+Usage:
+    python3 -m benchmarks.bench_catalog [<depth>] [<fanout>] [<files>]
+"""
+
+import os
+import sys
+import time
+import tempfile
+import tracemalloc
+from typing import Callable, Dict, Any
+
+from anytree.exporter import JsonExporter, DictExporter
+from anytree.importer import JsonImporter, DictImporter
+
+# local imports
+from catcli.catalog import Catalog, attriter, back_attriter
+from catcli import compress
+from catcli.nodes import NodeTop
+from benchmarks.synthetic import make_tree
+
+
+def save_legacy(top: NodeTop, path: str) -> None:
+    """the previous in-memory DictExporter based saver"""
+    dexporter = DictExporter(attriter=attriter)
+    exp = JsonExporter(dictexporter=dexporter, indent=2, sort_keys=True)
+    with open(path, 'w', encoding='UTF-8') as file:
+        exp.write(top, file)
+
+
+def load_legacy(path: str) -> None:
+    """the previous read-all then import loader"""
+    with open(path, 'r', encoding='UTF-8') as file:
+        content = file.read()
+    imp = JsonImporter(dictimporter=_LegacyDictImporter())
+    imp.import_(content)
+
+
+class _LegacyDictImporter(DictImporter):  # type: ignore
+    """dict importer renaming attributes"""
+
+    def import_(self, data: Dict[str, Any]) -> Any:
+        """rename attributes then import"""
+        return super().import_(_rename(data))
+
+
+def _rename(data: Dict[str, Any]) -> Dict[str, Any]:
+    """recursively apply back_attriter"""
+    data = back_attriter(data)
+    if 'children' in data:
+        data['children'] = [_rename(x) for x in data['children']]
+    return data
+
+
+def measure(title: str, func: Callable[[], None], path: str) -> None:
+    """print duration, peak memory and file size"""
+    tracemalloc.start()
+    start = time.perf_counter()
+    func()
+    diff = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    size = os.path.getsize(path)
+    print(f'{title:24} {diff:8.3f}s peak:{peak / 1024**2:10.2f}MiB '
+          f'size:{size / 1024**2:10.1f}MiB')
+
+
+def bench_compression(top: NodeTop, tmpdir: str) -> None:
+    """compare load/save time and size for each compression"""
+    for compression in compress.COMPRESSIONS:
+        levels = [None]
+        if compression != compress.NONE:
+            levels = [1, compress.LEVELS[compression], 9]
+        for level in sorted(set(levels), key=lambda x: x or 0):
+            path = os.path.join(tmpdir, f'catalog-{compression}-{level}')
+            catalog = Catalog(path, force=True, compression=compression,
+                              level=level)
+            start = time.perf_counter()
+            catalog.save(top)
+            tsave = time.perf_counter() - start
+            start = time.perf_counter()
+            Catalog(path).restore()
+            tload = time.perf_counter() - start
+            size = os.path.getsize(path)
+            title = f'{compression}' + (f':{level}' if level else '')
+            print(f'{title:24} save:{tsave:8.3f}s load:{tload:8.3f}s '
+                  f'size:{size / 1024**2:10.2f}MiB')
+
+
+def bench_snapshot(top: NodeTop, tmpdir: str) -> None:
+    """compare json parsing with the snapshot cache"""
+    path = os.path.join(tmpdir, 'catalog-snapshot')
+    os.environ['XDG_CACHE_HOME'] = os.path.join(tmpdir, 'cache')
+    catalog = Catalog(path, force=True, cache=True)
+    start = time.perf_counter()
+    catalog.save(top)
+    tsave = time.perf_counter() - start
+    start = time.perf_counter()
+    Catalog(path).restore()
+    tjson = time.perf_counter() - start
+    start = time.perf_counter()
+    Catalog(path, cache=True).restore()
+    tsnap = time.perf_counter() - start
+    print(f'{"snapshot":24} save:{tsave:8.3f}s load:{tsnap:8.3f}s '
+          f'(json load:{tjson:8.3f}s)')
+
+
+def main() -> None:
+    """entry point"""
+    args = [int(x) for x in sys.argv[1:]]
+    depth, fanout, files = (args + [4, 6, 20][len(args):])[:3]
+    top, cnt = make_tree(depth=depth, fanout=fanout, files=files)
+    print(f'synthetic catalog with {cnt} nodes')
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = os.path.join(tmpdir, 'catalog')
+        measure('save (legacy)', lambda: save_legacy(top, path), path)
+        catalog = Catalog(path, force=True)
+        measure('save', lambda: catalog.save(top), path)
+        measure('load (legacy)', lambda: load_legacy(path), path)
+        measure('load', catalog.restore, path)
+        bench_snapshot(top, tmpdir)
+        bench_compression(top, tmpdir)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+"""
+author: deadc0de6 (https://github.com/deadc0de6)
+Copyright (c) 2024, deadc0de6
+
+Microbenchmarks for name sanitizing
+
+Usage:
+    python3 -m benchmarks.bench_names [<depth>] [<fanout>] [<files>]
+"""
+
+import sys
+import time
+import string
+from functools import partial
+from typing import Callable, List
+
+import anytree
+
+# local imports
+from catcli.utils import fix_badchars
+from catcli.nodes import typcast_node
+from benchmarks.synthetic import make_tree
+
+
+def fix_badchars_legacy(data: str) -> str:
+    """the previous generator based implementation"""
+    data = "".join(x for x in data if x in string.printable)
+    return data.encode("utf-8", "ignore").decode("utf-8")
+
+
+def _timeit(title: str, func: Callable[[], None], cnt: int) -> None:
+    """time func and print calls per second"""
+    start = time.perf_counter()
+    func()
+    diff = time.perf_counter() - start
+    rate = cnt / diff if diff else 0
+    print(f'{title:32} {diff:8.3f}s {rate:12.0f} calls/s')
+
+
+def _sanitize_all(func: Callable[[str], str], names: List[str]) -> None:
+    """sanitize all names"""
+    for name in names:
+        func(name)
+
+
+def bench_sanitize(names: List[str]) -> None:
+    """compare both sanitizers on the names"""
+    _timeit('fix_badchars (legacy)',
+            partial(_sanitize_all, fix_badchars_legacy, names), len(names))
+    _timeit('fix_badchars',
+            partial(_sanitize_all, fix_badchars, names), len(names))
+
+
+def main() -> None:
+    """entry point"""
+    args = [int(x) for x in sys.argv[1:]]
+    depth, fanout, files = (args + [4, 6, 20][len(args):])[:3]
+    top, cnt = make_tree(depth=depth, fanout=fanout, files=files)
+    print(f'synthetic catalog with {cnt} nodes')
+    allnodes = list(anytree.PreOrderIter(top))
+    for node in allnodes:
+        typcast_node(node)
+
+    ascii_names = [x.name for x in allnodes]
+    bench_sanitize(ascii_names)
+    utf8_names = [f'{x}-été\t' for x in ascii_names]
+    bench_sanitize(utf8_names)
+
+    _timeit('get_name (first call)',
+            lambda: [x.get_name() for x in allnodes], cnt)
+    _timeit('get_name (cached)',
+            lambda: [x.get_name() for x in allnodes], cnt)
+    _timeit('get_fullpath',
+            lambda: [x.get_fullpath() for x in allnodes], cnt)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+"""
+author: deadc0de6 (https://github.com/deadc0de6)
+Copyright (c) 2024, deadc0de6
+
+Benchmark the output throughput of tree, ls -r and find
+
+Usage:
+    python3 -m benchmarks.bench_output [<depth>] [<fanout>] [<files>]
+"""
+
+import os
+import sys
+import time
+from typing import Callable
+
+# local imports
+from catcli.colors import Colors
+from catcli.noder import Noder
+from catcli.nodes import NodeTop
+from catcli.nodes_utils import path_to_search_all
+from benchmarks.synthetic import make_tree
+
+
+def _run(func: Callable[[], None]) -> float:
+    """run func with stdout redirected to /dev/null, return duration"""
+    ori = sys.stdout
+    with open(os.devnull, 'w', encoding='utf-8') as devnull:
+        sys.stdout = devnull
+        start = time.perf_counter()
+        try:
+            func()
+        finally:
+            sys.stdout = ori
+    diff = time.perf_counter() - start
+    return diff
+
+
+def bench(top: NodeTop, color: bool) -> None:
+    """bench all commands"""
+    noder = Noder()
+    cmds = {
+        'tree': lambda: noder.print_tree(top),
+        'ls -r': lambda: noder.list(top, path_to_search_all(''), rec=True),
+        'find': lambda: noder.find(top, ''),
+    }
+    for name, func in cmds.items():
+        before = noder.out.count
+        diff = _run(func)
+        lines = noder.out.count - before
+        rate = lines / diff if diff else 0
+        mode = 'color' if color else 'no-color'
+        print(f'{name:8} {mode:9} {lines:10} lines '
+              f'{diff:8.3f}s {rate:12.0f} lines/s')
+
+
+def main() -> None:
+    """entry point"""
+    args = [int(x) for x in sys.argv[1:]]
+    depth, fanout, files = (args + [4, 6, 20][len(args):])[:3]
+    top, cnt = make_tree(depth=depth, fanout=fanout, files=files)
+    print(f'synthetic catalog with {cnt} nodes')
+    bench(top, True)
+    Colors.no_color()
+    bench(top, False)
+
+
+if __name__ == '__main__':
+    main()
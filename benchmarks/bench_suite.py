@@ -0,0 +1,204 @@
+"""
+author: deadc0de6 (https://github.com/deadc0de6)
+Copyright (c) 2024, deadc0de6
+
+Benchmark suite timing the main catcli operations
+on a synthetic catalog, results can be saved as json
+to be compared across versions
+
+Usage:
+    bench_suite.py [--depth=<n>] [--fanout=<n>] [--files=<n>]
+                   [--total=<n>] [--archives=<ratio>] [--skip=<ops>]
+                   [--lookups=<n>] [--output=<path>] [--no-memory]
+    bench_suite.py --help
+
+Options:
+    --depth=<n>         Directory depth [default: 3].
+    --fanout=<n>        Sub-directories per directory [default: 5].
+    --files=<n>         Files per directory [default: 20].
+    --total=<n>         Total number of files, overrides --files [default: 0].
+    --archives=<ratio>  Ratio of files being archives [default: 0].
+    --skip=<ops>        Comma separated operations to skip [default: ].
+    --lookups=<n>       Number of fuse lookups [default: 1000].
+    --output=<path>     Save the results as json to path.
+    --no-memory         Do not trace the memory (faster timings).
+    -h --help           Show this screen.
+
+Run with `python3 -m benchmarks.bench_suite`, the on disk
+operations (index, update) are better skipped with a large --total.
+"""
+
+import os
+import sys
+import json
+import time
+import platform
+import tempfile
+import tracemalloc
+from typing import Callable, Dict, Any, List, Optional
+
+from docopt import docopt
+
+# local imports
+from catcli.version import __version__ as VERSION
+from catcli.catalog import Catalog
+from catcli.noder import Noder
+from catcli.walker import Walker
+from catcli.nodes import NodeTop, NodeAny
+from catcli.nodes_utils import path_to_search_all
+from benchmarks.synthetic import make_tree, make_fs, files_for_total
+
+
+OPERATIONS = ['index', 'update', 'save', 'restore', 'restore-snapshot',
+              'find', 'ls', 'ls -r', 'du', 'fixsizes', 'fuse']
+
+
+class Suite:
+    """run and record the benchmarks"""
+
+    def __init__(self, memory: bool = True,
+                 skip: Optional[List[str]] = None) -> None:
+        """
+        @memory: record the peak memory of each operation
+        @skip: operations not to run
+        """
+        self.memory = memory
+        self.skip = skip or []
+        self.results: Dict[str, Dict[str, Any]] = {}
+
+    def run(self, name: str, func: Callable[[], Any]) -> Any:
+        """time an operation and record its result"""
+        if name in self.skip:
+            return None
+        if self.memory:
+            tracemalloc.start()
+        start = time.perf_counter()
+        ret = func()
+        diff = time.perf_counter() - start
+        peak = None
+        if self.memory:
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+        self.results[name] = {'time': diff, 'peak': peak}
+        line = f'{name:18} {diff:10.3f}s'
+        if peak is not None:
+            line += f' peak:{peak / 1024**2:10.2f}MiB'
+        print(line)
+        return ret
+
+
+def bench_fs(suite: Suite, params: Dict[str, Any], tmpdir: str) -> None:
+    """index and update a synthetic tree on disk"""
+    if 'index' in suite.skip and 'update' in suite.skip:
+        return
+    path = os.path.join(tmpdir, 'fs')
+    created = make_fs(path, **params)
+    noder = Noder(arc=params['archives'] > 0)
+    top = noder.new_top_node()
+    walker = Walker(noder, usehash=False, progress=False)
+
+    def index() -> None:
+        storage = noder.new_storage_node('fs', path, top, '')
+        walker.index(path, storage, 'fs')
+
+    suite.run('index', index)
+    if 'index' in suite.skip:
+        return
+    # change one file out of a hundred
+    for fpath in created[::100]:
+        with open(fpath, 'ab') as file:
+            file.write(b'changed')
+    suite.run('update', lambda: walker.reindex(path, top.children[0], top))
+
+
+def fuse_lookups(filesystem: Any, top: NodeTop, cnt: int) -> None:
+    """getattr and readdir a sample of the tree as a fuse mount does"""
+    nodes: List[NodeAny] = []
+    for storage in top.children:
+        nodes.extend(storage.descendants)
+    step = max(1, len(nodes) // cnt)
+    for node in nodes[::step][:cnt]:
+        path = os.sep + node.get_fullpath()
+        filesystem.getattr(path)
+        if node.children:
+            filesystem.readdir(path, None)
+
+
+def bench_catalog(suite: Suite, params: Dict[str, Any],
+                  lookups: int, tmpdir: str) -> int:
+    """
+    catalog and commands on a synthetic in-memory tree
+    returns the number of nodes
+    """
+    top, cnt = make_tree(**params)
+    print(f'synthetic catalog with {cnt} nodes')
+    path = os.path.join(tmpdir, 'catalog')
+    os.environ['XDG_CACHE_HOME'] = os.path.join(tmpdir, 'cache')
+    suite.run('save', lambda: Catalog(path, force=True,
+                                      cache=True).save(top))
+    suite.run('restore', lambda: Catalog(path).restore())
+    suite.run('restore-snapshot', lambda: Catalog(path, cache=True).restore())
+
+    noder = Noder()
+    with open(os.devnull, 'w', encoding='utf-8') as devnull:
+        noder.out.stream = devnull
+        suite.run('find', lambda: noder.find(top, 'file00001'))
+        suite.run('ls', lambda: noder.list(
+            top, path_to_search_all('storage0/dir000'), rec=False))
+        suite.run('ls -r', lambda: noder.list(
+            top, path_to_search_all(''), rec=True))
+        suite.run('du', lambda: noder.diskusage(top, 'storage0'))
+        suite.run('fixsizes', lambda: noder.fixsizes(top))
+        try:
+            # pylint: disable=C0415
+            from catcli.fuser import CatcliFilesystem
+            filesystem = CatcliFilesystem(top, noder)
+            suite.run('fuse', lambda: fuse_lookups(filesystem, top, lookups))
+        except (ImportError, OSError):
+            print('fuse not available, skipping fuse lookups')
+    return cnt
+
+
+def main() -> None:
+    """entry point"""
+    args = docopt(__doc__)
+    depth = int(args['--depth'])
+    fanout = int(args['--fanout'])
+    files = int(args['--files'])
+    total = int(args['--total'])
+    if total:
+        files = files_for_total(total, depth, fanout)
+    params = {
+        'depth': depth,
+        'fanout': fanout,
+        'files': files,
+        'archives': float(args['--archives']),
+    }
+    skip = [x.strip() for x in args['--skip'].split(',') if x.strip()]
+    bad = [x for x in skip if x not in OPERATIONS]
+    if bad:
+        print(f'unknown operation(s): {bad}, choose from {OPERATIONS}')
+        sys.exit(1)
+    suite = Suite(memory=not args['--no-memory'], skip=skip)
+    with tempfile.TemporaryDirectory() as tmpdir:
+        cnt = bench_catalog(suite, params, int(args['--lookups']), tmpdir)
+        bench_fs(suite, params, tmpdir)
+
+    if args['--output']:
+        report = {
+            'version': VERSION,
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'date': int(time.time()),
+            'params': params,
+            'nodes': cnt,
+            'memory': suite.memory,
+            'results': suite.results,
+        }
+        with open(args['--output'], 'w', encoding='utf-8') as file:
+            json.dump(report, file, indent=2, sort_keys=True)
+        print(f'results saved to {args["--output"]}')
+
+
+if __name__ == '__main__':
+    main()
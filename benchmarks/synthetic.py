@@ -0,0 +1,164 @@
+"""
+author: deadc0de6 (https://github.com/deadc0de6)
+Copyright (c) 2024, deadc0de6
+
+Synthetic catalog trees for benchmarking
+
+The generated trees are deterministic, the same
+parameters always produce the same catalog
+"""
+
+import io
+import os
+import tarfile
+from typing import Tuple, List
+
+# local imports
+from catcli.noder import Noder
+from catcli.nodes import NodeTop, NodeDir, NodeFile, NodeStorage, \
+    NodeArchived, NodeAny
+
+
+# fixed timestamp for reproducible trees
+EPOCH = 1700000000
+# members of each synthetic archive
+ARCMEMBERS = ['README', 'src/main.c', 'src/util.c', 'doc/index.html']
+ARCEXT = '.tar.gz'
+
+
+def count_dirs(depth: int, fanout: int) -> int:
+    """return the number of directories per storage"""
+    return sum(fanout ** x for x in range(depth + 1))
+
+
+def files_for_total(total: int, depth: int, fanout: int) -> int:
+    """return the number of files per directory to reach total"""
+    dirs = count_dirs(depth, fanout)
+    return max(1, -(-total // dirs))
+
+
+class _Archives:
+    """decide which files are archives given a ratio"""
+
+    def __init__(self, ratio: float) -> None:
+        self.ratio = ratio
+        self.cnt = 0
+
+    def next(self) -> bool:
+        """is the next file an archive"""
+        cur = int(self.cnt * self.ratio)
+        self.cnt += 1
+        return int(self.cnt * self.ratio) > cur
+
+
+def _file_name(idx: int, archive: bool) -> str:
+    """return a synthetic file name"""
+    if archive:
+        return f'file{idx:05d}{ARCEXT}'
+    return f'file{idx:05d}.txt'
+
+
+def _fill(parent: NodeAny, depth: int, fanout: int,
+          files: int, cnt: int, archives: _Archives) -> int:
+    """recursively fill a directory node"""
+    for i in range(files):
+        isarc = archives.next()
+        node = NodeFile(_file_name(i, isarc), 1024 * (i + 1),
+                        f'{cnt + i:032x}', EPOCH, parent=parent)
+        if isarc:
+            cnt += _fill_archive(node)
+    cnt += files
+    if depth <= 0:
+        return cnt
+    for i in range(fanout):
+        sub = NodeDir(f'dir{i:03d}', 0, EPOCH, parent=parent)
+        cnt = _fill(sub, depth - 1, fanout, files, cnt + 1, archives)
+    return cnt
+
+
+def _fill_archive(node: NodeFile) -> int:
+    """add the synthetic archive content, return the number of nodes"""
+    subs = {}
+    cnt = 0
+    for member in ARCMEMBERS:
+        parent: NodeAny = node
+        parts = member.split('/')
+        for part in parts[:-1]:
+            if part not in subs:
+                subs[part] = NodeArchived(part, 0, '', node.name,
+                                          maccess=EPOCH, parent=parent)
+                cnt += 1
+            parent = subs[part]
+        NodeArchived(parts[-1], 128, '', node.name,
+                     maccess=EPOCH, parent=parent)
+        cnt += 1
+    return cnt
+
+
+def make_tree(storages: int = 1,
+              depth: int = 3,
+              fanout: int = 4,
+              files: int = 10,
+              archives: float = 0.0) -> Tuple[NodeTop, int]:
+    """
+    create an in-memory catalog tree
+    returns the top node and the number of nodes
+    @storages: number of storages
+    @depth: directory depth
+    @fanout: sub-directories per directory
+    @files: files per directory
+    @archives: ratio of files being archives
+    """
+    noder = Noder()
+    top = noder.new_top_node()
+    cnt = 0
+    arcs = _Archives(archives)
+    for i in range(storages):
+        storage = NodeStorage(f'storage{i}', 10**9, 10**10, 0,
+                              EPOCH, '', parent=top)
+        cnt = _fill(storage, depth, fanout, files, cnt + 1, arcs)
+    noder.fixsizes(top)
+    return top, cnt
+
+
+def _archive_content() -> bytes:
+    """return the content of the synthetic archives"""
+    buf = io.BytesIO()
+    with tarfile.open(fileobj=buf, mode='w:gz') as tar:
+        for member in ARCMEMBERS:
+            info = tarfile.TarInfo(member)
+            info.size = 128
+            info.mtime = EPOCH
+            tar.addfile(info, io.BytesIO(b'x' * 128))
+    return buf.getvalue()
+
+
+def make_fs(path: str,
+            depth: int = 3,
+            fanout: int = 4,
+            files: int = 10,
+            archives: float = 0.0) -> List[str]:
+    """
+    create the synthetic tree on disk under path
+    and return the paths of the created files
+    (see make_tree for the parameters)
+    """
+    arcs = _Archives(archives)
+    arcdata = _archive_content()
+    created = []
+    dirs = [(path, depth)]
+    while dirs:
+        cur, level = dirs.pop()
+        os.makedirs(cur, exist_ok=True)
+        for i in range(files):
+            isarc = arcs.next()
+            fpath = os.path.join(cur, _file_name(i, isarc))
+            with open(fpath, 'wb') as file:
+                file.write(arcdata if isarc else b'x' * (i % 16) * 64)
+            os.utime(fpath, (EPOCH, EPOCH))
+            created.append(fpath)
+        if level <= 0:
+            continue
+        for i in reversed(range(fanout)):
+            dirs.append((os.path.join(cur, f'dir{i:03d}'), level - 1))
+    return created
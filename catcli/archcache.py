@@ -0,0 +1,120 @@
+"""
+author: deadc0de6 (https://github.com/deadc0de6)
+Copyright (c) 2024, deadc0de6
+
+Cache of the archives content
+"""
+
+import os
+import time
+import marshal
+import hashlib
+import tempfile
+from typing import Optional, Dict, Any
+
+# local imports
+from catcli.snapshot import get_cache_dir
+from catcli.decomp import Listing
+
+
+# bump when the cached listing changes
+FORMAT = 4
+# listings unused for that long are evicted (seconds)
+MAXAGE = 30 * 24 * 3600
+
+
+class ArchiveCache:
+    """
+    archive listings cached on disk keyed on the archive
+    size, mtime and md5 (or path when not hashed) and the
+    listing limits, only complete listings are cached and
+    the ones unused for maxage are evicted
+    """
+
+    def __init__(self, directory: str = '',
+                 maxage: float = MAXAGE) -> None:
+        """
+        @directory: where to store the listings
+                    (defaults to the cache dir)
+        @maxage: seconds after which an unused listing is evicted
+        """
+        self.directory = directory or os.path.join(get_cache_dir(),
+                                                   'archives')
+        self.maxage = maxage
+        self.pruned = False
+
+    def _get_path(self, path: str, size: int,
+                  maccess: float, md5: str,
+                  limits: Optional[Dict[str, Any]]) -> str:
+        """return the cache file of an archive"""
+        ident = md5 or os.path.realpath(path)
+        lims = sorted((limits or {}).items())
+        key = f'{FORMAT}:{lims!r}:{size}:{maccess!r}:{ident}'
+        digest = hashlib.sha1(key.encode('utf-8', 'surrogateescape'))
+        return os.path.join(self.directory, digest.hexdigest())
+
+    def get(self, path: str, size: int,
+            maccess: float, md5: str,
+            limits: Optional[Dict[str, Any]] = None) -> Optional[Listing]:
+        """
+        return the cached listing of an archive if any
+        @limits: the limits of the listing (see Decomp.get_limits)
+        """
+        cpath = self._get_path(path, size, maccess, md5, limits)
+        try:
+            with open(cpath, 'rb') as file:
+                listing = marshal.loads(file.read())
+            # used, postpone its eviction
+            os.utime(cpath)
+        except (OSError, EOFError, ValueError, TypeError):
+            return None
+        if not isinstance(listing, tuple) or len(listing) != 2:
+            return None
+        members, truncated = listing
+        return members, truncated
+
+    def put(self, path: str, size: int,
+            maccess: float, md5: str, listing: Listing,
+            limits: Optional[Dict[str, Any]] = None) -> bool:
+        """
+        cache the listing of an archive
+        @limits: the limits of the listing (see Decomp.get_limits)
+        """
+        if listing[1]:
+            # truncated, possibly by the time budget
+            return False
+        if not self.pruned:
+            self.prune()
+        cpath = self._get_path(path, size, maccess, md5, limits)
+        tmp = ''
+        try:
+            data = marshal.dumps(listing)
+            os.makedirs(self.directory, mode=0o700, exist_ok=True)
+            fd, tmp = tempfile.mkstemp(prefix='.', suffix='.tmp',
+                                       dir=self.directory)
+            with os.fdopen(fd, 'wb') as file:
+                file.write(data)
+            os.replace(tmp, cpath)
+        except (OSError, ValueError):
+            if tmp and os.path.exists(tmp):
+                os.remove(tmp)
+            return False
+        return True
+
+    def prune(self) -> int:
+        """evict the listings unused for maxage, return their count"""
+        self.pruned = True
+        cnt = 0
+        limit = time.time() - self.maxage
+        try:
+            entries = list(os.scandir(self.directory))
+        except OSError:
+            return 0
+        for entry in entries:
+            try:
+                if entry.stat().st_mtime < limit:
+                    os.remove(entry.path)
+                    cnt += 1
+            except OSError:
+                continue
+        return cnt
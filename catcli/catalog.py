@@ -5,10 +5,10 @@ Copyright (c) 2017, deadc0de6
 Class that represents the catcli catalog
 """
 
+import io
 import os
-from typing import Optional, List, Dict, Tuple, Union, Any
-from anytree.exporter import JsonExporter, DictExporter
-from anytree.importer import JsonImporter
+import tempfile
+from typing import Optional, List, Dict, Tuple, Any, TextIO
 from anytree import AnyNode
 
 # local imports
@@ -16,24 +16,56 @@ from catcli import nodes
 from catcli.nodes import NodeMeta, NodeTop
 from catcli.utils import ask
 from catcli.logger import Logger
+from catcli.jsonstream import JsonStreamWriter, JsonStreamReader
+from catcli.snapshot import Snapshot
+from catcli.journal import Journal, SUFFIX as JOURNAL_SUFFIX
+from catcli.checkpoint import Checkpoint, SUFFIX as CHECKPOINT_SUFFIX
+from catcli.exceptions import CatcliException
+from catcli import compress
+from catcli import metrics
+from catcli.metrics import Metrics
 
 
 class Catalog:
     """the catalog"""
 
+    # the journal is compacted into the catalog once
+    # it reaches that ratio of the catalog size
+    COMPACT_RATIO = 0.25
+    # and is always allowed to grow up to this size
+    COMPACT_MIN = 1024 * 1024
+
     def __init__(self, path: str,
                  debug: bool = False,
-                 force: bool = False) -> None:
+                 force: bool = False,
+                 compression: str = '',
+                 level: Optional[int] = None,
+                 cache: bool = False) -> None:
         """
         @path: catalog path
-        @usepickle: use pickle
         @debug: debug mode
         @force: force overwrite if exists
+        @compression: compression to save with (see compress.COMPRESSIONS)
+                      by default based on the extension or the existing
+                      catalog compression
+        @level: compression level
+        @cache: use a binary snapshot of the catalog to speed up restore
         """
         self.path = os.path.expanduser(path)
         self.debug = debug
         self.force = force
+        if compression:
+            compress.check(compression, level)
+        self.compression = compression
+        self.level = level
+        self.journal_path = self.path + JOURNAL_SUFFIX
+        self.checkpoint_path = self.path + CHECKPOINT_SUFFIX
+        self.snapshot: Optional[Snapshot] = None
+        if cache and self.path:
+            self.snapshot = Snapshot(self.path)
         self.metanode: Optional[NodeMeta] = None
+        # phase timers, shared with the noder
+        self.metrics = Metrics()
 
     def set_metanode(self, metanode: NodeMeta) -> None:
         """remove the metanode until tree is re-written"""
@@ -55,12 +87,92 @@ class Catalog:
             return None
         if not os.path.exists(self.path):
             return None
-        with open(self.path, 'r', encoding='UTF-8') as file:
-            content = file.read()
-        return self._restore_json(content)
+        if not self.compression:
+            # keep the same compression on save
+            self.compression = compress.detect(self.path)
+        with self.metrics.timer(metrics.LOAD):
+            top = self._restore_base()
+            if top:
+                self._replay_journal(top)
+        return top
+
+    def new_journal(self) -> Journal:
+        """return a journal to record changes to the catalog"""
+        return Journal(self.journal_path)
+
+    def new_checkpoint(self, interval: float) -> Checkpoint:
+        """return a checkpoint of the indexing into the catalog"""
+        return Checkpoint(self.checkpoint_path, interval=interval)
+
+    def _restore_base(self) -> Optional[NodeTop]:
+        """restore the catalog file (without its journal)"""
+        if self.snapshot:
+            root = self.snapshot.load()
+            if root:
+                self._debug(f'Catalog restored from snapshot '
+                            f'\"{self.snapshot.snappath}\"')
+                return self._to_top(root)
+        with compress.open_read(self.path) as file:
+            top = self._restore_json_stream(file)
+        if top and self.snapshot:
+            self._save_snapshot(top)
+        return top
+
+    def _replay_journal(self, top: NodeTop) -> None:
+        """apply the journal changes if any"""
+        journal = self.new_journal()
+        if not journal.exists():
+            return
+        try:
+            cnt = journal.replay(top, os.path.getsize(self.path))
+        except (OSError, CatcliException) as exc:
+            Logger.err(f'journal \"{journal.path}\" ignored: {exc}')
+            return
+        self._debug(f'{cnt} change(s) replayed from \"{journal.path}\"')
 
     def save(self, node: NodeTop) -> bool:
         """save the catalog"""
+        if not self._can_write():
+            return False
+        if self.metanode:
+            self.metanode.parent = node
+        with self.metrics.timer(metrics.SAVE):
+            return self._save_json(node)
+
+    def save_journal(self, node: NodeTop, journal: Journal) -> bool:
+        """
+        save the changes recorded in the journal by appending
+        them to the catalog journal, the catalog is entirely
+        saved instead if the journal grows too large
+        """
+        if not self.exists():
+            return self.save(node)
+        if not self._can_write():
+            return False
+        basesize = os.path.getsize(self.path)
+        try:
+            with self.metrics.timer(metrics.SAVE):
+                cnt = journal.write(basesize)
+        except OSError as exc:
+            Logger.err(f'Cannot write journal \"{journal.path}\": {exc}')
+            return False
+        except CatcliException as exc:
+            # a stale journal is replaced by the whole catalog
+            self._debug(f'{exc}, compacting the journal')
+            journal.records = []
+        else:
+            self._debug(f'{cnt} change(s) appended to \"{journal.path}\"')
+            if journal.size() < max(self.COMPACT_MIN,
+                                    basesize * self.COMPACT_RATIO):
+                return True
+            self._debug('compacting the journal')
+        if self.metanode:
+            self.metanode.parent = node
+        with self.metrics.timer(metrics.SAVE):
+            return self._save_json(node)
+
+    def _can_write(self) -> bool:
+        """ensure the catalog can be written"""
         if not self.path:
             Logger.err('Path not defined')
             return False
@@ -74,9 +186,7 @@ class Catalog:
         if directory and not os.path.exists(directory):
             Logger.err(f'Cannot write to \"{directory}\"')
             return False
-        if self.metanode:
-            self.metanode.parent = node
-        return self._save_json(node)
+        return True
 
     def _debug(self, text: str) -> None:
         if not self.debug:
@@ -84,56 +194,108 @@ class Catalog:
         Logger.debug(text)
 
     def _save_json(self, top: NodeTop) -> bool:
-        """export the catalog in json"""
-        self._debug(f'saving {top} to json...')
-        dexporter = DictExporter(attriter=attriter)
-        exp = JsonExporter(dictexporter=dexporter, indent=2, sort_keys=True)
-        with open(self.path, 'w', encoding='UTF-8') as file:
-            exp.write(top, file)
-        self._debug(f'Catalog saved to json \"{self.path}\"')
+        """
+        export the catalog in json
+        the tree is streamed to a temporary file
+        which then atomically replaces the catalog
+        """
+        self._debug(f'saving {top.get_name()} to json...')
+        path = os.path.realpath(self.path)
+        directory = os.path.dirname(path)
+        writer = JsonStreamWriter(attriter=attriter)
+        compression = self._get_compression()
+        fd, tmp = tempfile.mkstemp(prefix=f'.{os.path.basename(path)}.',
+                                   suffix='.tmp', dir=directory)
+        try:
+            with os.fdopen(fd, 'wb') as raw:
+                file = compress.wrap_write(raw, compression, self.level)
+                cnt = writer.write(top, file)
+                compress.finish_write(file, raw)
+            os.chmod(tmp, _get_mode(path))
+            os.replace(tmp, path)
+            # the catalog now holds all the journal changes
+            self.new_journal().remove()
+        except (OSError, ValueError, CatcliException) as exc:
+            # ValueError/CatcliException: bad compression settings
+            Logger.err(f'Cannot save catalog to \"{self.path}\": {exc}')
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            return False
+        _fsync_dir(directory)
+        self._debug(f'Catalog ({cnt} nodes) saved to json \"{self.path}\" '
+                    f'(compression: {compression})')
+        if self.snapshot:
+            self._save_snapshot(top)
         return True
 
+    def _save_snapshot(self, top: NodeTop) -> None:
+        """refresh the snapshot of the catalog"""
+        if not self.snapshot:
+            return
+        if self.snapshot.save(top):
+            self._debug(f'snapshot saved to \"{self.snapshot.snappath}\"')
+            return
+        # never leave a stale snapshot around
+        self.snapshot.remove()
+        self._debug('unable to save snapshot')
+
+    def _get_compression(self) -> str:
+        """return the compression to save the catalog with"""
+        if self.compression:
+            return self.compression
+        compression = compress.from_extension(self.path)
+        if compression == compress.NONE and self.exists():
+            compression = compress.detect(self.path)
+        return compression
+
     def _restore_json(self, string: str) -> Optional[NodeTop]:
-        """restore the tree from json"""
-        imp = JsonImporter(dictimporter=_DictImporter(debug=self.debug))
-        root = imp.import_(string)
+        """restore the tree from a json string"""
+        return self._restore_json_stream(io.StringIO(string))
+
+    def _restore_json_stream(self, file: TextIO) -> Optional[NodeTop]:
+        """restore the tree from json, parsing it node by node"""
+        reader = JsonStreamReader(backattr=back_attriter)
+        root = reader.read(file)
         self._debug(f'Catalog imported from json \"{self.path}\"')
-        self._debug(f'root imported: {root}')
-        if root.type != nodes.TYPE_TOP:
+        self._debug(f'{reader.cnt} node(s) imported')
+        return self._to_top(root)
+
+    def _to_top(self, root: AnyNode) -> Optional[NodeTop]:
+        """convert the restored root to the top node"""
+        if getattr(root, 'type', None) != nodes.TYPE_TOP:
             return None
-        top = NodeTop(root.name, children=root.children)
+        name = getattr(root, 'name', nodes.NAME_TOP)
+        top = NodeTop(name, children=root.children)
+        top.nodesize = getattr(root, 'nodesize', 0) or 0
         self._debug(f'top imported: {top.get_name()}')
         return top
 
 
-class _DictImporter():
+def _get_mode(path: str) -> int:
+    """return the mode to apply to the saved catalog"""
+    if os.path.exists(path):
+        return os.stat(path).st_mode & 0o7777
+    # mkstemp creates private files, honor the umask instead
+    umask = os.umask(0)
+    os.umask(umask)
+    return 0o666 & ~umask
+
+
+def _fsync_dir(directory: str) -> None:
+    """make the rename durable"""
+    try:
+        dirfd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(dirfd)
+    except OSError:
+        pass
+    finally:
+        os.close(dirfd)
 
-    def __init__(self,
-                 nodecls: AnyNode = AnyNode,
-                 debug: bool = False):
-        self.nodecls = nodecls
-        self.debug = debug
 
-    def import_(self, data: Dict[str, str]) -> AnyNode:
-        """Import tree from `data`."""
-        return self.__import(data)
-
-    def __import(self, data: Union[str, Any],
-                 parent: AnyNode = None) -> AnyNode:
-        """overwrite parent imoprt"""
-        assert isinstance(data, dict)
-        assert "parent" not in data
-        attrs = dict(data)
-        # replace attr
-        attrs = back_attriter(attrs)
-        children: Union[str, Any] = attrs.pop("children", [])
-        node = self.nodecls(parent=parent, **attrs)
-        for child in children:
-            self.__import(child, parent=node)
-        return node
-
-
-def back_attriter(adict: Dict[str, str]) -> Dict[str, str]:
+def back_attriter(adict: Dict[str, Any]) -> Dict[str, Any]:
     """replace attribute on json restore"""
     attrs = {}
     for k, val in adict.items():
@@ -149,6 +311,9 @@ def attriter(attrs: List[Tuple[str, Any]]) -> List[Tuple[str, Any]]:
     newattr = []
     for attr in attrs:
         k, val = attr
+        if k.startswith('_'):
+            # internal attribute (caches, flags)
+            continue
         if k == 'nodesize':
             k = 'size'
         newattr.append((k, val))
@@ -11,8 +11,9 @@ Catcli command line interface
 import sys
 import os
 import datetime
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from typing import Dict, Any, List, \
-    Tuple
+    Tuple, Optional
 from docopt import docopt
 import cmd2
 
@@ -23,21 +24,33 @@ from catcli.logger import Logger
 from catcli.printer_csv import CsvPrinter
 from catcli.colors import Colors
 from catcli.catalog import Catalog
-from catcli.walker import Walker
+from catcli.walker import Walker, index_storage, resume_storage
+from catcli.watcher import Watcher
+from catcli.snapshot import unflatten
+from catcli.archcache import ArchiveCache
 from catcli.noder import Noder
 from catcli.utils import ask, edit
 from catcli.nodes_utils import path_to_search_all
 from catcli.exceptions import BadFormatException, CatcliException
+from catcli.profiler import Profiler
+from catcli.metrics import Metrics
+from catcli.throttle import IOLimit
+from catcli.checkpoint import Checkpoint
+from catcli import metrics
 
 NAME = 'catcli'
 CUR = os.path.dirname(os.path.abspath(__file__))
-FORMATS = ['native', 'csv', 'csv-with-header', 'fzf-native', 'fzf-csv']
+FORMATS = ['native', 'csv', 'csv-with-header', 'fzf-native', 'fzf-csv',
+           'jsonl']
 
 # env variables
 ENV_CATALOG_PATH = 'CATCLI_CATALOG_PATH'
 ENV_NOBANNER = 'CATCLI_NO_BANNER'
 ENV_VERBOSE = 'CATCLI_VERBOSE'
 ENV_FORMAT = 'CATCLI_FORMAT'
+ENV_COMPRESSION = 'CATCLI_COMPRESSION'
+ENV_COMPRESSION_LEVEL = 'CATCLI_COMPRESSION_LEVEL'
+ENV_NOCACHE = 'CATCLI_NO_CACHE'
 
 # default paths
 DEFAULT_CATALOGPATH = os.getenv(ENV_CATALOG_PATH, default=f'{NAME}.catalog')
@@ -45,6 +58,12 @@ DEFAULT_GRAPHPATH = f'/tmp/{NAME}.dot'
 DEFAULT_NOBANNER = os.getenv(ENV_NOBANNER) is not None
 DEFAULT_VERBOSEMODE = os.getenv(ENV_VERBOSE) is not None
 DEFAULT_FORMAT = os.getenv(ENV_FORMAT, default='native')
+DEFAULT_COMPRESSION = os.getenv(ENV_COMPRESSION, default='')
+DEFAULT_COMPRESSION_LEVEL = os.getenv(ENV_COMPRESSION_LEVEL, default='')
+DEFAULT_NOCACHE = os.getenv(ENV_NOCACHE) is not None
+
+# niceness of --low-io
+LOWIO_NICE = 10
 
 BANNER = f""" +-+-+-+-+-+-+
  |c|a|t|c|l|i|
@@ -55,15 +74,28 @@ USAGE = f"""
 
 Usage:
     {NAME} ls       [--catalog=<path>] [--format=<fmt>] [-aBCrVSs] [<path>]
-    {NAME} tree     [--catalog=<path>] [-aBCVSs] [<path>]
+    {NAME} tree     [--catalog=<path>] [--format=<fmt>] [-aBCVSs] [<path>]
     {NAME} find     [--catalog=<path>] [--format=<fmt>]
                     [-aBCbdVs] [--path=<path>] [<term>]
     {NAME} index    [--catalog=<path>] [--meta=<meta>...]
-                    [-aBCcfV] <name> <path>
-    {NAME} update   [--catalog=<path>] [-aBCcfV]
+                    [--manifest=<path>] [--jobs=<n>] [--workers=<n>]
+                    [--arc-depth=<n>] [--arc-workers=<n>]
+                    [--metrics] [--metrics-json=<path>]
+                    [--max-read=<mb>] [--max-stat=<n>] [--low-io]
+                    [--exclude=<pattern>...] [--include=<pattern>...]
+                    [--checkpoint=<s>] [--resume]
+                    [-aBCcfVx] [<name> <path> [<pairs>...]]
+    {NAME} update   [--catalog=<path>] [-aBCcfVx] [--workers=<n>]
+                    [--arc-depth=<n>] [--arc-workers=<n>]
+                    [--metrics] [--metrics-json=<path>]
+                    [--max-read=<mb>] [--max-stat=<n>] [--low-io]
+                    [--exclude=<pattern>...] [--include=<pattern>...]
                     [--lpath=<path>] <name> <path>
+    {NAME} watch    [--catalog=<path>] [-aBCcfVx] [--delay=<s>]
+                    [--exclude=<pattern>...] [--include=<pattern>...]
+                    <name> <path>
     {NAME} mount    [--catalog=<path>] [-V] <mountpoint>
-    {NAME} du       [--catalog=<path>] [-BCVSs] [<path>]
+    {NAME} du       [--catalog=<path>] [--format=<fmt>] [-BCVSs] [<path>]
     {NAME} rm       [--catalog=<path>] [-BCfV] <storage>
     {NAME} rename   [--catalog=<path>] [-BCfV] <storage> <name>
     {NAME} edit     [--catalog=<path>] [-BCfV] <storage>
@@ -77,23 +109,42 @@ Usage:
 
 Options:
     --catalog=<path>    Path to the catalog [default: {DEFAULT_CATALOGPATH}].
+    --checkpoint=<s>    Min seconds between checkpoints, 0 to disable [default: 300].
     --meta=<meta>       Additional attribute to store [default: ].
     -a --archive        Handle archive file [default: False].
+    --arc-depth=<n>     Levels of archives within archives to index [default: 0].
+    --arc-workers=<n>   Processes listing archives [default: 0].
     -B --no-banner      Do not display the banner [default: {str(DEFAULT_NOBANNER)}].
     -b --script         Output script to manage found file(s) [default: False].
     -C --no-color       Do not output colors [default: False].
     -c --hash           Calculate md5 hash [default: False].
     -d --directory      Only directory [default: False].
+    --exclude=<pattern>  Gitignore-style pattern of paths not to index.
+    --delay=<s>         Seconds without changes before saving [default: 2].
     -F --format=<fmt>   see \"print_supported_formats\" [default: {DEFAULT_FORMAT}].
     -f --force          Do not ask when updating the catalog [default: False].
+    -j --jobs=<n>       Storages indexed in parallel, 0 for all [default: 0].
     -l --lpath=<path>   Path where changes are logged [default: ]
+    --low-io            Lower priority, hashed data not cached [default: False].
+    -m --manifest=<path>  File with a \"<name> <path>\" storage per line.
+    --max-read=<mb>     Max MB/s read when hashing, 0 for no limit [default: 0].
+    --max-stat=<n>      Max files/s stat'ed, 0 for no limit [default: 0].
+    --metrics           Print the time spent in each phase [default: False].
+    --metrics-json=<path>  Save the phases timing and counters as json.
     -p --path=<path>    Start path.
     -r --recursive      Recursive [default: False].
+    --resume            Resume an interrupted index [default: False].
     -s --raw-size       Print raw size [default: False].
     -S --sortsize       Sort by size, largest first [default: False].
     -V --verbose        Be verbose [default: {str(DEFAULT_VERBOSEMODE)}].
     -v --version        Show version.
+    -w --workers=<n>    Threads scanning directories [default: 0].
+    -x --one-fs         Do not cross filesystem boundaries [default: False].
+    --include=<pattern>  Pattern of paths to index even if excluded.
     -h --help           Show this screen.
+
+Any command can be profiled with --profile[=<path>] (cpu)
+or --profile-mem[=<path>] (memory).
 """  # nopep8
 
 
@@ -113,19 +164,83 @@ def cmd_mount(args: Dict[str, Any],
     return True
 
 
+def get_index_storages(args: Dict[str, Any]) -> List[Tuple[str, str]]:
+    """return the (name, path) of the storages to index"""
+    storages = []
+    manifest = args.get('--manifest')
+    if manifest:
+        storages.extend(read_manifest(manifest))
+    if args['<name>']:
+        storages.append((args['<name>'], args['<path>']))
+    pairs = args.get('<pairs>') or []
+    if len(pairs) % 2:
+        raise CatcliException(f'no path for storage \"{pairs[-1]}\"')
+    storages.extend(zip(pairs[::2], pairs[1::2]))
+    return storages
+
+
+def read_manifest(path: str) -> List[Tuple[str, str]]:
+    """
+    read a manifest of storages to index, one
+    "<name> <path>" per line, "#" starts a comment
+    """
+    storages = []
+    with open(path, 'r', encoding='UTF-8') as file:
+        for line in file:
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            fields = line.split(maxsplit=1)
+            if len(fields) != 2:
+                raise CatcliException(f'bad manifest line: \"{line}\"')
+            storages.append((fields[0], os.path.expanduser(fields[1])))
+    return storages
+
+
+def get_patterns(args: Dict[str, Any]) -> List[str]:
+    """return the exclude rules of the command line"""
+    patterns = list(args.get('--exclude') or [])
+    patterns.extend(f'!{x}' for x in args.get('--include') or [])
+    return patterns
+
+
 def cmd_index(args: Dict[str, Any],
               noder: Noder,
               catalog: Catalog,
               top: NodeTop) -> None:
     """index action"""
-    path = args['<path>']
-    name = args['<name>']
-    usehash = args['--hash']
     debug = args['--verbose']
-    if not os.path.exists(path):
-        Logger.err(f'\"{path}\" does not exist')
+    attr = args['--meta']
+    checkpoint = catalog.new_checkpoint(float(args.get('--checkpoint') or 0))
+    resume = args.get('--resume', False)
+    try:
+        if resume:
+            if not checkpoint.exists():
+                Logger.err(f'no checkpoint to resume: {checkpoint.path}')
+                return
+            checkpoint.load()
+            storages = checkpoint.storages
+            attr = checkpoint.attr
+        else:
+            storages = get_index_storages(args)
+    except (OSError, CatcliException) as exc:
+        Logger.err(f'{exc}')
+        return
+    if not storages:
+        Logger.err('nothing to index')
         return
-    if name in noder.get_storage_names(top):
+    names = [name for name, _ in storages]
+    # the storages being re-indexed
+    previous: Dict[str, NodeAny] = {}
+    for name, path in storages:
+        if names.count(name) > 1:
+            Logger.err(f'storage \"{name}\" specified more than once')
+            return
+        if not os.path.exists(path):
+            Logger.err(f'\"{path}\" does not exist')
+            return
+        if name not in noder.get_storage_names(top):
+            continue
         try:
             if not ask(f'Overwrite storage \"{name}\"'):
                 Logger.err(f'storage named \"{name}\" already exist')
@@ -133,23 +248,155 @@ def cmd_index(args: Dict[str, Any],
         except KeyboardInterrupt:
             Logger.err('aborted')
             return
-        node = top.get_storage_node()
+        node = noder.find_storage_node_by_name(top, name)
         if node:
+            previous[name] = node
             node.parent = None
 
     start = datetime.datetime.now()
     if debug:
         Logger.debug('debug mode enabled')
-    walker = Walker(noder, usehash=usehash, debug=debug)
-    attr = args['--meta']
-    root = noder.new_storage_node(name, path, top, attr)
-    _, cnt = walker.index(path, root, name)
-    root.nodesize = root.get_rec_size()
+    jobs = min(int(args.get('--jobs') or 0) or len(storages), len(storages))
+    if not resume:
+        checkpoint.start(storages, attr)
+    try:
+        if jobs > 1:
+            cnt = index_concurrently(storages, top, attr, jobs, args,
+                                     noder.metrics,
+                                     noder.iolimit.share(jobs),
+                                     previous=previous,
+                                     checkpoint=checkpoint)
+        else:
+            cnt = index_checkpointed(args, noder, top, storages, attr,
+                                     checkpoint)
+    except KeyboardInterrupt:
+        if checkpoint.exists():
+            Logger.err('aborted, continue with \"index --resume\"')
+        else:
+            Logger.err('aborted')
+        return
+    except CatcliException as exc:
+        Logger.err(f'{exc}')
+        return
     stop = datetime.datetime.now()
     diff = stop - start
     Logger.info(f'Indexed {cnt} file(s) in {diff}')
-    if cnt > 0:
-        catalog.save(top)
+    if cnt == 0 or catalog.save(top):
+        checkpoint.remove()
+    report_metrics(args, noder.metrics)
+
+
+def index_checkpointed(args: Dict[str, Any],
+                       noder: Noder,
+                       top: NodeTop,
+                       storages: List[Tuple[str, str]],
+                       attr: Any,
+                       checkpoint: Checkpoint) -> int:
+    """
+    index the storages one after the other, periodically
+    saving a checkpoint of each, and resume them from their
+    checkpoint if any, may raise CatcliException
+    """
+    cnt = 0
+    walker = Walker(noder, usehash=args['--hash'], debug=args['--verbose'],
+                    workers=int(args.get('--workers') or 0),
+                    patterns=get_patterns(args),
+                    onefs=args.get('--one-fs', False))
+    for idx, (name, path) in enumerate(storages):
+        storagecp = checkpoint.get_storage(idx)
+        root, cnt2 = resume_storage(storagecp)
+        cnt += cnt2
+        if root:
+            root.parent = top
+            if storagecp.complete:
+                # indexed before the checkpoint
+                continue
+        else:
+            root = noder.new_storage_node(name, path, top, attr)
+            storagecp.begin(root)
+        walker.checkpoint = storagecp
+        _, cnt2 = walker.index(path, root, name)
+        with noder.metrics.timer(metrics.FIXSIZES):
+            root.nodesize = root.get_rec_size()
+        storagecp.finish()
+        cnt += cnt2
+    return cnt
+
+
+def report_metrics(args: Dict[str, Any], mets: Metrics) -> None:
+    """print and/or save the metrics"""
+    if args.get('--metrics'):
+        Logger.info('\n'.join(mets.summary()))
+    path = args.get('--metrics-json')
+    if not path:
+        return
+    try:
+        mets.dump(path)
+    except OSError as exc:
+        Logger.err(f'Cannot save metrics to \"{path}\": {exc}')
+
+
+def index_concurrently(storages: List[Tuple[str, str]],
+                       top: NodeTop,
+                       attr: Any,
+                       jobs: int,
+                       args: Dict[str, Any],
+                       mets: Metrics,
+                       iolimit: Optional[IOLimit] = None,
+                       previous: Optional[Dict[str, NodeAny]] = None,
+                       checkpoint: Optional[Checkpoint] = None) -> int:
+    """
+    index each storage in its own worker process
+    and attach the resulting trees to top, the
+    workers metrics are added to mets and
+    iolimit is the I/O budget of each worker,
+    previous are the storages being re-indexed
+    which are kept when their worker fails and
+    each storage is checkpointed (and resumed) in
+    its checkpoint file
+    """
+    previous = previous or {}
+    cnt = 0
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        futures = {}
+        for idx, (name, path) in enumerate(storages):
+            storagecp = checkpoint.get_storage(idx) if checkpoint else None
+            future = pool.submit(index_storage, name, path, attr,
+                                 usehash=args['--hash'],
+                                 arc=args['--archive'],
+                                 arcdepth=int(args.get('--arc-depth') or 0),
+                                 debug=args['--verbose'],
+                                 workers=int(args.get('--workers') or 0),
+                                 arcworkers=int(args.get('--arc-workers')
+                                                or 0),
+                                 cache=not DEFAULT_NOCACHE,
+                                 iolimit=iolimit,
+                                 patterns=get_patterns(args),
+                                 onefs=args.get('--one-fs', False),
+                                 checkpoint=storagecp)
+            futures[future] = name
+        for future in as_completed(futures):
+            name = futures[future]
+            storage = None
+            try:
+                flat, cnt2, wmets = future.result()
+                storage = unflatten(flat)
+            except Exception as exc:  # pylint: disable=W0718
+                Logger.err(f'indexing storage \"{name}\" failed: {exc}')
+            if not storage:
+                if name in previous:
+                    Logger.err(f'keeping the previous index of \"{name}\"')
+                    previous[name].parent = top
+                continue
+            storage.parent = top
+            mets.merge(wmets)
+            cnt += cnt2
+            Logger.info(f'storage \"{name}\": indexed {cnt2} file(s)')
+    # keep the order of the command line
+    order = {name: idx for idx, (name, _) in enumerate(storages)}
+    top.children = sorted(top.children,
+                          key=lambda x: order.get(x.name, -1))
+    return cnt
 
 
 def cmd_update(args: Dict[str, Any],
@@ -169,17 +416,56 @@ def cmd_update(args: Dict[str, Any],
     if not storage:
         Logger.err(f'storage named \"{name}\" does not exist')
         return
+    # record the changes to only append them to the catalog journal
+    journal = catalog.new_journal()
+    noder.journal = journal
     noder.update_storage_path(top, name, path)
     start = datetime.datetime.now()
     walker = Walker(noder, usehash=usehash, debug=debug,
-                    logpath=logpath)
+                    logpath=logpath, patterns=get_patterns(args),
+                    onefs=args.get('--one-fs', False))
     cnt = walker.reindex(path, storage, top)
-    storage.nodesize = storage.get_rec_size()
+    noder.fixsizes(top)
     stop = datetime.datetime.now()
     diff = stop - start
     Logger.info(f'updated {cnt} file(s) in {diff}')
-    if cnt > 0:
-        catalog.save(top)
+    if not noder.dirty:
+        Logger.info('nothing changed, catalog not saved')
+    else:
+        catalog.save_journal(top, journal)
+    report_metrics(args, noder.metrics)
+
+
+def cmd_watch(args: Dict[str, Any],
+              noder: Noder,
+              catalog: Catalog,
+              top: NodeTop) -> None:
+    """watch action"""
+    path = args['<path>']
+    name = args['<name>']
+    try:
+        delay = float(args['--delay'])
+    except ValueError:
+        Logger.err(f'bad delay: {args["--delay"]}')
+        return
+    if not os.path.isdir(path):
+        Logger.err(f'\"{path}\" is not a directory')
+        return
+    storage = noder.find_storage_node_by_name(top, name)
+    if not storage:
+        Logger.err(f'storage named \"{name}\" does not exist')
+        return
+    # the catalog is saved on each change
+    if not catalog.force:
+        if not ask(f'Update catalog \"{catalog.path}\" on changes'):
+            return
+        catalog.force = True
+    noder.journal = catalog.new_journal()
+    watcher = Watcher(noder, catalog, top, storage, path,
+                      usehash=args['--hash'], debug=args['--verbose'],
+                      delay=delay, patterns=get_patterns(args),
+                      onefs=args.get('--one-fs', False))
+    watcher.run()
 
 
 def cmd_du(args: Dict[str, Any],
@@ -187,8 +473,12 @@ def cmd_du(args: Dict[str, Any],
            top: NodeTop) -> List[NodeAny]:
     """du action"""
     path = path_to_search_all(args['<path>'])
+    fmt = args['--format']
+    if fmt not in ['native', 'jsonl']:
+        raise BadFormatException(f'{fmt} is not supported in du')
     found = noder.diskusage(top,
                             path,
+                            fmt=fmt,
                             raw=args['--raw-size'])
     if not found:
         path = args['<path>']
@@ -270,7 +560,9 @@ def cmd_fixsizes(top: NodeTop,
     fix each node size by re-calculating
     recursively their size
     """
-    noder.fixsizes(top)
+    if not noder.fixsizes(top):
+        Logger.info('sizes are correct, catalog not saved')
+        return
     catalog.save(top)
 
 
@@ -393,6 +685,26 @@ def print_supported_formats() -> None:
     print(f'               {CsvPrinter.CSV_HEADER}')
     print('"fzf-native" : fzf to native (only valid for find)')
     print('"fzf-csv"    : fzf to csv (only valid for find)')
+    print('"jsonl"      : one JSON object per line')
+
+
+def get_iolimit(args: Dict[str, Any]) -> IOLimit:
+    """return the I/O budget from the arguments"""
+    try:
+        maxread = float(args['--max-read']) * 1024 * 1024
+        maxstat = float(args['--max-stat'])
+    except ValueError:
+        Logger.err(f'bad I/O limit: {args["--max-read"]} '
+                   f'{args["--max-stat"]}')
+        sys.exit(1)
+    if args['--low-io']:
+        try:
+            # the I/O priority follows the cpu one
+            # with the default best-effort class
+            os.nice(LOWIO_NICE)
+        except (OSError, AttributeError) as exc:
+            Logger.err(f'cannot lower the priority: {exc}')
+    return IOLimit(maxread, maxstat, nocache=args['--low-io'])
 
 
 def init(argv: List[str]) -> Tuple[Dict[str, Any],
@@ -430,12 +742,38 @@ def init(argv: List[str]) -> Tuple[Dict[str, Any],
         Colors.no_color()
 
     # init noder
+    try:
+        int(args['--workers'])
+        arcworkers = int(args['--arc-workers'])
+    except ValueError:
+        Logger.err(f'bad number of workers: {args["--workers"]}, '
+                   f'{args["--arc-workers"]}')
+        sys.exit(1)
+    try:
+        arcdepth = int(args['--arc-depth'])
+    except ValueError:
+        Logger.err(f'bad archive depth: {args["--arc-depth"]}')
+        sys.exit(1)
+    iolimit = get_iolimit(args)
     noder = Noder(debug=args['--verbose'], sortsize=args['--sortsize'],
-                  arc=args['--archive'])
+                  arc=args['--archive'], arcworkers=arcworkers,
+                  arccache=None if DEFAULT_NOCACHE else ArchiveCache(),
+                  arcdepth=arcdepth, iolimit=iolimit)
     # init catalog
     catalog_path = args['--catalog']
-    catalog = Catalog(catalog_path, debug=args['--verbose'],
-                      force=args['--force'])
+    try:
+        level = None
+        if DEFAULT_COMPRESSION_LEVEL:
+            level = int(DEFAULT_COMPRESSION_LEVEL)
+        catalog = Catalog(catalog_path, debug=args['--verbose'],
+                          force=args['--force'],
+                          compression=DEFAULT_COMPRESSION,
+                          level=level,
+                          cache=not DEFAULT_NOCACHE)
+    except (ValueError, CatcliException) as exc:
+        Logger.err(f'bad compression settings: {exc}')
+        sys.exit(1)
+    catalog.metrics = noder.metrics
     # init top node
     top = catalog.restore()
     if not top:
@@ -450,7 +788,15 @@ def init(argv: List[str]) -> Tuple[Dict[str, Any],
 
 def main() -> bool:
     """entry point"""
-    args, noder, catalog, catalog_path, top = init(sys.argv[1:])
+    argv, profiler = Profiler.from_argv(sys.argv[1:])
+    if profiler:
+        return profiler.run(lambda: run(argv))
+    return run(argv)
+
+
+def run(argv: List[str]) -> bool:
+    """run the command"""
+    args, noder, catalog, catalog_path, top = init(argv)
 
     # parse command
     try:
@@ -461,7 +807,11 @@ def main() -> bool:
                 Logger.err(f'no such catalog: {catalog_path}')
                 return False
             cmd_update(args, noder, catalog, top)
-            cmd_fixsizes(top, noder, catalog)
+        elif args['watch']:
+            if not catalog.exists():
+                Logger.err(f'no such catalog: {catalog_path}')
+                return False
+            cmd_watch(args, noder, catalog, top)
         elif args['find']:
             if not catalog.exists():
                 Logger.err(f'no such catalog: {catalog_path}')
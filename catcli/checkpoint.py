@@ -0,0 +1,204 @@
+"""
+author: deadc0de6 (https://github.com/deadc0de6)
+Copyright (c) 2024, deadc0de6
+
+Checkpoints of an indexing to resume it
+"""
+
+import os
+import glob
+import json
+import time
+import tempfile
+from typing import List, Tuple, Set, Dict, Any
+
+# local imports
+from catcli.nodes import typcast_node
+from catcli.snapshot import flatten, unflatten
+from catcli.logger import Logger
+from catcli.exceptions import CatcliException
+
+
+# bump when the checkpoint layout changes
+FORMAT = 2
+SUFFIX = '.checkpoint'
+# seconds between checkpoints
+INTERVAL = 300.0
+# a checkpoint takes at most 1/OVERHEAD of the indexing time
+OVERHEAD = 20
+
+
+def _dump(path: str, data: Dict[str, Any]) -> bool:
+    """write data as json to path atomically"""
+    directory = os.path.dirname(os.path.abspath(path))
+    tmp = ''
+    saved = False
+    try:
+        fd, tmp = tempfile.mkstemp(prefix='.catcli.', suffix='.tmp',
+                                   dir=directory)
+        with os.fdopen(fd, 'w', encoding='UTF-8') as file:
+            json.dump(data, file, separators=(',', ':'))
+        os.replace(tmp, path)
+        saved = True
+    except (OSError, TypeError, ValueError) as exc:
+        Logger.err(f'Cannot save checkpoint \"{path}\": {exc}')
+    finally:
+        if not saved and tmp and os.path.exists(tmp):
+            os.remove(tmp)
+    return saved
+
+
+def _load(path: str) -> Dict[str, Any]:
+    """load a checkpoint file, may raise CatcliException"""
+    try:
+        with open(path, 'r', encoding='UTF-8') as file:
+            data = json.load(file)
+    except (OSError, ValueError) as exc:
+        raise CatcliException(f'bad checkpoint \"{path}\": {exc}') from exc
+    if not isinstance(data, dict) or data.get('format') != FORMAT:
+        raise CatcliException(f'unsupported checkpoint \"{path}\"')
+    return data
+
+
+class StorageCheckpoint:
+    """
+    periodic save of a storage being indexed: its partial
+    tree and its directories entirely indexed which are
+    skipped when resuming, the time between two saves
+    grows with the time a save takes
+    """
+
+    def __init__(self, path: str, interval: float = INTERVAL) -> None:
+        """
+        @path: the checkpoint path
+        @interval: seconds between checkpoints, 0 to disable
+        """
+        self.path = path
+        self.interval = interval
+        # the storage node
+        self.tree: Any = None
+        # directories entirely indexed
+        self.done: Set[str] = set()
+        # the storage was entirely indexed
+        self.complete = False
+        # the storage is resumed from the checkpoint
+        self.resuming = False
+        self.last = time.monotonic()
+        self.delay = interval
+
+    def exists(self) -> bool:
+        """does the checkpoint file exist"""
+        return os.path.exists(self.path)
+
+    def begin(self, storage: Any) -> None:
+        """the indexing of storage starts"""
+        self.tree = storage
+        self.done = set()
+        self.complete = False
+        self.resuming = False
+        self.last = time.monotonic()
+
+    def dir_done(self, treepath: str) -> None:
+        """a directory of the storage was entirely indexed"""
+        if self.interval > 0:
+            self.done.add(treepath)
+
+    def due(self) -> bool:
+        """is a checkpoint due"""
+        if self.interval <= 0:
+            return False
+        return time.monotonic() - self.last >= self.delay
+
+    def save(self, complete: bool = False) -> bool:
+        """write the checkpoint"""
+        start = time.monotonic()
+        data = {
+            'format': FORMAT,
+            'complete': complete,
+            'done': sorted(self.done),
+            'tree': flatten(self.tree),
+        }
+        saved = _dump(self.path, data)
+        self.last = time.monotonic()
+        self.delay = max(self.interval, (self.last - start) * OVERHEAD)
+        self.complete = complete
+        return saved
+
+    def finish(self) -> None:
+        """the storage was entirely indexed"""
+        if self.interval > 0:
+            self.save(complete=True)
+
+    def load(self) -> None:
+        """load the checkpoint, may raise CatcliException"""
+        data = _load(self.path)
+        tree = unflatten([tuple(x) for x in data['tree']])
+        if not tree:
+            raise CatcliException(f'empty checkpoint \"{self.path}\"')
+        typcast_node(tree)
+        self.tree = tree
+        self.done = set(data['done'])
+        self.complete = bool(data['complete'])
+        self.resuming = not self.complete
+
+    def remove(self) -> None:
+        """remove the checkpoint file"""
+        if self.exists():
+            os.remove(self.path)
+
+
+class Checkpoint:
+    """
+    checkpoint of an indexing next to the catalog: the
+    storages to index and their attributes, each storage
+    being checkpointed in its own file (see StorageCheckpoint)
+    so that the ones indexed concurrently can be resumed and
+    the completed ones are not written again
+    """
+
+    def __init__(self, path: str, interval: float = INTERVAL) -> None:
+        """
+        @path: the checkpoint path
+        @interval: seconds between checkpoints, 0 to disable
+        """
+        self.path = path
+        self.interval = interval
+        # the (name, path) of the storages to index
+        self.storages: List[Tuple[str, str]] = []
+        self.attr: Any = ''
+
+    def exists(self) -> bool:
+        """does the checkpoint file exist"""
+        return os.path.exists(self.path)
+
+    def get_storage(self, idx: int) -> StorageCheckpoint:
+        """return the checkpoint of the storage at idx"""
+        return StorageCheckpoint(f'{self.path}.{idx}', self.interval)
+
+    def start(self, storages: List[Tuple[str, str]], attr: Any) -> bool:
+        """a new indexing of storages starts"""
+        self.remove()
+        self.storages = storages
+        self.attr = attr
+        if self.interval <= 0:
+            return False
+        data = {
+            'format': FORMAT,
+            'storages': self.storages,
+            'attr': self.attr,
+        }
+        return _dump(self.path, data)
+
+    def load(self) -> None:
+        """load the checkpoint, may raise CatcliException"""
+        data = _load(self.path)
+        self.storages = [tuple(x) for x in data['storages']]
+        self.attr = data['attr']
+
+    def remove(self) -> None:
+        """remove the checkpoint files"""
+        for path in glob.glob(f'{glob.escape(self.path)}.*'):
+            if path[len(self.path) + 1:].isdigit():
+                os.remove(path)
+        if self.exists():
+            os.remove(self.path)
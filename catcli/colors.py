@@ -27,17 +27,21 @@ class Colors:
     EMPH = '\033[33m'
     BOLD = '\033[1m'
     UND = '\033[4m'
+    ENABLED = True
 
     @classmethod
     def no_color(cls: Type[CLASSTYPE]) -> None:
         """disable colors"""
+        Colors.ENABLED = False
         Colors.RED = ''
         Colors.GREEN = ''
         Colors.YELLOW = ''
         Colors.PURPLE = ''
         Colors.BLUE = ''
         Colors.GRAY = ''
+        Colors.CYAN = ''
         Colors.MAGENTA = ''
+        Colors.WHITE = ''
         Colors.RESET = ''
         Colors.EMPH = ''
         Colors.BOLD = ''
@@ -0,0 +1,123 @@
+"""
+author: deadc0de6 (https://github.com/deadc0de6)
+Copyright (c) 2024, deadc0de6
+
+Catalog file compression helpers
+"""
+
+import io
+import os
+import bz2
+import gzip
+import lzma
+from typing import Optional, BinaryIO, TextIO, Any
+
+# local imports
+from catcli.exceptions import CatcliException
+
+
+NONE = 'none'
+GZIP = 'gzip'
+BZ2 = 'bz2'
+LZMA = 'lzma'
+
+COMPRESSIONS = [NONE, GZIP, BZ2, LZMA]
+
+# default compression levels
+LEVELS = {
+    GZIP: 6,
+    BZ2: 9,
+    LZMA: 6,
+}
+
+# valid compression levels
+LEVEL_RANGES = {
+    NONE: (0, 9),
+    GZIP: (0, 9),
+    BZ2: (1, 9),
+    LZMA: (0, 9),
+}
+
+EXTENSIONS = {
+    '.gz': GZIP,
+    '.gzip': GZIP,
+    '.bz2': BZ2,
+    '.xz': LZMA,
+    '.lzma': LZMA,
+}
+
+MAGICS = [
+    (b'\x1f\x8b', GZIP),
+    (b'BZh', BZ2),
+    (b'\xfd7zXZ\x00', LZMA),
+]
+MAGICLEN = max(len(x) for x, _ in MAGICS)
+
+
+def check(compression: str, level: Optional[int] = None) -> None:
+    """ensure compression and level are valid"""
+    if compression not in COMPRESSIONS:
+        raise CatcliException(f'bad compression: {compression}')
+    low, high = LEVEL_RANGES[compression]
+    if level is not None and not low <= level <= high:
+        raise CatcliException(f'bad {compression} compression level: '
+                              f'{level} (expected {low}-{high})')
+
+
+def from_extension(path: str) -> str:
+    """return the compression matching the path extension"""
+    ext = os.path.splitext(path)[1].lower()
+    return EXTENSIONS.get(ext, NONE)
+
+
+def detect(path: str) -> str:
+    """return the compression of a file based on its magic"""
+    with open(path, 'rb') as file:
+        head = file.read(MAGICLEN)
+    for magic, compression in MAGICS:
+        if head.startswith(magic):
+            return compression
+    return NONE
+
+
+def open_read(path: str) -> TextIO:
+    """open a possibly compressed file for reading text"""
+    compression = detect(path)
+    if compression == GZIP:
+        return gzip.open(path, 'rt', encoding='UTF-8')
+    if compression == BZ2:
+        return bz2.open(path, 'rt', encoding='UTF-8')
+    if compression == LZMA:
+        return lzma.open(path, 'rt', encoding='UTF-8')
+    return open(path, 'r', encoding='UTF-8')
+
+
+def wrap_write(raw: BinaryIO,
+               compression: str,
+               level: Optional[int] = None) -> io.TextIOWrapper:
+    """wrap a binary file for writing text through the compressor"""
+    check(compression, level)
+    lvl = LEVELS.get(compression, 0) if level is None else level
+    stream: Any = raw
+    if compression == GZIP:
+        # no timestamp for reproducible catalogs
+        stream = gzip.GzipFile(fileobj=raw, mode='wb',
+                               compresslevel=lvl, mtime=0)
+    elif compression == BZ2:
+        stream = bz2.BZ2File(raw, mode='wb', compresslevel=lvl)
+    elif compression == LZMA:
+        stream = lzma.LZMAFile(raw, mode='wb', preset=lvl)
+    return io.TextIOWrapper(stream, encoding='UTF-8')
+
+
+def finish_write(text: io.TextIOWrapper, raw: BinaryIO) -> None:
+    """
+    terminate the compressed stream and sync
+    the raw file to disk, raw is left open
+    """
+    text.flush()
+    stream = text.detach()
+    if stream is not raw:
+        stream.close()
+    raw.flush()
+    os.fsync(raw.fileno())
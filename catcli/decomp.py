@@ -5,16 +5,59 @@ Copyright (c) 2017, deadc0de6
 Catcli generic compressed data lister
 """
 
+import io
 import os
+import time
+import zlib
+import lzma
 import tarfile
 import zipfile
-from typing import List
+from functools import partial
+from typing import List, Tuple, Dict, Any, Optional, Callable, \
+    BinaryIO, IO
+
+# local imports
+from catcli import compress
+
+
+# an archive member: name, size, mtime and is it a directory
+Member = Tuple[str, int, float, bool]
+# the members of an archive and why the listing is incomplete if it is
+Listing = Tuple[List[Member], str]
+
+# limits of the listing of a single archive
+MAXMEMBERS = 1000000
+MAXTIME = 300.0
+# nested archives are read in memory
+MAXBYTES = 256 * 1024 * 1024
+
+# errors raised by a corrupted or truncated tar
+TARERRORS = (tarfile.TarError, EOFError, OSError,
+             zlib.error, lzma.LZMAError)
 
 
 class Decomp:
     """decompressor"""
 
-    def __init__(self) -> None:
+    def __init__(self,
+                 maxmembers: int = MAXMEMBERS,
+                 maxtime: float = MAXTIME,
+                 depth: int = 0,
+                 maxbytes: int = MAXBYTES) -> None:
+        """
+        @maxmembers: max number of members listed per archive (0: no limit)
+        @maxtime: max seconds spent listing an archive (0: no limit)
+        @depth: levels of archives within archives to list
+        @maxbytes: max bytes of nested archives read per archive
+        """
+        self.maxmembers = maxmembers
+        self.maxtime = maxtime
+        self.depth = depth
+        self.maxbytes = maxbytes
+        # why the last listing is incomplete if it is
+        self.truncated = ''
+        self._start = 0.0
+        self._budget = 0
         self.ext = {
             'tar': self._tar,
             'tgz': self._tar,
@@ -35,23 +78,150 @@ class Decomp:
 
     def get_names(self, path: str) -> List[str]:
         """get tree of compressed archive"""
-        ext = os.path.splitext(path)[1][1:].lower()
-        if ext in list(self.ext):
-            return self.ext[ext](path)
-        return []
+        return [x[0] for x in self.get_members(path)]
 
-    @staticmethod
-    def _tar(path: str) -> List[str]:
-        """return list of file names in tar"""
-        if not tarfile.is_tarfile(path):
-            return []
-        with tarfile.open(path, "r") as tar:
-            return tar.getnames()
+    def get_members(self, path: str) -> List[Member]:
+        """
+        return the members of a compressed archive,
+        see truncated when the limits are reached
+        """
+        self.truncated = ''
+        self._start = time.monotonic()
+        self._budget = self.maxbytes
+        members: List[Member] = []
+        self._list(path, None, '', self.depth, members)
+        return members
+
+    def get_limits(self) -> Dict[str, Any]:
+        """return the limits to build an identical decompressor"""
+        return {
+            'maxmembers': self.maxmembers,
+            'maxtime': self.maxtime,
+            'depth': self.depth,
+            'maxbytes': self.maxbytes,
+        }
+
+    def is_archive(self, name: str) -> bool:
+        """is name a supported archive"""
+        ext = os.path.splitext(name)[1][1:].lower()
+        return ext in self.ext
+
+    def _list(self, name: str, fileobj: Optional[BinaryIO],
+              prefix: str, depth: int, members: List[Member]) -> None:
+        """add the members of an archive file or stream"""
+        ext = os.path.splitext(name)[1][1:].lower()
+        if ext in self.ext:
+            self.ext[ext](name, fileobj, prefix, depth, members)
+
+    def _limited(self, members: List[Member]) -> bool:
+        """is one of the limits reached"""
+        if self.maxmembers and len(members) >= self.maxmembers:
+            self.truncated = f'more than {self.maxmembers} members'
+            return True
+        elapsed = time.monotonic() - self._start
+        if self.maxtime and elapsed >= self.maxtime:
+            self.truncated = f'listing took more than {self.maxtime}s'
+            return True
+        return False
+
+    def _nested(self, name: str, size: int,
+                opener: Callable[[], Optional[IO[bytes]]],
+                prefix: str, depth: int, members: List[Member]) -> None:
+        """
+        add the members of an archive within an archive,
+        read in memory within the bytes budget
+        """
+        if depth < 1 or not self.is_archive(name):
+            return
+        if size > self._budget:
+            self.truncated = self.truncated or \
+                f'nested archives over {self.maxbytes} bytes'
+            return
+        try:
+            stream = opener()
+            if not stream:
+                return
+            with stream:
+                data = stream.read(size)
+        except (*TARERRORS, zipfile.BadZipFile) as exc:
+            self.truncated = f'read error: {exc}'
+            return
+        except (RuntimeError, NotImplementedError):
+            # encrypted or unsupported zip member, indexed as a file
+            return
+        self._budget -= len(data)
+        self._list(name, io.BytesIO(data), f'{prefix}{name}/',
+                   depth - 1, members)
+
+    def _tar(self, path: str, fileobj: Optional[BinaryIO],
+             prefix: str, depth: int, members: List[Member]) -> None:
+        """add the members of a tar"""
+        try:
+            if fileobj:
+                tar = tarfile.open(fileobj=fileobj, mode='r:*')
+            elif compress.detect(path) == compress.NONE:
+                # a plain tar is seeked through
+                tar = self._open_tar(path)
+            else:
+                # a compressed one is decompressed as a stream
+                tar = tarfile.open(path, 'r|*')
+        except TARERRORS:
+            # not a tar archive
+            return
+        with tar:
+            while True:
+                try:
+                    info = tar.next()
+                except TARERRORS as exc:
+                    self.truncated = f'read error: {exc}'
+                    break
+                if info is None or self._limited(members):
+                    break
+                # do not keep every member in memory
+                tar.members = []  # type: ignore[attr-defined]
+                members.append((f'{prefix}{info.name}', info.size,
+                                float(info.mtime), info.isdir()))
+                if info.isfile():
+                    self._nested(info.name, info.size,
+                                 partial(tar.extractfile, info),
+                                 prefix, depth, members)
 
     @staticmethod
-    def _zip(path: str) -> List[str]:
-        """return list of file names in zip"""
-        if not zipfile.is_zipfile(path):
-            return []
-        with zipfile.ZipFile(path) as file:
-            return file.namelist()
+    def _open_tar(path: str) -> tarfile.TarFile:
+        """
+        open a tar without a known compression magic,
+        which may still be compressed (e.g. legacy lzma)
+        """
+        try:
+            return tarfile.open(path, 'r:')
+        except TARERRORS:
+            return tarfile.open(path, 'r|*')
+
+    def _zip(self, path: str, fileobj: Optional[BinaryIO],
+             prefix: str, depth: int, members: List[Member]) -> None:
+        """add the members of a zip"""
+        try:
+            file = zipfile.ZipFile(fileobj or path)
+        except (zipfile.BadZipFile, OSError):
+            return
+        with file:
+            for info in file.infolist():
+                if self._limited(members):
+                    break
+                members.append((f'{prefix}{info.filename}', info.file_size,
+                                time.mktime(info.date_time + (0, 0, -1)),
+                                info.is_dir()))
+                if not info.is_dir():
+                    self._nested(info.filename, info.file_size,
+                                 partial(file.open, info),
+                                 prefix, depth, members)
+
+
+def list_archive(path: str, limits: Dict[str, Any]) -> Listing:
+    """
+    list an archive content, run by the archive workers
+    @limits: the decompressor limits (see Decomp.get_limits)
+    """
+    decomp = Decomp(**limits)
+    members = decomp.get_members(path)
+    return members, decomp.truncated
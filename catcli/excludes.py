@@ -0,0 +1,145 @@
+"""
+author: deadc0de6 (https://github.com/deadc0de6)
+Copyright (c) 2024, deadc0de6
+
+gitignore-style exclude rules of the indexing
+"""
+
+import os
+import re
+import itertools
+from typing import List, Tuple, Optional, Pattern
+
+# local imports
+from catcli.logger import Logger
+
+
+# rules file at the root of a storage
+IGNOREFILE = '.catcliignore'
+
+# regex, negated, only matching directories
+Rule = Tuple[str, bool, bool]
+
+
+def _translate(pattern: str) -> str:
+    """translate a glob to a regex where only ** crosses /"""
+    res = []
+    i = 0
+    while i < len(pattern):
+        char = pattern[i]
+        i += 1
+        if char == '*':
+            if pattern.startswith('*/', i):
+                # **/ matches zero or more directories
+                res.append('(?:.*/)?')
+                i += 2
+            elif pattern.startswith('*', i):
+                res.append('.*')
+                i += 1
+            else:
+                res.append('[^/]*')
+        elif char == '?':
+            res.append('[^/]')
+        elif char == '[':
+            end = pattern.find(']', i + 1)
+            if end < 0:
+                res.append(re.escape(char))
+                continue
+            chars = pattern[i:end].replace('\\', '\\\\')
+            if chars.startswith('!'):
+                chars = '^' + chars[1:]
+            res.append(f'[{chars}]')
+            i = end + 1
+        elif char == '\\' and i < len(pattern):
+            res.append(re.escape(pattern[i]))
+            i += 1
+        else:
+            res.append(re.escape(char))
+    return ''.join(res)
+
+
+def parse_rule(line: str) -> Optional[Rule]:
+    """
+    parse a gitignore line:
+    * blank lines and lines starting with # are ignored
+    * ! negates the rule (the path is included)
+    * a trailing / only matches directories
+    * a rule with a / is relative to the storage root
+      otherwise it matches at any depth
+    * * and ? do not match /, ** matches across directories
+    """
+    line = line.rstrip('\n')
+    if not line.endswith('\\ '):
+        line = line.rstrip(' ')
+    if not line or line.startswith('#'):
+        return None
+    negated = line.startswith('!')
+    if negated:
+        line = line[1:]
+    dironly = line.endswith('/')
+    line = line.rstrip('/')
+    if not line:
+        return None
+    anchored = '/' in line
+    regex = _translate(line.lstrip('/'))
+    if not anchored:
+        regex = f'(?:.*/)?{regex}'
+    return regex, negated, dironly
+
+
+class Excludes:
+    """
+    match paths relative to the storage root against
+    gitignore-style rules, the last matching rule wins
+    """
+
+    def __init__(self, patterns: Optional[List[str]] = None) -> None:
+        """
+        @patterns: the rules, in the gitignore syntax
+        """
+        rules = [rule for rule in map(parse_rule, patterns or []) if rule]
+        self.cnt = len(rules)
+        # consecutive rules of the same kind are compiled together
+        # and tried from the last ones as the last match wins
+        self.groups: List[Tuple[Pattern[str], bool, bool]] = []
+        for (negated, dironly), group in itertools.groupby(
+                rules, key=lambda x: (x[1], x[2])):
+            regex = '|'.join(f'(?:{x[0]})' for x in group)
+            self.groups.append((re.compile(regex, re.DOTALL),
+                                negated, dironly))
+        self.groups.reverse()
+
+    @classmethod
+    def for_storage(cls, path: str,
+                    patterns: Optional[List[str]] = None) -> 'Excludes':
+        """
+        return the rules of the storage at path, the ones
+        of its rules file (if any) followed by patterns
+        """
+        lines = []
+        fpath = os.path.join(path, IGNOREFILE)
+        if os.path.isfile(fpath):
+            try:
+                with open(fpath, 'r', encoding='UTF-8') as file:
+                    lines = file.readlines()
+            except (OSError, UnicodeDecodeError) as exc:
+                Logger.err(f'Cannot read \"{fpath}\": {exc}')
+        return cls(lines + (patterns or []))
+
+    def __bool__(self) -> bool:
+        return self.cnt > 0
+
+    def match(self, path: str, isdir: bool = False) -> bool:
+        """
+        is the path excluded
+        @path: the path relative to the storage root
+        @isdir: the path is a directory
+        """
+        if os.sep != '/':
+            path = path.replace(os.sep, '/')
+        for regex, negated, dironly in self.groups:
+            if dironly and not isdir:
+                continue
+            if regex.fullmatch(path):
+                return not negated
+        return False
@@ -8,7 +8,8 @@ fuse for catcli
 import os
 from time import time
 from stat import S_IFDIR, S_IFREG
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, cast
+from anytree.resolver import ResolverError
 try:
     import fuse
 except ModuleNotFoundError:
@@ -16,8 +17,8 @@ except ModuleNotFoundError:
 
 # local imports
 from catcli.noder import Noder
-from catcli.nodes import NodeTop, NodeAny
-from catcli.nodes_utils import path_to_search_all, path_to_top
+from catcli.nodes import NodeTop, NodeAny, typcast_node
+from catcli.nodes_utils import path_to_search_all, path_to_top, resolve
 from catcli import nodes
 
 
@@ -49,22 +50,27 @@ class CatcliFilesystem(fuse.LoggingMixIn, fuse.Operations):  # type: ignore
     def _get_entry(self, path: str) -> Optional[NodeAny]:
         """return the node pointed by path"""
         path = path_to_top(path)
-        found = self.noder.list(self.top, path,
-                                rec=False,
-                                fmt='native',
-                                raw=True)
-        if found:
-            return found[0]
-        return None
+        try:
+            found = resolve(self.top, path)
+        except ResolverError:
+            return None
+        typcast_node(found)
+        return cast(NodeAny, found)
 
     def _get_entries(self, path: str) -> List[NodeAny]:
         """return nodes pointed by path"""
         path = path_to_search_all(path)
-        found = self.noder.list(self.top, path,
-                                rec=False,
-                                fmt='native',
-                                raw=True)
-        return found
+        try:
+            found = resolve(self.top, path)
+        except ResolverError:
+            return []
+        typcast_node(found)
+        if not found.may_have_children():
+            return [found]
+        entries = list(found.children)
+        for entry in entries:
+            typcast_node(entry)
+        return entries
 
     def _getattr(self, path: str) -> Dict[str, Any]:
         entry = self._get_entry(path)
@@ -75,8 +81,9 @@ class CatcliFilesystem(fuse.LoggingMixIn, fuse.Operations):  # type: ignore
         mode: Any = S_IFREG
         nodesize: int = 0
         if entry.type == nodes.TYPE_ARCHIVED:
-            mode = S_IFREG
+            mode = S_IFDIR if entry.children else S_IFREG
             nodesize = entry.nodesize
+            maccess = getattr(entry, 'maccess', 0.0) or maccess
         elif entry.type == nodes.TYPE_DIR:
             mode = S_IFDIR
             nodesize = entry.nodesize
@@ -0,0 +1,140 @@
+"""
+author: deadc0de6 (https://github.com/deadc0de6)
+Copyright (c) 2024, deadc0de6
+
+Hardlinked files tracking
+"""
+
+import os
+import threading
+from typing import Dict, Tuple, Optional, Callable, List, Any
+import anytree
+
+# local imports
+from catcli import nodes
+from catcli.nodes import NodeAny, NodeFile, typcast_node
+
+
+class Hardlinks:
+    """
+    track the files with more than one link so that
+    they are hashed once and only the first link indexed
+    accounts for the file size, the stat and hashing may
+    happen in concurrent threads
+    """
+
+    def __init__(self) -> None:
+        # path of a file being indexed to (inode, links count)
+        self.pending: Dict[str, Tuple[str, int]] = {}
+        # inode to the catalog path of its first link
+        self.firsts: Dict[str, str] = {}
+        # inode to its hash
+        self.hashes: Dict[str, str] = {}
+        # inode to the lock of its hashing
+        self.hashing: Dict[str, threading.Lock] = {}
+        self.lock = threading.Lock()
+
+    def reset(self) -> None:
+        """
+        forget the first links when indexing another storage,
+        a file is not a link of a file in another storage
+        """
+        with self.lock:
+            self.pending = {}
+            self.firsts = {}
+
+    def stated(self, path: str, stat: os.stat_result) -> Optional[str]:
+        """
+        a file was stat'ed, return its inode
+        if hardlinked, None otherwise
+        """
+        if stat.st_nlink < 2:
+            return None
+        inode = f'{stat.st_dev}:{stat.st_ino}'
+        with self.lock:
+            self.pending[path] = (inode, stat.st_nlink)
+        return inode
+
+    def get_hash(self, inode: str, hasher: Callable[[], str]) -> str:
+        """
+        return the hash of an inode, computed with hasher by
+        the first thread asking for it, the others waiting
+        """
+        with self.lock:
+            md5 = self.hashes.get(inode)
+            if md5 is not None:
+                return md5
+            ilock = self.hashing.setdefault(inode, threading.Lock())
+        with ilock:
+            with self.lock:
+                md5 = self.hashes.get(inode)
+            if md5 is None:
+                md5 = hasher()
+                with self.lock:
+                    self.hashes[inode] = md5
+        return md5
+
+    def added(self, node: NodeFile, path: str) -> Optional[str]:
+        """
+        record the links info on the node of the file at path,
+        return the catalog path of the first link if node
+        is an additional link
+        """
+        with self.lock:
+            link = self.pending.pop(path, None)
+        if not link:
+            return None
+        inode, nlink = link
+        node.nlink = nlink
+        node.inode = inode
+        fullpath = node.get_fullpath()
+        first = self.firsts.setdefault(inode, fullpath)
+        if first == fullpath:
+            return None
+        node.hardlink = first
+        return first
+
+    def load(self, top: NodeAny) -> None:
+        """record the first links already in the tree"""
+        for node in anytree.PreOrderIter(top):
+            typcast_node(node)
+            if node.type != nodes.TYPE_FILE or \
+                    not node.has_attr('inode') or is_hardlink(node):
+                continue
+            self.firsts[node.inode] = node.get_fullpath()
+
+    def promote(self, top: NodeAny) -> List[Tuple[NodeAny, Dict[str, Any]]]:
+        """
+        when the first link of an inode is no longer under top,
+        make the first remaining link the first one and point the
+        others to it, return the changed nodes and attributes
+        """
+        firsts: Dict[str, str] = {}
+        links: Dict[str, List[NodeFile]] = {}
+        for node in anytree.PreOrderIter(top):
+            typcast_node(node)
+            if node.type != nodes.TYPE_FILE or not node.has_attr('inode'):
+                continue
+            if is_hardlink(node):
+                links.setdefault(node.inode, []).append(node)
+            else:
+                firsts.setdefault(node.inode, node.get_fullpath())
+        changed: List[Tuple[NodeAny, Dict[str, Any]]] = []
+        for inode, others in links.items():
+            first = firsts.get(inode)
+            if not first:
+                node = others.pop(0)
+                del node.hardlink
+                first = node.get_fullpath()
+                changed.append((node, {'hardlink': None}))
+            for node in others:
+                if node.hardlink != first:
+                    node.hardlink = first
+                    changed.append((node, {'hardlink': first}))
+            self.firsts[inode] = first
+        return changed
+
+
+def is_hardlink(node: Any) -> bool:
+    """is node an additional link of a file (not its first)"""
+    return bool(getattr(node, 'hardlink', None))
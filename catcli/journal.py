@@ -0,0 +1,241 @@
+"""
+author: deadc0de6 (https://github.com/deadc0de6)
+Copyright (c) 2024, deadc0de6
+
+Append-only journal of the catalog tree changes
+"""
+
+import os
+import json
+from typing import List, Dict, Any, Optional, TextIO
+from anytree import AnyNode
+
+# local imports
+from catcli.nodes import NodeAny
+from catcli.exceptions import CatcliException
+
+
+OP_BASE = 'base'
+OP_ADD = 'add'
+OP_RM = 'rm'
+OP_MOD = 'mod'
+OP_SET = 'set'
+
+SUFFIX = '.journal'
+
+
+def get_node_path(node: NodeAny) -> List[str]:
+    """return the raw names from the storage down to the node"""
+    return [x.name for x in node.path[1:]]
+
+
+def get_node_attrs(node: NodeAny) -> Dict[str, Any]:
+    """return the attributes of a node to record"""
+    return {k: v for k, v in node.__dict__.items()
+            if not k.startswith('_') and k != 'name'}
+
+
+class Journal:
+    """
+    records the changes made to the tree as json lines
+    each record refers to a node by its path of names
+    from the top node:
+    * add: a new node (that replaces any node with the same name)
+    * mod: a node that changed (removed and added back)
+    * rm: a removed node (and its children)
+    * set: changed attributes of an existing node
+    the first line holds the size of the base catalog
+    the journal applies to
+    """
+
+    def __init__(self, path: str) -> None:
+        """
+        @path: the journal path
+        """
+        self.path = path
+        self.records: List[Dict[str, Any]] = []
+
+    def added(self, node: NodeAny) -> None:
+        """record a new node"""
+        path = get_node_path(node)
+        record = {'op': OP_ADD, 'path': path,
+                  'attrs': get_node_attrs(node)}
+        if self.records:
+            last = self.records[-1]
+            if last['op'] == OP_RM and last['path'] == path:
+                # a node removed and added back was modified
+                record['op'] = OP_MOD
+                self.records.pop()
+        self.records.append(record)
+
+    def removed(self, node: NodeAny) -> None:
+        """record a removed node"""
+        self.records.append({'op': OP_RM, 'path': get_node_path(node)})
+
+    def changed(self, node: NodeAny, attrs: Dict[str, Any]) -> None:
+        """record changed attributes of a node"""
+        self.records.append({'op': OP_SET, 'path': get_node_path(node),
+                             'attrs': attrs})
+
+    def exists(self) -> bool:
+        """does the journal file exist"""
+        return os.path.exists(self.path)
+
+    def size(self) -> int:
+        """return the journal file size"""
+        if not self.exists():
+            return 0
+        return os.path.getsize(self.path)
+
+    def remove(self) -> None:
+        """remove the journal file"""
+        if self.exists():
+            os.remove(self.path)
+
+    def matches(self, basesize: int) -> bool:
+        """
+        does the journal header match the catalog
+        @basesize: size of the catalog
+        """
+        with open(self.path, 'r', encoding='UTF-8') as file:
+            line = file.readline()
+        try:
+            header = json.loads(line)
+        except json.JSONDecodeError:
+            return False
+        return isinstance(header, dict) and \
+            header.get('op') == OP_BASE and header.get('size') == basesize
+
+    def dump(self, path: str) -> int:
+        """
+        append the pending changes of the files to a file,
+        the storage metadata records (free, total, ts)
+        are left out
+        """
+        lines = [json.dumps(rec, separators=(',', ':'))
+                 for rec in self.records
+                 if rec['op'] != OP_SET or len(rec['path']) > 1]
+        if not lines:
+            return 0
+        with open(path, 'a', encoding='UTF-8') as file:
+            self._write(file, lines)
+        return len(lines)
+
+    def write(self, basesize: int) -> int:
+        """
+        append the pending records to the journal
+        and return the number of records written,
+        raises CatcliException if the journal does not
+        apply to the catalog anymore
+        @basesize: size of the catalog the journal applies to
+        """
+        lines = []
+        if self.exists() and not self.matches(basesize):
+            # its changes would be ignored on load
+            raise CatcliException('journal does not match the catalog')
+        if not self.exists():
+            header = {'op': OP_BASE, 'size': basesize}
+            lines.append(json.dumps(header, separators=(',', ':')))
+        lines.extend(json.dumps(rec, separators=(',', ':'))
+                     for rec in self.records)
+        with open(self.path, 'a', encoding='UTF-8') as file:
+            self._write(file, lines)
+        cnt = len(self.records)
+        self.records = []
+        return cnt
+
+    @staticmethod
+    def _write(file: TextIO, lines: List[str]) -> None:
+        """write the lines at once and sync"""
+        if not lines:
+            return
+        lines.append('')
+        file.write('\n'.join(lines))
+        file.flush()
+        os.fsync(file.fileno())
+
+    def replay(self, top: NodeAny, basesize: int) -> int:
+        """
+        apply the journal to the tree
+        and return the number of records applied
+        @top: the top node of the base catalog
+        @basesize: size of the base catalog
+        """
+        with open(self.path, 'r', encoding='UTF-8') as file:
+            return _Replayer(top).run(file, basesize)
+
+
+class _Replayer:
+    """apply journal records to a tree"""
+
+    def __init__(self, top: NodeAny) -> None:
+        """
+        @top: the top node
+        """
+        self.top = top
+        # children by name of the visited nodes
+        self.index: Dict[AnyNode, Dict[str, AnyNode]] = {}
+
+    def run(self, file: TextIO, basesize: int) -> int:
+        """apply all records read from file"""
+        cnt = 0
+        for lnr, line in enumerate(file):
+            try:
+                rec = json.loads(line)
+            except json.JSONDecodeError as exc:
+                if not line.endswith('\n'):
+                    # interrupted write, the records were never committed
+                    break
+                raise CatcliException(f'bad journal line {lnr + 1}: '
+                                      f'{exc}') from exc
+            if lnr == 0:
+                if rec.get('op') != OP_BASE or rec.get('size') != basesize:
+                    raise CatcliException('journal does not '
+                                          'match the catalog')
+                continue
+            self._apply(rec)
+            cnt += 1
+        return cnt
+
+    def _children(self, node: AnyNode) -> Dict[str, AnyNode]:
+        """return the children of a node by name"""
+        children = self.index.get(node)
+        if children is None:
+            children = {x.name: x for x in node.children}
+            self.index[node] = children
+        return children
+
+    def _resolve(self, path: List[str]) -> Optional[AnyNode]:
+        """return the node at path"""
+        node = self.top
+        for name in path:
+            found = self._children(node).get(name)
+            if found is None:
+                return None
+            node = found
+        return node
+
+    def _apply(self, rec: Dict[str, Any]) -> None:
+        """apply a single record"""
+        path = rec['path']
+        if rec['op'] == OP_SET:
+            node = self._resolve(path)
+            if node is not None:
+                node.__dict__.update(rec['attrs'])
+            return
+        if not path:
+            raise CatcliException(f'bad journal record: {rec}')
+        parent = self._resolve(path[:-1])
+        if parent is None:
+            return
+        children = self._children(parent)
+        old = children.pop(path[-1], None)
+        if old is not None:
+            old.parent = None
+        if rec['op'] in [OP_ADD, OP_MOD]:
+            node = AnyNode(parent=parent)
+            node.__dict__.update(rec['attrs'])
+            node.name = path[-1]
+            children[path[-1]] = node
+        elif rec['op'] != OP_RM:
+            raise CatcliException(f'bad journal record: {rec}')
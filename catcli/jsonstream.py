@@ -0,0 +1,284 @@
+"""
+author: deadc0de6 (https://github.com/deadc0de6)
+Copyright (c) 2024, deadc0de6
+
+Streaming json serialization of the catalog tree
+"""
+
+import re
+import json
+from json.decoder import scanstring  # type: ignore[attr-defined]
+from typing import List, Tuple, Dict, Any, Callable, TextIO, Optional, \
+    NoReturn
+from anytree import AnyNode
+
+# local imports
+from catcli.nodes import NodeAny
+from catcli.exceptions import CatcliException
+
+
+# anytree internal attributes
+NODEMIXIN_ATTRS = ('_NodeMixin__children', '_NodeMixin__parent')
+WHITESPACES = re.compile(r'[ \t\n\r]*')
+DELIMITERS = ',]} \t\n\r'
+
+
+class JsonStreamWriter:
+    """
+    write a tree to json node by node
+    the output is identical to the anytree JsonExporter
+    with indent=2 and sort_keys=True
+    """
+
+    INDENT = '  '
+
+    def __init__(self,
+                 attriter: Optional[Callable[[List[Tuple[str, Any]]],
+                                             List[Tuple[str, Any]]]] = None
+                 ) -> None:
+        """
+        @attriter: attribute filtering/renaming function
+        """
+        self.attriter = attriter
+
+    def write(self, top: NodeAny, file: TextIO) -> int:
+        """write the tree to file and return the number of nodes"""
+        return self._write_node(top, file, 0)
+
+    def _get_attrs(self, node: NodeAny) -> List[Tuple[str, Any]]:
+        """return the node attributes to serialize"""
+        attrs = [(k, v) for k, v in node.__dict__.items()
+                 if k not in NODEMIXIN_ATTRS]
+        if self.attriter:
+            attrs = self.attriter(attrs)
+        return attrs
+
+    @staticmethod
+    def _encode(val: Any, newline: str) -> str:
+        """encode a single attribute value"""
+        if isinstance(val, (dict, list, tuple)):
+            value = json.dumps(val, indent=2, sort_keys=True)
+            return value.replace('\n', newline)
+        # scalars do not need the slower indenting encoder
+        return json.dumps(val)
+
+    def _write_node(self, node: NodeAny, file: TextIO, level: int) -> int:
+        """serialize a node and its children"""
+        cnt = 1
+        pre = self.INDENT * (level + 1)
+        newline = '\n' + pre
+        attrs = self._get_attrs(node)
+        children = node.children
+        if children:
+            attrs.append(('children', None))
+        attrs.sort(key=lambda x: x[0])
+
+        file.write('{')
+        for idx, (key, val) in enumerate(attrs):
+            if idx:
+                file.write(',')
+            file.write(f'{newline}{json.dumps(key)}: ')
+            if key != 'children' or val is not None:
+                file.write(self._encode(val, newline))
+                continue
+            # children are streamed one by one
+            file.write('[')
+            subpre = newline + self.INDENT
+            for cidx, child in enumerate(children):
+                if cidx:
+                    file.write(',')
+                file.write(subpre)
+                cnt += self._write_node(child, file, level + 2)
+            file.write(f'{newline}]')
+        file.write('\n' + self.INDENT * level + '}')
+        return cnt
+
+
+class JsonStreamReader:
+    """
+    read a tree from json node by node
+    only the tree nodes and a bounded read buffer are
+    kept in memory, the json document never is
+    """
+
+    CHUNKSIZE = 1024 * 1024
+
+    def __init__(self,
+                 backattr: Optional[Callable[[Dict[str, Any]],
+                                             Dict[str, Any]]] = None,
+                 chunksize: int = CHUNKSIZE) -> None:
+        """
+        @backattr: attribute renaming function
+        @chunksize: size of the chunks read from the file
+        """
+        self.backattr = backattr
+        self.chunksize = chunksize
+        self.decoder = json.JSONDecoder()
+        self.file: Optional[TextIO] = None
+        self.buf = ''
+        self.pos = 0
+        self.eof = False
+        self.cnt = 0
+
+    def read(self, file: TextIO) -> AnyNode:
+        """parse the tree from file and return its root"""
+        self.file = file
+        self.buf = ''
+        self.pos = 0
+        self.eof = False
+        self.cnt = 0
+        root = self._read_node(None)
+        if self._peek():
+            self._fail('extra data')
+        self.file = None
+        self.buf = ''
+        return root
+
+    def _fail(self, msg: str) -> NoReturn:
+        """raise a parsing error"""
+        raise CatcliException(f'bad json catalog: {msg} '
+                              f'(node {self.cnt})')
+
+    def _fill(self) -> bool:
+        """read the next chunk, return False on eof"""
+        if self.eof or not self.file:
+            return False
+        data = self.file.read(self.chunksize)
+        if not data:
+            self.eof = True
+            return False
+        self.buf = self.buf[self.pos:] + data
+        self.pos = 0
+        return True
+
+    def _peek(self) -> str:
+        """skip whitespaces and return the next char"""
+        while True:
+            match = WHITESPACES.match(self.buf, self.pos)
+            if match:
+                self.pos = match.end()
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self._fill():
+                return ''
+
+    def _expect(self, char: str) -> None:
+        """consume the expected char"""
+        if self._peek() != char:
+            self._fail(f'expecting "{char}"')
+        self.pos += 1
+
+    def _read_key(self) -> str:
+        """read an object key"""
+        self._expect('"')
+        while True:
+            try:
+                key, end = scanstring(self.buf, self.pos)
+                break
+            except json.JSONDecodeError as exc:
+                if not self._fill():
+                    self._fail(exc.msg)
+        self.pos = end
+        self._expect(':')
+        return str(key)
+
+    def _read_value(self) -> Any:
+        """read any non-children value"""
+        self._peek()
+        while True:
+            try:
+                val, end = self.decoder.raw_decode(self.buf, self.pos)
+                # a number cut by the end of the
+                # buffer may look like a valid one
+                if end < len(self.buf) and self.buf[end] in DELIMITERS:
+                    break
+                if not self._fill():
+                    break
+            except json.JSONDecodeError as exc:
+                if not self._fill():
+                    self._fail(exc.msg)
+        self.pos = end
+        return val
+
+    def _read_children(self, parent: AnyNode) -> None:
+        """read the list of children nodes"""
+        self._expect('[')
+        if self._peek() == ']':
+            self.pos += 1
+            return
+        while True:
+            self._read_node(parent)
+            char = self._peek()
+            self.pos += 1
+            if char == ']':
+                return
+            if char != ',':
+                self._fail('expecting "," or "]"')
+
+    def _is_leaf(self) -> bool:
+        """
+        does the object at the current position
+        look like a node without children
+        """
+        while True:
+            end = self.buf.find('}', self.pos)
+            if end >= 0:
+                break
+            if not self._fill():
+                return False
+        start = self.pos + 1
+        return self.buf.find('[', start, end) < 0 and \
+            self.buf.find('{', start, end) < 0
+
+    def _to_node(self, data: Dict[str, Any],
+                 parent: Optional[AnyNode]) -> AnyNode:
+        """create a node from an already decoded object"""
+        if 'parent' in data:
+            self._fail('unexpected "parent" attribute')
+        children = data.pop('children', [])
+        node = AnyNode(parent=parent)
+        self.cnt += 1
+        if self.backattr:
+            data = self.backattr(data)
+        node.__dict__.update(data)
+        for child in children:
+            self._to_node(child, node)
+        return node
+
+    def _read_node(self, parent: Optional[AnyNode]) -> AnyNode:
+        """read a node and its children"""
+        if self._peek() == '{' and self._is_leaf():
+            # most nodes are leaves (files), decode
+            # them at once with the C decoder
+            try:
+                data, end = self.decoder.raw_decode(self.buf, self.pos)
+                self.pos = end
+                return self._to_node(data, parent)
+            except json.JSONDecodeError:
+                # a string containing "}", parse it the slow way
+                pass
+        self._expect('{')
+        node = AnyNode(parent=parent)
+        self.cnt += 1
+        attrs = {}
+        if self._peek() == '}':
+            self.pos += 1
+            return node
+        while True:
+            key = self._read_key()
+            if key == 'children':
+                self._read_children(node)
+            elif key == 'parent':
+                self._fail('unexpected "parent" attribute')
+            else:
+                attrs[key] = self._read_value()
+            char = self._peek()
+            self.pos += 1
+            if char == '}':
+                break
+            if char != ',':
+                self._fail('expecting "," or "}"')
+        if self.backattr:
+            attrs = self.backattr(attrs)
+        node.__dict__.update(attrs)
+        return node
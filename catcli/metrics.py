@@ -0,0 +1,109 @@
+"""
+author: deadc0de6 (https://github.com/deadc0de6)
+Copyright (c) 2024, deadc0de6
+
+Phase timers and counters of index/update
+"""
+
+import json
+import time
+import threading
+from typing import Dict, Any, List, Iterator
+from contextlib import contextmanager
+
+# local imports
+from catcli.utils import size_to_str
+
+
+# phases
+LOAD = 'load'
+WALK = 'walk'
+STAT = 'stat'
+HASH = 'hash'
+ARCHIVES = 'archives'
+FIXSIZES = 'fixsizes'
+SAVE = 'save'
+PHASES = [LOAD, WALK, STAT, HASH, ARCHIVES, FIXSIZES, SAVE]
+
+# counters
+FILES = 'files'
+DIRS = 'dirs'
+HASHED = 'bytes_hashed'
+LISTED = 'archives_listed'
+
+
+class Metrics:
+    """
+    accumulate the time spent in each phase and counters,
+    the phases may overlap (stat and hash are part of walk)
+    and may be recorded from concurrent threads
+    """
+
+    def __init__(self) -> None:
+        self.timers: Dict[str, float] = {}
+        self.counters: Dict[str, int] = {}
+        self.lock = threading.Lock()
+
+    def add_time(self, phase: str, duration: float) -> None:
+        """add time spent in a phase"""
+        with self.lock:
+            self.timers[phase] = self.timers.get(phase, 0.0) + duration
+
+    def add(self, counter: str, value: int = 1) -> None:
+        """increment a counter"""
+        with self.lock:
+            self.counters[counter] = self.counters.get(counter, 0) + value
+
+    @contextmanager
+    def timer(self, phase: str) -> Iterator[None]:
+        """time the enclosed block"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(phase, time.perf_counter() - start)
+
+    def merge(self, other: Dict[str, Any]) -> None:
+        """add the metrics of another run (see to_dict)"""
+        for phase, duration in other.get('timers', {}).items():
+            self.add_time(phase, duration)
+        for counter, value in other.get('counters', {}).items():
+            self.add(counter, value)
+
+    def get_rates(self) -> Dict[str, float]:
+        """return the walking throughput"""
+        walk = self.timers.get(WALK, 0.0)
+        if not walk:
+            return {}
+        return {
+            'files_per_sec': self.counters.get(FILES, 0) / walk,
+            'dirs_per_sec': self.counters.get(DIRS, 0) / walk,
+        }
+
+    def to_dict(self) -> Dict[str, Any]:
+        """return the metrics as a dict"""
+        return {
+            'timers': dict(self.timers),
+            'counters': dict(self.counters),
+            'rates': self.get_rates(),
+        }
+
+    def summary(self) -> List[str]:
+        """return a human readable summary"""
+        lines = []
+        for phase in PHASES:
+            if phase in self.timers:
+                lines.append(f'{phase:>16}: {self.timers[phase]:.3f}s')
+        for counter, value in sorted(self.counters.items()):
+            if counter == HASHED:
+                lines.append(f'{counter:>16}: {size_to_str(value, False)}')
+                continue
+            lines.append(f'{counter:>16}: {value}')
+        for rate, speed in self.get_rates().items():
+            lines.append(f'{rate:>16}: {speed:.1f}')
+        return lines
+
+    def dump(self, path: str) -> None:
+        """write the metrics to path as json"""
+        with open(path, 'w', encoding='UTF-8') as file:
+            json.dump(self.to_dict(), file, indent=2, sort_keys=True)
@@ -8,8 +8,12 @@ Class that process nodes in the catalog tree
 import os
 import shutil
 import time
+import threading
+import multiprocessing
+from functools import partial
 from typing import List, Union, Tuple, Any, Optional, Dict, cast
 import fnmatch
+from concurrent.futures import ProcessPoolExecutor, Future
 import anytree
 from natsort import os_sort_keygen
 
@@ -18,15 +22,34 @@ from catcli import nodes
 from catcli.nodes import NodeAny, NodeStorage, \
     NodeTop, NodeFile, NodeArchived, NodeDir, NodeMeta, \
     typcast_node
+from catcli.nodes_utils import resolve, glob, is_glob
 from catcli.utils import md5sum
 from catcli.logger import Logger
+from catcli.outbuffer import OutBuffer
 from catcli.printer_native import NativePrinter
 from catcli.printer_csv import CsvPrinter
-from catcli.decomp import Decomp
+from catcli.printer_jsonl import JsonlPrinter
+from catcli.decomp import Decomp, Member, Listing, list_archive
+from catcli.archcache import ArchiveCache
+from catcli.metrics import Metrics
+from catcli.throttle import IOLimit
+from catcli.hardlinks import Hardlinks, is_hardlink
+from catcli import metrics
+from catcli.journal import Journal
 from catcli.version import __version__ as VERSION
 from catcli.exceptions import CatcliException
 
 
+# size, md5 and maccess of a file
+FileInfo = Tuple[int, str, float]
+
+
+# start method of the processes listing archives, the pool is
+# created from the scanning threads and forking a multi-threaded
+# process may deadlock
+ARC_START_METHOD = 'forkserver'
+
+
 class Noder:
     """
     handles node in the catalog tree
@@ -40,20 +63,46 @@ class Noder:
 
     def __init__(self, debug: bool = False,
                  sortsize: bool = False,
-                 arc: bool = False) -> None:
+                 arc: bool = False,
+                 arcworkers: int = 0,
+                 arccache: Optional[ArchiveCache] = None,
+                 arcdepth: int = 0,
+                 iolimit: Optional[IOLimit] = None) -> None:
         """
         @debug: debug mode
         @sortsize: sort nodes by size
         @arch: handle archive
+        @arcworkers: number of processes listing archives,
+                     0 or 1 to list them inline
+        @arccache: cache of the archives listing
+        @arcdepth: levels of archives within archives to list
+        @iolimit: the I/O budget of stat and hashing
         """
         self.hash = True
         self.debug = debug
         self.sortsize = sortsize
         self.arc = arc
+        # the tree was changed and needs to be saved
+        self.dirty = False
+        # where to record the changes if any
+        self.journal: Optional[Journal] = None
+        # phase timers and counters
+        self.metrics = Metrics()
+        self.iolimit = iolimit or IOLimit()
+        self.hardlinks = Hardlinks()
         if self.arc:
-            self.decomp = Decomp()
-        self.csv_printer = CsvPrinter()
-        self.native_printer = NativePrinter()
+            self.decomp = Decomp(depth=arcdepth)
+        self.arcworkers = arcworkers
+        self.arccache = arccache
+        self.arcpool: Optional[ProcessPoolExecutor] = None
+        self.arclock = threading.Lock()
+        # archives being listed by the workers
+        self.pending: List[Tuple[NodeFile, str, FileInfo,
+                                 'Future[Listing]']] = []
+        self.out = OutBuffer()
+        self.csv_printer = CsvPrinter(out=self.out)
+        self.native_printer = NativePrinter(out=self.out)
+        self.jsonl_printer = JsonlPrinter(out=self.out)
 
     @staticmethod
     def get_storage_names(top: NodeTop) -> List[str]:
@@ -79,17 +128,20 @@ class Noder:
             storage.free = shutil.disk_usage(newpath).free
             storage.total = shutil.disk_usage(newpath).total
             storage.ts = int(time.time())
+            if self.journal:
+                attrs = {'free': storage.free, 'total': storage.total,
+                         'ts': storage.ts}
+                self.journal.changed(storage, attrs)
 
     @staticmethod
     def get_node(top: NodeTop,
                  path: str,
                  quiet: bool = False) -> Optional[NodeAny]:
         """get the node by internal tree path"""
-        resolv = anytree.resolver.Resolver('name')
         bpath = ''
         try:
             bpath = os.path.basename(path)
-            the_node = resolv.get(top, bpath)
+            the_node = resolve(top, bpath)
             typcast_node(the_node)
             return cast(NodeAny, the_node)
         except anytree.resolver.ChildResolverError:
@@ -116,6 +168,7 @@ class Noder:
         if os.path.isdir(path):
             return node, False
         # force re-indexing if no maccess
+        self.iolimit.on_stat()
         maccess = os.path.getmtime(path)
         if not node.has_attr('maccess') or \
                 not node.maccess:
@@ -128,7 +181,7 @@ class Noder:
             return node, True
         # test hash
         if self.hash and node.md5:
-            md5 = self._get_hash(path)
+            md5 = self._get_hash(path, node.nodesize)
             if md5 and md5 != node.md5:
                 msg = f'\tchange: checksum changed for \"{path}\"'
                 self._debug(msg)
@@ -167,51 +220,162 @@ class Noder:
         self._debug(f'new top node: {top}')
         return top
 
-    def new_file_node(self, name: str, path: str,
-                      parent: NodeAny) -> Optional[NodeFile]:
-        """create a new node representing a file"""
+    def get_file_info(self, path: str) -> Optional[FileInfo]:
+        """
+        return the size, md5 and maccess of a file
+        this does all the file I/O of new_file_node
+        and may be called from concurrent threads
+        """
         if not os.path.exists(path):
             Logger.err(f'File \"{path}\" does not exist')
             return None
         path = os.path.abspath(path)
+        self.iolimit.on_stat()
+        start = time.perf_counter()
         try:
             stat = os.lstat(path)
         except OSError as exc:
             Logger.err(f'OSError: {exc}')
             return None
+        maccess = os.path.getmtime(path)
+        self.metrics.add_time(metrics.STAT, time.perf_counter() - start)
         md5 = ''
-        if self.hash:
-            md5 = self._get_hash(path)
+        inode = self.hardlinks.stated(path, stat)
+        if self.hash and inode:
+            # hash the hardlinked files once
+            md5 = self.hardlinks.get_hash(
+                inode, partial(self._get_hash, path, stat.st_size))
+        elif self.hash:
+            md5 = self._get_hash(path, stat.st_size)
+        return stat.st_size, md5, maccess
 
-        maccess = os.path.getmtime(path)
+    def new_file_node(self, name: str, path: str,
+                      parent: NodeAny,
+                      info: Optional[FileInfo] = None) -> Optional[NodeFile]:
+        """
+        create a new node representing a file
+        @info: the file info if already known (see get_file_info)
+        """
+        if not info:
+            info = self.get_file_info(path)
+        if not info:
+            return None
+        path = os.path.abspath(path)
+        size, md5, maccess = info
         node = NodeFile(name,
-                        stat.st_size,
+                        size,
                         md5,
                         maccess,
                         parent=parent)
+        first = self.hardlinks.added(node, path)
+        if first:
+            self._debug(f'{path} is a hardlink to {first}')
+        self._added(node)
+        self.metrics.add(metrics.FILES)
         if self.arc:
             ext = os.path.splitext(path)[1][1:]
             if ext.lower() in self.decomp.get_formats():
                 self._debug(f'{path} is an archive')
-                names = self.decomp.get_names(path)
-                self.list_to_tree(node, names)
+                self._list_archive(node, path, info)
             else:
                 self._debug(f'{path} is NOT an archive')
         return node
 
+    def _list_archive(self, node: NodeFile,
+                      path: str, info: FileInfo) -> None:
+        """
+        add the archive content under its node, from the cache,
+        or listed by the workers (see attach_archives) or inline
+        """
+        size, md5, maccess = info
+        if self.arccache:
+            listing = self.arccache.get(path, size, maccess, md5,
+                                        limits=self.decomp.get_limits())
+            if listing is not None:
+                self._debug(f'{path} listing found in cache')
+                self._add_listing(node, path, listing)
+                return
+        if self.arcworkers > 1:
+            future = self._get_arcpool().submit(list_archive, path,
+                                                self.decomp.get_limits())
+            self.pending.append((node, path, info, future))
+            return
+        try:
+            with self.metrics.timer(metrics.ARCHIVES):
+                members = self.decomp.get_members(path)
+        except Exception as exc:  # pylint: disable=W0718
+            Logger.err(f'Cannot list archive \"{path}\": {exc}')
+            return
+        self._archive_listed(node, path, info,
+                             (members, self.decomp.truncated))
+
+    def _archive_listed(self, node: NodeFile, path: str,
+                        info: FileInfo, listing: Listing) -> None:
+        """cache the archive content and add it under its node"""
+        self.metrics.add(metrics.LISTED)
+        if self.arccache:
+            size, md5, maccess = info
+            self.arccache.put(path, size, maccess, md5, listing,
+                              limits=self.decomp.get_limits())
+        self._add_listing(node, path, listing)
+
+    def _add_listing(self, node: NodeFile, path: str,
+                     listing: Listing) -> None:
+        """add the archive content under its node"""
+        members, truncated = listing
+        if truncated:
+            Logger.err(f'Archive \"{path}\" partially indexed '
+                       f'({len(members)} members): {truncated}')
+        self.list_to_tree(node, members)
+
+    def _get_arcpool(self) -> ProcessPoolExecutor:
+        """return the pool of processes listing archives"""
+        with self.arclock:
+            if not self.arcpool:
+                ctx = None
+                if ARC_START_METHOD in multiprocessing.get_all_start_methods():
+                    ctx = multiprocessing.get_context(ARC_START_METHOD)
+                self.arcpool = ProcessPoolExecutor(
+                    max_workers=self.arcworkers, mp_context=ctx)
+            return self.arcpool
+
+    def attach_archives(self) -> None:
+        """wait for the archives listed by the workers and add them"""
+        pending = self.pending
+        self.pending = []
+        for node, path, info, future in pending:
+            try:
+                with self.metrics.timer(metrics.ARCHIVES):
+                    listing = future.result()
+            except Exception as exc:  # pylint: disable=W0718
+                Logger.err(f'Cannot list archive \"{path}\": {exc}')
+                continue
+            self._archive_listed(node, path, info, listing)
+        if self.arcpool:
+            self.arcpool.shutdown()
+            self.arcpool = None
+
     def new_dir_node(self, name: str, path: str,
-                     parent: NodeAny) -> NodeDir:
-        """create a new node representing a directory"""
-        path = os.path.abspath(path)
-        maccess = os.path.getmtime(path)
-        return NodeDir(name,
+                     parent: NodeAny,
+                     maccess: Optional[float] = None) -> NodeDir:
+        """
+        create a new node representing a directory
+        @maccess: the directory mtime if already known
+        """
+        if maccess is None:
+            path = os.path.abspath(path)
+            maccess = os.path.getmtime(path)
+        node = NodeDir(name,
                        0,
                        maccess,
                        parent=parent)
+        self._added(node)
+        self.metrics.add(metrics.DIRS)
+        return node
 
     def new_storage_node(self, name: str,
                          path: str,
-                         parent: str,
+                         parent: Optional[NodeTop],
                          attrs: Dict[str, Any]) \
             -> NodeStorage:
         """create a new node representing a storage"""
@@ -219,22 +383,32 @@ class Noder:
         free = shutil.disk_usage(path).free
         total = shutil.disk_usage(path).total
         epoch = int(time.time())
-        return NodeStorage(name,
+        node = NodeStorage(name,
                            free,
                            total,
                            0,
                            epoch,
                            self.attrs_to_string(attrs),
                            parent=parent)
+        self._added(node)
+        return node
 
     def new_archive_node(self,
                          name: str,
                          parent: str,
                          archive: str) -> NodeArchived:
         """create a new node for archive data"""
-        return NodeArchived(name=name,
+        node = NodeArchived(name=name,
                             parent=parent, nodesize=0, md5='',
                             archive=archive)
+        self._added(node)
+        return node
+
+    def _added(self, node: NodeAny) -> None:
+        """a node was added to the tree"""
+        self.dirty = True
+        if self.journal and node.parent is not None:
+            self.journal.added(node)
 
     ###############################################################
     # node management
@@ -262,6 +436,13 @@ class Noder:
         except StopIteration:
             return None
 
+    def rm_node(self, node: NodeAny) -> None:
+        """detach a node (and its children) from the tree"""
+        if self.journal and node.parent is not None:
+            self.journal.removed(node)
+        node.parent = None
+        self.dirty = True
+
     def clean_not_flagged(self, top: NodeTop) -> int:
         """remove any node not flagged and clean flags"""
         cnt = 0
@@ -276,7 +457,7 @@ class Noder:
     def _clean(self, node: NodeAny) -> bool:
         """remove node if not flagged"""
         if not node.flagged():
-            node.parent = None
+            self.rm_node(node)
             return True
         node.unflag()
         return False
@@ -308,6 +489,7 @@ class Noder:
                                         raw=raw)
 
     def _print_node_du(self, node: NodeAny,
+                       fmt: str = 'native',
                        raw: bool = False) -> None:
         """
         print node du style
@@ -316,7 +498,10 @@ class Noder:
         thenodes = self._get_entire_tree(node,
                                          dironly=True)
         for thenode in thenodes:
-            self.native_printer.print_du(thenode, raw=raw)
+            if fmt == 'jsonl':
+                self.jsonl_printer.print_node(thenode)
+            else:
+                self.native_printer.print_du(thenode, raw=raw)
 
     def _print_node_native(self, node: NodeAny,
                            pre: str = '',
@@ -386,6 +571,13 @@ class Noder:
             # csv output
             self.csv_printer.print_header()
             self._print_nodes_csv(node, raw=raw)
+        elif fmt == 'jsonl':
+            # json lines output
+            rend = anytree.RenderTree(node, childiter=self._sort_tree)
+            for _, _, item in rend:
+                typcast_node(item)
+                self.jsonl_printer.print_node(item)
+        self.out.flush()
 
     def _print_nodes_csv(self, node: NodeAny,
                          raw: bool = False) -> None:
@@ -470,16 +662,31 @@ class Noder:
         if startnode:
             start = self.get_node(top, startnode)
         filterfunc = self._callback_find_name(key, only_dir)
-        found = anytree.findall(start, filter_=filterfunc)
-        self._debug(f'found {len(found)} node(s)')
+        found = anytree.PreOrderIter(start, filter_=filterfunc)
 
-        # compile found nodes
+        # compile found nodes and print
+        # them as they are found
         paths = {}
+        if fmt == 'csv-with-header':
+            self.csv_printer.print_header()
         for item in found:
             typcast_node(item)
             item.set_name(item.get_name())
             key = item.get_fullpath()
+            if key in paths:
+                continue
             paths[key] = item
+            if fmt == 'native':
+                self._print_node_native(item,
+                                        withpath=True,
+                                        withnbchildren=True,
+                                        withstorage=True,
+                                        raw=raw)
+            elif fmt.startswith('csv'):
+                self._print_node_csv(item, raw=raw)
+            elif fmt == 'jsonl':
+                self.jsonl_printer.print_node(item)
+        self._debug(f'found {len(paths)} node(s)')
 
         # handle fzf mode
         if fmt.startswith('fzf'):
@@ -492,19 +699,7 @@ class Noder:
                 newpaths[item] = paths[item]
                 self.print_tree(newpaths[item], fmt=subfmt)
             paths = newpaths
-        else:
-            if fmt == 'native':
-                for _, item in paths.items():
-                    self._print_node_native(item,
-                                            withpath=True,
-                                            withnbchildren=True,
-                                            withstorage=True,
-                                            raw=raw)
-            elif fmt.startswith('csv'):
-                if fmt == 'csv-with-header':
-                    self.csv_printer.print_header()
-                for _, item in paths.items():
-                    self._print_node_csv(item, raw=raw)
+        self.out.flush()
 
         # execute script if any
         if script:
@@ -550,13 +745,30 @@ class Noder:
     ###############################################################
     # fixsizes
     ###############################################################
-    def fixsizes(self, top: NodeTop) -> None:
-        """fix node sizes"""
-        typcast_node(top)
-        rend = anytree.RenderTree(top)
-        for _, _, thenode in rend:
-            typcast_node(thenode)
-            thenode.nodesize = thenode.get_rec_size()
+    def fixsizes(self, top: NodeTop) -> bool:
+        """
+        fix container node sizes in a single bottom-up pass
+        returns True if any size was changed
+        """
+        changed = False
+        start = time.perf_counter()
+        for node in anytree.PostOrderIter(top):
+            typcast_node(node)
+            if node.type not in nodes.CONTAINERS:
+                continue
+            # children were fixed already
+            size = sum(child.nodesize for child in node.children
+                       if child.type != nodes.TYPE_META and
+                       not is_hardlink(child))
+            if size != node.nodesize:
+                node.nodesize = size
+                changed = True
+                if self.journal:
+                    self.journal.changed(node, {'nodesize': size})
+        self.metrics.add_time(metrics.FIXSIZES, time.perf_counter() - start)
+        if changed:
+            self.dirty = True
+        return changed
 
     ###############################################################
     # ls
@@ -575,23 +787,20 @@ class Noder:
         @raw: print raw size
         """
         self._debug(f'ls walking path: \"{path}\" from \"{top.get_name()}\"')
-        resolv = anytree.resolver.Resolver('name')
         found = []
         try:
-            if '*' in path or '?' in path:
+            if is_glob(path):
                 # we need to handle glob
                 self._debug('glob ls...')
-                found = resolv.glob(top, path)
+                found = glob(top, path)
             else:
                 # we have a canonical path
                 self._debug('get ls...')
-                foundone = resolv.get(top, path)
-                cast(NodeAny, foundone)
+                foundone = resolve(top, path)
                 typcast_node(foundone)
                 if foundone and foundone.may_have_children():
                     # let's find its children as well
-                    modpath = os.path.join(path, '*')
-                    found = resolv.glob(top, modpath)
+                    found = list(foundone.children)
                 else:
                     found = [foundone]
 
@@ -619,11 +828,14 @@ class Noder:
                                             raw=raw)
                 elif fmt.startswith('csv'):
                     self._print_node_csv(item, raw=raw)
+                elif fmt == 'jsonl':
+                    self.jsonl_printer.print_node(item)
                 elif fmt.startswith('fzf'):
                     self._to_fzf(item, fmt)
 
         except anytree.resolver.ChildResolverError:
             pass
+        self.out.flush()
         return found
 
     ###############################################################
@@ -631,53 +843,86 @@ class Noder:
     ###############################################################
     def diskusage(self, top: NodeTop,
                   path: str,
+                  fmt: str = 'native',
                   raw: bool = False) -> List[NodeAny]:
-        """disk usage"""
+        """
+        disk usage
+        @top: top node
+        @path: path to search for
+        @fmt: output format
+        @raw: print raw size
+        """
         self._debug(f'du walking path: \"{path}\" from \"{top.get_name()}\"')
-        resolv = anytree.resolver.Resolver('name')
         found: NodeAny
         try:
             # we have a canonical path
             self._debug('get du...')
-            found = resolv.get(top, path)
+            found = resolve(top, path)
             if not found:
                 # nothing found
                 self._debug('nothing found')
                 return []
 
             self._debug(f'du found: {found}')
-            self._print_node_du(found, raw=raw)
+            self._print_node_du(found, fmt=fmt, raw=raw)
         except anytree.resolver.ChildResolverError:
             pass
+        self.out.flush()
         return found
 
     ###############################################################
     # tree creation
     ###############################################################
-    def _add_entry(self, name: str,
-                   top: NodeTop,
-                   resolv: Any) -> None:
-        """add an entry to the tree"""
-        entries = name.rstrip(os.sep).split(os.sep)
-        if len(entries) == 1:
-            self.new_archive_node(name, top, top.get_name())
-            return
-        sub = os.sep.join(entries[:-1])
-        nodename = entries[-1]
-        try:
-            parent = resolv.get(top, sub)
-            parent = self.new_archive_node(nodename, parent, top.get_name())
-        except anytree.resolver.ChildResolverError:
-            self.new_archive_node(nodename, top, top.get_name())
-
-    def list_to_tree(self, parent: NodeAny, names: List[str]) -> None:
-        """convert list of files to a tree"""
-        if not names:
+    def list_to_tree(self, parent: NodeAny, members: List[Member]) -> None:
+        """
+        convert the archive members to a tree in one pass,
+        missing intermediate directories are created and
+        directories size is the sum of their content, nested
+        archives content is listed under their member
+        """
+        if not members:
             return
-        resolv = anytree.resolver.Resolver('name')
-        for name in names:
-            name = name.rstrip(os.sep)
-            self._add_entry(name, parent, resolv)
+        archive = parent.get_name()
+        # nodes by path within the archive in creation
+        # order, a parent always comes before its children
+        built: Dict[str, NodeArchived] = {}
+        dirs = set()
+        files = set()
+        for name, size, maccess, isdir in members:
+            entries = [x for x in name.split('/') if x not in ['', '.']]
+            if not entries:
+                continue
+            sub = ''
+            node: NodeAny = parent
+            for entry in entries[:-1]:
+                sub = f'{sub}/{entry}'
+                found = built.get(sub)
+                if found is None:
+                    found = NodeArchived(name=entry, nodesize=0, md5='',
+                                         archive=archive, parent=node)
+                    built[sub] = found
+                dirs.add(sub)
+                node = found
+            sub = f'{sub}/{entries[-1]}'
+            found = built.get(sub)
+            if found is None:
+                found = NodeArchived(name=entries[-1], nodesize=0, md5='',
+                                     archive=archive, parent=node)
+                built[sub] = found
+            # a member seen twice is overwritten by the last one
+            found.nodesize = 0 if isdir else size
+            found.maccess = maccess
+            if isdir:
+                dirs.add(sub)
+            else:
+                files.add(sub)
+        # children sizes are final before being added to their parent
+        for sub in reversed(list(built)):
+            node = built[sub]
+            if sub in dirs and sub not in files:
+                node.nodesize = sum(x.nodesize for x in node.children)
+        for node in built.values():
+            self._added(node)
 
     ###############################################################
     # diverse
@@ -695,6 +940,10 @@ class Noder:
                 typcast_node(thenode)
                 if thenode.type == nodes.TYPE_DIR:
                     thenodes.append(thenode)
+                elif thenode.type == nodes.TYPE_ARCHIVED and \
+                        thenode.children:
+                    # directory within an archive
+                    thenodes.append(thenode)
         else:
             thenodes = [x for _, _, x in rend]
         return sorted(thenodes, key=os_sort_keygen(self._sort))
@@ -726,14 +975,17 @@ class Noder:
         except AttributeError:
             return 0
 
-    @staticmethod
-    def _get_hash(path: str) -> str:
+    def _get_hash(self, path: str, size: int) -> str:
         """return md5 hash of node"""
+        start = time.perf_counter()
         try:
-            return md5sum(path)
+            return md5sum(path, iolimit=self.iolimit)
         except CatcliException as exc:
             Logger.err(str(exc))
             return ''
+        finally:
+            self.metrics.add_time(metrics.HASH, time.perf_counter() - start)
+            self.metrics.add(metrics.HASHED, size)
 
     def _debug(self, string: str) -> None:
         """print debug"""
@@ -24,6 +24,9 @@ TYPE_META = 'meta'
 NAME_TOP = 'top'
 NAME_META = 'meta'
 
+# nodes whose size is the sum of their children
+CONTAINERS = [TYPE_TOP, TYPE_STORAGE, TYPE_DIR]
+
 
 def typcast_node(node: Any) -> None:
     """typecast node to its sub type"""
@@ -43,6 +46,34 @@ def typcast_node(node: Any) -> None:
         raise CatcliException(f"bad node: {node}")
 
 
+def get_child(node: Any, name: str) -> Any:
+    """
+    return the child of node named name (None if none),
+    the children are indexed by name on the first lookup
+    and the index dropped when they are attached, detached
+    or renamed
+    """
+    byname = node.__dict__.get('_byname')
+    if byname is None:
+        byname = {}
+        for child in node.children:
+            byname.setdefault(str(child.name), child)
+        node._byname = byname  # pylint: disable=W0212
+    child = byname.get(name)
+    if child is not None and \
+            (child.parent is not node or str(child.name) != name):
+        # changed behind the index
+        del node._byname  # pylint: disable=W0212
+        return get_child(node, name)
+    return child
+
+
+def drop_children_index(node: Any) -> None:
+    """the children of node changed"""
+    if node is not None:
+        node.__dict__.pop('_byname', None)
+
+
 class NodeAny(NodeMixin):  # type: ignore
     """generic node"""
 
@@ -61,11 +92,27 @@ class NodeAny(NodeMixin):  # type: ignore
 
     def get_name(self) -> str:
         """get node name"""
-        return fix_badchars(self.name)
+        # the sanitized name is cached along the name
+        # it was computed from and refreshed on change
+        cached = self.__dict__.get('_safename')
+        if cached and cached[0] is self.name:
+            return str(cached[1])
+        safe = fix_badchars(self.name)
+        self._safename = (self.name, safe)  # pylint: disable=W0201
+        return safe
 
     def set_name(self, name: str) -> None:
         """set node name"""
         self.name = fix_badchars(name)
+        drop_children_index(self.parent)
+
+    def _post_attach(self, parent: Any) -> None:
+        """called by anytree once attached to parent"""
+        drop_children_index(parent)
+
+    def _post_detach(self, parent: Any) -> None:
+        """called by anytree once detached from parent"""
+        drop_children_index(parent)
 
     def has_attr(self, attr: str) -> bool:
         """return True if node has attr as attribute"""
@@ -93,11 +140,19 @@ class NodeAny(NodeMixin):  # type: ignore
             typcast_node(self.parent)
             ppath = self.parent.get_fullpath()
             path = os.path.join(ppath, path)
-        return fix_badchars(path)
+        return path
 
     def get_rec_size(self) -> int:
         """recursively traverse tree and return size"""
-        totsize: int = self.nodesize
+        size: int = self.nodesize
+        return size + self._get_children_size()
+
+    def _get_children_size(self) -> int:
+        """
+        return the size of the children, a container
+        size is only made of its children's size
+        """
+        totsize = 0
         for node in self.children:
             typcast_node(node)
             totsize += node.get_rec_size()
@@ -150,7 +205,7 @@ class NodeTop(NodeAny):
         recursively traverse tree and return size
         also ensure to update the size on the way
         """
-        size = super().get_rec_size()
+        size = self._get_children_size()
         self.nodesize = size
         return size
 
@@ -183,6 +238,18 @@ class NodeFile(NodeAny):
         """can node contains sub"""
         return False
 
+    def get_rec_size(self) -> int:
+        """
+        return the file size, the archive
+        content is already accounted for,
+        the size of a hardlink is the one of
+        its first link
+        """
+        if getattr(self, 'hardlink', None):
+            return 0
+        size: int = self.nodesize
+        return size
+
     def get_storage_node(self) -> NodeAny:
         """recursively traverse up to find storage"""
         return cast(NodeStorage, self.ancestors[1])
@@ -219,7 +286,7 @@ class NodeDir(NodeAny):
         recursively traverse tree and return size
         also ensure to update the size on the way
         """
-        size = super().get_rec_size()
+        size = self._get_children_size()
         self.nodesize = size
         return size
 
@@ -239,6 +306,7 @@ class NodeArchived(NodeAny):
                  nodesize: int,
                  md5: str,
                  archive: str,
+                 maccess: float = 0.0,
                  parent=None,
                  children=None):
         """build an archived node"""
@@ -248,6 +316,7 @@ class NodeArchived(NodeAny):
         self.nodesize = nodesize
         self.md5 = md5
         self.archive = archive
+        self.maccess = maccess
         self.parent = parent
         if children:
             self.children = children
@@ -256,6 +325,14 @@ class NodeArchived(NodeAny):
         """can node contains sub"""
         return False
 
+    def get_rec_size(self) -> int:
+        """
+        return the size, archived directories
+        sizes are set when the archive is listed
+        """
+        size: int = self.nodesize
+        return size
+
     def get_storage_node(self) -> NodeAny:
         """recursively traverse up to find storage"""
         return cast(NodeStorage, self.ancestors[1])
@@ -298,7 +375,7 @@ class NodeStorage(NodeAny):
         recursively traverse tree and return size
         also ensure to update the size on the way
         """
-        size = super().get_rec_size()
+        size = self._get_children_size()
         self.nodesize = size
         return size
 
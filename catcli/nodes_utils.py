@@ -6,6 +6,12 @@ nodes helpers
 """
 
 import os
+import re
+import functools
+from typing import List, Tuple, Any, Pattern
+import anytree
+from anytree.resolver import ResolverError, ChildResolverError, \
+    RootResolverError
 
 # local imports
 from catcli import nodes
@@ -37,3 +43,106 @@ def path_to_search_all(path: str) -> str:
     #     # add wild card
     #     path += WILD
     return path
+
+
+def is_glob(path: str) -> bool:
+    """does path contain wildcards"""
+    return '*' in path or '?' in path
+
+
+@functools.lru_cache(maxsize=256)
+def _compile_glob(pattern: str) -> Pattern[str]:
+    """compile a path part with wildcards like anytree does"""
+    regex = ''.join('.*' if c == '*' else '.' if c == '?' else re.escape(c)
+                    for c in pattern)
+    return re.compile(regex + r'\Z', re.MULTILINE | re.DOTALL)
+
+
+def _start(node: Any, path: str) -> Tuple[Any, List[str]]:
+    """return the node path starts from and its parts"""
+    sep = node.separator
+    parts = path.split(sep)
+    if not path.startswith(sep):
+        return node, parts
+    node = node.root
+    parts.pop(0)
+    if not parts[0]:
+        raise ResolverError(node, '', 'root node missing. '
+                            f'root is \'{sep}{node.name}\'.')
+    if parts[0] != str(node.name):
+        raise ResolverError(node, '',
+                            f'unknown root node \'{sep}{parts[0]}\'. '
+                            f'root is \'{sep}{node.name}\'.')
+    return node, parts[1:]
+
+
+def resolve(node: Any, path: str) -> Any:
+    """
+    return the node at path, absolute (from the root)
+    or relative to node, each part being looked up in
+    the children index of its parent instead of going
+    through all the children like anytree.Resolver,
+    raises anytree.resolver.ResolverError if not found
+    """
+    node, parts = _start(node, path)
+    for part in parts:
+        if part == '..':
+            if node.parent is None:
+                raise RootResolverError(node)
+            node = node.parent
+        elif part not in ('', '.'):
+            child = nodes.get_child(node, part)
+            if child is None:
+                raise ChildResolverError(node, part, 'name')
+            node = child
+    return node
+
+
+def glob(node: Any, path: str) -> List[Any]:
+    """
+    return the nodes matching path with wildcards (* and ?
+    do not match the separator, ** any directories), only
+    the children of the directories matched with a wildcard
+    are scanned, raises anytree.resolver.ResolverError if a
+    part without wildcards is not found
+    """
+    node, parts = _start(node, path)
+    return _glob(node, parts)
+
+
+def _glob(node: Any, parts: List[str]) -> List[Any]:
+    """match the parts under node"""
+    if not parts:
+        return [node]
+    name, remainder = parts[0], parts[1:]
+    if name == '..':
+        if node.parent is None:
+            raise RootResolverError(node)
+        return _glob(node.parent, remainder)
+    if name in ('', '.'):
+        return _glob(node, remainder)
+    if name == '**':
+        matches: List[Any] = []
+        for sub in anytree.PreOrderIter(node):
+            try:
+                for match in _glob(sub, remainder):
+                    if match not in matches:
+                        matches.append(match)
+            except ChildResolverError:
+                pass
+        return matches
+    if not is_glob(name):
+        child = nodes.get_child(node, name)
+        if child is None:
+            raise ChildResolverError(node, name, 'name')
+        return _glob(child, remainder)
+    regex = _compile_glob(name)
+    matches = []
+    for child in node.children:
+        if not regex.match(str(child.name)):
+            continue
+        try:
+            matches.extend(_glob(child, remainder))
+        except ResolverError:
+            pass
+    return matches
@@ -0,0 +1,49 @@
+"""
+author: deadc0de6 (https://github.com/deadc0de6)
+Copyright (c) 2024, deadc0de6
+
+Buffered output sink shared by the printers
+"""
+
+import sys
+from typing import List, Optional, TextIO
+
+
+class OutBuffer:
+    """accumulate output lines and write them in bulk"""
+
+    # flush once that many characters are pending
+    BUFSIZE = 256 * 1024
+
+    def __init__(self,
+                 stream: Optional[TextIO] = None,
+                 bufsize: int = BUFSIZE) -> None:
+        """
+        @stream: where to write to (defaults to stdout)
+        @bufsize: number of characters to buffer before flushing
+        """
+        self.stream = stream
+        self.bufsize = bufsize
+        self.lines: List[str] = []
+        self.pending = 0
+        self.count = 0
+
+    def write(self, line: str) -> None:
+        """buffer a single line (without its newline)"""
+        self.lines.append(line)
+        self.pending += len(line) + 1
+        self.count += 1
+        if self.pending >= self.bufsize:
+            self.flush()
+
+    def flush(self) -> None:
+        """write all pending lines to the stream"""
+        if not self.lines:
+            return
+        # resolve stdout lazily in case it was swapped
+        stream = self.stream or sys.stdout
+        self.lines.append('')
+        stream.write('\n'.join(self.lines))
+        stream.flush()
+        self.lines = []
+        self.pending = 0
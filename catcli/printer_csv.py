@@ -5,10 +5,10 @@ Copyright (c) 2024, deadc0de6
 Class for printing nodes in csv format
 """
 
-import sys
-from typing import List
+from typing import List, Optional
 
 from catcli.nodes import NodeAny, NodeStorage, TYPE_DIR
+from catcli.outbuffer import OutBuffer
 from catcli.utils import size_to_str, epoch_to_str
 
 
@@ -20,14 +20,24 @@ class CsvPrinter:
                   'maccess,md5,nbfiles,free_space,'
                   'total_space,meta')
 
+    def __init__(self, out: Optional[OutBuffer] = None) -> None:
+        """
+        @out: the output sink to write to
+        """
+        self.out = out or OutBuffer()
+
     def _print_entries(self, entries: List[str], sep: str = DEFSEP) -> None:
         line = sep.join(['"' + o + '"' for o in entries])
         if len(line) > 0:
-            sys.stdout.write(f'{line}\n')
+            self.out.write(line)
 
     def print_header(self) -> None:
         """print csv header"""
-        sys.stdout.write(f'{self.CSV_HEADER}\n')
+        self.out.write(self.CSV_HEADER)
+
+    def flush(self) -> None:
+        """flush the output"""
+        self.out.flush()
 
     def print_storage(self, node: NodeStorage,
                       sep: str = DEFSEP,
@@ -0,0 +1,71 @@
+"""
+author: deadc0de6 (https://github.com/deadc0de6)
+Copyright (c) 2024, deadc0de6
+
+Class for printing nodes in json lines format
+"""
+
+import os
+import json
+from typing import Dict, Any, Optional
+
+from catcli import nodes
+from catcli.nodes import NodeAny, typcast_node
+from catcli.outbuffer import OutBuffer
+
+
+class JsonlPrinter:
+    """a node printer class"""
+
+    SEPARATORS = (',', ':')
+
+    def __init__(self, out: Optional[OutBuffer] = None) -> None:
+        """
+        @out: the output sink to write to
+        """
+        self.out = out or OutBuffer()
+        self.encoder = json.JSONEncoder(separators=self.SEPARATORS)
+
+    @staticmethod
+    def _get_path(node: NodeAny) -> str:
+        """return the unsanitized path of the node under top"""
+        return os.sep.join(x.name for x in node.path[1:])
+
+    def to_dict(self, node: NodeAny) -> Dict[str, Any]:
+        """convert a node to a dict of typed values"""
+        entry: Dict[str, Any] = {
+            'name': node.name,
+            'type': node.type,
+            'path': self._get_path(node),
+            'size': node.nodesize,
+        }
+        if node.type == nodes.TYPE_STORAGE:
+            entry['free'] = node.free
+            entry['total'] = node.total
+            entry['indexed_at'] = node.ts
+            entry['nbfiles'] = len(node.children)
+            entry['meta'] = node.attr
+            return entry
+        storage = node.get_storage_node()
+        if storage:
+            entry['storage'] = storage.name
+        if node.has_attr('maccess'):
+            entry['maccess'] = node.maccess
+        if node.has_attr('md5'):
+            entry['md5'] = node.md5
+        if node.type == nodes.TYPE_DIR:
+            entry['nbfiles'] = len(node.children)
+        if node.type == nodes.TYPE_ARCHIVED:
+            entry['archive'] = node.archive
+        return entry
+
+    def print_node(self, node: NodeAny) -> None:
+        """print a node as a single json object"""
+        typcast_node(node)
+        if node.type in [nodes.TYPE_TOP, nodes.TYPE_META]:
+            return
+        self.out.write(self.encoder.encode(self.to_dict(node)))
+
+    def flush(self) -> None:
+        """flush the output"""
+        self.out.flush()
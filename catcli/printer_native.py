@@ -5,12 +5,12 @@ Copyright (c) 2022, deadc0de6
 Class for printing nodes in native format
 """
 
-import sys
+from typing import List, Optional
 
 from catcli.nodes import NodeFile, NodeDir, \
     NodeStorage, NodeAny, typcast_node
 from catcli.colors import Colors
-from catcli.logger import Logger
+from catcli.outbuffer import OutBuffer
 from catcli.utils import fix_badchars, size_to_str, \
     epoch_to_str
 
@@ -32,6 +32,26 @@ class NativePrinter:
     ARCHIVE = 'archive'
     NBFILES = 'nbfiles'
 
+    def __init__(self, out: Optional[OutBuffer] = None) -> None:
+        """
+        @out: the output sink to write to
+        """
+        self.out = out or OutBuffer()
+        # colors are resolved once, when disabled
+        # no escape code ends up in the output
+        self.color = Colors.ENABLED
+        self.c_storage = COLOR_STORAGE if self.color else ''
+        self.c_file = COLOR_FILE if self.color else ''
+        self.c_dir = COLOR_DIRECTORY if self.color else ''
+        self.c_archive = COLOR_ARCHIVE if self.color else ''
+        self.c_ts = COLOR_TS if self.color else ''
+        self.c_size = COLOR_SIZE if self.color else ''
+        self.c_white = Colors.WHITE if self.color else ''
+        self.c_gray = Colors.GRAY if self.color else ''
+        self.c_bold = Colors.BOLD if self.color else ''
+        self.c_und = Colors.UND if self.color else ''
+        self.c_reset = Colors.RESET if self.color else ''
+
     def print_du(self, node: NodeAny,
                  raw: bool = False) -> None:
         """print du style"""
@@ -40,14 +60,13 @@ class NativePrinter:
         size = node.nodesize
 
         line = size_to_str(size, raw=raw).ljust(10, ' ')
-        out = f'{COLOR_SIZE}{line}{Colors.RESET}'
-        out += ' '
-        out += f'{COLOR_FILE}{name}{Colors.RESET}'
-        sys.stdout.write(f'{out}\n')
+        reset = self.c_reset
+        self.out.write(f'{self.c_size}{line}{reset} '
+                       f'{self.c_file}{name}{reset}')
 
     def print_top(self, pre: str, name: str) -> None:
         """print top node"""
-        sys.stdout.write(f'{pre}{name}\n')
+        self.out.write(f'{pre}{name}')
 
     def print_storage(self, pre: str,
                       node: NodeStorage,
@@ -77,11 +96,12 @@ class NativePrinter:
             attrs.append(f'date:{epoch_to_str(node.ts)}')
 
         # print
-        out = f'{pre}{Colors.UND}{self.STORAGE}{Colors.RESET}: '
-        out += f'{COLOR_STORAGE}{name}{Colors.RESET}'
+        reset = self.c_reset
+        out = f'{pre}{self.c_und}{self.STORAGE}{reset}: '
+        out += f'{self.c_storage}{name}{reset}'
         if attrs:
-            out += f' [{Colors.WHITE}{"|".join(attrs)}{Colors.RESET}]'
-        sys.stdout.write(f'{out}\n')
+            out += f' [{self.c_white}{"|".join(attrs)}{reset}]'
+        self.out.write(out)
 
     def print_file(self, pre: str,
                    node: NodeFile,
@@ -90,34 +110,19 @@ class NativePrinter:
                    raw: bool = False) -> None:
         """print a file node"""
         # construct name
-        name = node.get_name()
-        storage = node.get_storage_node()
         if withpath:
             name = node.get_fullpath()
+        else:
+            name = node.get_name()
         # construct attributes
         attrs = []
         if node.md5:
             attrs.append(f'md5:{node.md5}')
         if withstorage:
-            content = Logger.get_bold_text(storage.get_name())
+            storage = node.get_storage_node()
+            content = self._bold(storage.get_name())
             attrs.append(f'storage:{content}')
-        # print
-        out = []
-        out.append(f'{pre}')
-        out.append(f'{COLOR_FILE}{name}{Colors.RESET}')
-        size = 0
-        if node.nodesize:
-            size = node.nodesize
-        line = size_to_str(size, raw=raw)
-        out.append(f'{COLOR_SIZE}{line}{Colors.RESET}')
-        if node.has_attr('maccess'):
-            line = epoch_to_str(node.maccess)
-            out.append(f'{COLOR_TS}{line}{Colors.RESET}')
-        if attrs:
-            out.append(f'{Colors.GRAY}[{",".join(attrs)}]{Colors.RESET}')
-
-        out = [x for x in out if x]
-        sys.stdout.write(f'{" ".join(out)}\n')
+        self._print_entry(pre, self.c_file, name, node, attrs, raw)
 
     def print_dir(self, pre: str,
                   node: NodeDir,
@@ -127,39 +132,58 @@ class NativePrinter:
                   raw: bool = False) -> None:
         """print a directory node"""
         # construct name
-        name = node.get_name()
-        storage = node.get_storage_node()
         if withpath:
             name = node.get_fullpath()
+        else:
+            name = node.get_name()
         # construct attrs
         attrs = []
         if withnbchildren:
             nbchildren = len(node.children)
             attrs.append(f'{self.NBFILES}:{nbchildren}')
         if withstorage:
-            attrs.append(f"storage:{Logger.get_bold_text(storage.get_name())}")
-        # print
+            storage = node.get_storage_node()
+            attrs.append(f'storage:{self._bold(storage.get_name())}')
+        self._print_entry(pre, self.c_dir, name, node, attrs, raw)
+
+    def print_archive(self, pre: str,
+                      name: str, archive: str) -> None:
+        """print an archive"""
+        name = fix_badchars(name)
+        reset = self.c_reset
+        out = f'{pre}{self.c_archive}{name}{reset} '
+        out += f'{self.c_gray}[{self.ARCHIVE}:{archive}]{reset}'
+        self.out.write(out)
+
+    def flush(self) -> None:
+        """flush the output"""
+        self.out.flush()
+
+    def _bold(self, string: str) -> str:
+        """make it bold"""
+        return f'{self.c_bold}{string}{self.c_reset}'
+
+    def _print_entry(self, pre: str,
+                     color: str,
+                     name: str,
+                     node: NodeAny,
+                     attrs: List[str],
+                     raw: bool) -> None:
+        """print a file/directory entry"""
+        reset = self.c_reset
         out = []
-        out.append(f'{pre}')
-        out.append(f'{COLOR_DIRECTORY}{name}{Colors.RESET}')
+        if pre:
+            out.append(pre)
+        out.append(f'{color}{name}{reset}')
         size = 0
         if node.nodesize:
             size = node.nodesize
         line = size_to_str(size, raw=raw)
-        out.append(f'{COLOR_SIZE}{line}{Colors.RESET}')
+        out.append(f'{self.c_size}{line}{reset}')
         if node.has_attr('maccess'):
             line = epoch_to_str(node.maccess)
-            out.append(f'{COLOR_TS}{line}{Colors.RESET}')
+            if line or self.color:
+                out.append(f'{self.c_ts}{line}{reset}')
         if attrs:
-            out.append(f'{Colors.GRAY}[{",".join(attrs)}]{Colors.RESET}')
-
-        out = [x for x in out if x]
-        sys.stdout.write(f'{" ".join(out)}\n')
-
-    def print_archive(self, pre: str,
-                      name: str, archive: str) -> None:
-        """print an archive"""
-        name = fix_badchars(name)
-        out = f'{pre}{COLOR_ARCHIVE}{name}{Colors.RESET} '
-        out += f'{Colors.GRAY}[{self.ARCHIVE}:{archive}]{Colors.RESET}'
-        sys.stdout.write(f'{out}\n')
+            out.append(f'{self.c_gray}[{",".join(attrs)}]{reset}')
+        self.out.write(' '.join(out))
@@ -0,0 +1,119 @@
+"""
+author: deadc0de6 (https://github.com/deadc0de6)
+Copyright (c) 2024, deadc0de6
+
+Profile a catcli command (cpu or memory)
+"""
+
+import os
+import sys
+import pstats
+import cProfile
+import tracemalloc
+from typing import List, Tuple, Optional, Callable, TypeVar
+
+
+NAME = 'catcli'
+
+# cpu profiling with cProfile
+CPU = 'cpu'
+# memory profiling with tracemalloc
+MEM = 'mem'
+
+OPTIONS = {
+    '--profile': CPU,
+    '--profile-mem': MEM,
+}
+ENVS = {
+    'CATCLI_PROFILE': CPU,
+    'CATCLI_PROFILE_MEM': MEM,
+}
+DEFAULT_PATHS = {
+    CPU: f'/tmp/{NAME}.prof',
+    MEM: f'/tmp/{NAME}.mem',
+}
+
+# number of entries printed
+TOP = 20
+# frames recorded per allocation
+FRAMES = 10
+
+RETTYPE = TypeVar('RETTYPE')
+
+
+class Profiler:
+    """run a function under cProfile or tracemalloc"""
+
+    def __init__(self, mode: str = CPU, path: str = '',
+                 top: int = TOP) -> None:
+        """
+        @mode: cpu or mem
+        @path: where to save the stats
+        @top: number of entries to print
+        """
+        self.mode = mode
+        self.path = path or DEFAULT_PATHS[mode]
+        self.top = top
+
+    @classmethod
+    def from_argv(cls, argv: List[str]) -> Tuple[List[str],
+                                                 Optional['Profiler']]:
+        """
+        extract the profiling options from the arguments
+        (--profile[=<path>] or --profile-mem[=<path>]) or
+        from the environment, they apply to any command and
+        are removed before the arguments are parsed, up to
+        "--" after which any argument is a positional one
+        return the remaining arguments and the profiler if any
+        """
+        profiler = None
+        for env, mode in ENVS.items():
+            path = os.getenv(env)
+            if path is not None:
+                profiler = cls(mode, path)
+        rest = []
+        for idx, arg in enumerate(argv):
+            if arg == '--':
+                rest.extend(argv[idx:])
+                break
+            opt, _, path = arg.partition('=')
+            if opt in OPTIONS:
+                profiler = cls(OPTIONS[opt], path)
+                continue
+            rest.append(arg)
+        return rest, profiler
+
+    def run(self, func: Callable[[], RETTYPE]) -> RETTYPE:
+        """run func, save and print the stats"""
+        if self.mode == MEM:
+            return self._run_mem(func)
+        return self._run_cpu(func)
+
+    def _run_cpu(self, func: Callable[[], RETTYPE]) -> RETTYPE:
+        """profile cpu time"""
+        prof = cProfile.Profile()
+        try:
+            return prof.runcall(func)
+        finally:
+            prof.dump_stats(self.path)
+            stats = pstats.Stats(prof, stream=sys.stderr)
+            stats.sort_stats(pstats.SortKey.CUMULATIVE)
+            stats.print_stats(self.top)
+            sys.stderr.write(f'profile saved to {self.path}\n')
+
+    def _run_mem(self, func: Callable[[], RETTYPE]) -> RETTYPE:
+        """profile memory allocations"""
+        tracemalloc.start(FRAMES)
+        try:
+            return func()
+        finally:
+            snapshot = tracemalloc.take_snapshot()
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            snapshot.dump(self.path)
+            out = [f'peak memory: {peak / 1024**2:.2f}MiB',
+                   f'top {self.top} allocations:']
+            for stat in snapshot.statistics('lineno')[:self.top]:
+                out.append(f'  {stat}')
+            out.append(f'snapshot saved to {self.path}')
+            sys.stderr.write('\n'.join(out) + '\n')
@@ -0,0 +1,99 @@
+"""
+author: deadc0de6 (https://github.com/deadc0de6)
+Copyright (c) 2024, deadc0de6
+
+Throttled indexing progress
+"""
+
+import sys
+import time
+import shutil
+import datetime
+from typing import Optional, TextIO
+
+# local imports
+from catcli.utils import size_to_str, fix_badchars
+
+
+# max updates of the progress line per second
+RATE = 4
+LINELEN = 80
+MAXNAMELEN = 30
+
+
+def get_used_space(path: str) -> int:
+    """return the used bytes of the filesystem holding path"""
+    try:
+        return shutil.disk_usage(path).used
+    except OSError:
+        return 0
+
+
+class Progress:
+    """
+    count the indexed files and bytes and print
+    the progress on a terminal at most RATE times per second
+    with the throughput and an ETA
+    """
+
+    def __init__(self, total: int = 0,
+                 rate: float = RATE,
+                 stream: Optional[TextIO] = None,
+                 enabled: Optional[bool] = None) -> None:
+        """
+        @total: bytes expected to be indexed (0 when unknown)
+        @rate: max updates per second
+        @stream: where to print (defaults to stderr)
+        @enabled: print the progress (defaults to stream being a tty)
+        """
+        self.total = total
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self.stream = stream or sys.stderr
+        if enabled is None:
+            enabled = self.stream.isatty()
+        self.enabled = enabled
+        self.files = 0
+        self.size = 0
+        self.start = time.monotonic()
+        self.next = 0.0
+        self.shown = False
+
+    def update(self, name: str, size: int = 0) -> None:
+        """a file was indexed"""
+        if not self.enabled:
+            return
+        self.files += 1
+        self.size += size
+        now = time.monotonic()
+        if now < self.next:
+            return
+        self.next = now + self.interval
+        self._show(name, now)
+
+    def _show(self, name: str, now: float) -> None:
+        """print the progress line"""
+        elapsed = now - self.start
+        speed = self.size / elapsed if elapsed > 0 else 0
+        line = f'indexing: {self.files} files ' \
+               f'{size_to_str(self.size, False)} ' \
+               f'{size_to_str(int(speed), False)}/s'
+        if self.total and speed and self.size < self.total:
+            eta = int((self.total - self.size) / speed)
+            line += f' ETA {datetime.timedelta(seconds=eta)}'
+        if len(name) > MAXNAMELEN:
+            name = name[:MAXNAMELEN] + '...'
+        line = f'{line} {name}'
+        self._write(line[:LINELEN].ljust(LINELEN))
+        self.shown = True
+
+    def _write(self, line: str) -> None:
+        """write the line in place"""
+        self.stream.write(f'{fix_badchars(line)}\r')
+        self.stream.flush()
+
+    def done(self) -> None:
+        """clear the progress line"""
+        if not self.shown:
+            return
+        self._write(' ' * LINELEN)
+        self.shown = False
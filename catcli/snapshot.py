@@ -0,0 +1,168 @@
+"""
+author: deadc0de6 (https://github.com/deadc0de6)
+Copyright (c) 2024, deadc0de6
+
+Binary snapshot cache of the catalog tree
+"""
+
+import os
+import sys
+import struct
+import marshal
+import hashlib
+import tempfile
+from typing import List, Tuple, Dict, Any, Optional
+import anytree
+from anytree import AnyNode
+
+# local imports
+from catcli.nodes import NodeAny
+from catcli.version import __version__ as VERSION
+
+
+# bump when the snapshot layout changes
+FORMAT = 1
+ENV_XDG_CACHE = 'XDG_CACHE_HOME'
+SUFFIX = '.snapshot'
+# the key is prefixed by its length
+HEADER = struct.Struct('<I')
+
+# anytree internal attributes set directly
+# to avoid the parent setter checks on load
+PARENT_ATTR = '_NodeMixin__parent'
+CHILDREN_ATTR = '_NodeMixin__children'
+
+# a flattened node: (index of its parent or -1, its attributes)
+FlatNode = Tuple[int, Dict[str, Any]]
+
+
+def get_cache_dir() -> str:
+    """return the directory where snapshots are stored"""
+    base = os.getenv(ENV_XDG_CACHE, '')
+    if not base:
+        base = os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(base, 'catcli')
+
+
+def flatten(top: NodeAny) -> List[FlatNode]:
+    """
+    flatten a tree in pre-order, each node refers
+    to its parent by its index in the list
+    """
+    indexes: Dict[int, int] = {}
+    flat: List[FlatNode] = []
+    for idx, node in enumerate(anytree.PreOrderIter(top)):
+        indexes[id(node)] = idx
+        parent = node.parent
+        pidx = -1 if parent is None else indexes.get(id(parent), -1)
+        attrs = {k: v for k, v in node.__dict__.items()
+                 if not k.startswith('_')}
+        flat.append((pidx, attrs))
+    return flat
+
+
+def unflatten(flat: List[FlatNode]) -> Optional[AnyNode]:
+    """rebuild a tree from its flattened form and return its root"""
+    built: List[AnyNode] = []
+    for pidx, attrs in flat:
+        node = AnyNode.__new__(AnyNode)
+        node.__dict__.update(attrs)
+        if pidx >= 0:
+            parent = built[pidx]
+            node.__dict__[PARENT_ATTR] = parent
+            parent.__dict__.setdefault(CHILDREN_ATTR, []).append(node)
+        built.append(node)
+    if not built:
+        return None
+    return built[0]
+
+
+class Snapshot:
+    """
+    a binary copy of a catalog keyed on
+    the catalog path, size and mtime
+    """
+
+    def __init__(self, path: str,
+                 directory: str = '') -> None:
+        """
+        @path: the catalog path
+        @directory: where to store the snapshot (defaults to the cache dir)
+        """
+        self.path = os.path.realpath(path)
+        self.directory = directory or get_cache_dir()
+        digest = hashlib.sha1(self.path.encode('utf-8',
+                                               'surrogateescape'))
+        self.snappath = os.path.join(self.directory,
+                                     digest.hexdigest() + SUFFIX)
+
+    def _get_key(self) -> Optional[Dict[str, Any]]:
+        """return what identifies the current catalog content"""
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return None
+        return {
+            'format': FORMAT,
+            # marshal is python version dependent
+            'python': list(sys.version_info[:2]),
+            'version': VERSION,
+            'path': self.path,
+            'size': stat.st_size,
+            'mtime': stat.st_mtime_ns,
+            'inode': stat.st_ino,
+        }
+
+    def load(self) -> Optional[AnyNode]:
+        """return the snapshot tree root if it is still valid"""
+        key = self._get_key()
+        if not key:
+            return None
+        try:
+            with open(self.snappath, 'rb') as file:
+                size, = HEADER.unpack(file.read(HEADER.size))
+                if marshal.loads(file.read(size)) != key:
+                    return None
+                # loading from bytes is much faster than from the file
+                flat = marshal.loads(file.read())
+        except (OSError, EOFError, ValueError, TypeError, struct.error):
+            return None
+        try:
+            return unflatten(flat)
+        except (IndexError, ValueError, TypeError, AttributeError):
+            # corrupted snapshot
+            return None
+
+    def save(self, top: NodeAny) -> bool:
+        """write the snapshot of the tree matching the current catalog"""
+        key = self._get_key()
+        if not key:
+            return False
+        try:
+            data = marshal.dumps(flatten(top))
+        except ValueError:
+            # unsupported attribute value
+            return False
+        tmp = ''
+        try:
+            os.makedirs(self.directory, mode=0o700, exist_ok=True)
+            fd, tmp = tempfile.mkstemp(prefix='.', suffix='.tmp',
+                                       dir=self.directory)
+            header = marshal.dumps(key)
+            with os.fdopen(fd, 'wb') as file:
+                file.write(HEADER.pack(len(header)))
+                file.write(header)
+                file.write(data)
+            os.replace(tmp, self.snappath)
+        except OSError:
+            if tmp and os.path.exists(tmp):
+                os.remove(tmp)
+            return False
+        return True
+
+    def remove(self) -> None:
+        """drop the snapshot"""
+        try:
+            os.remove(self.snappath)
+        except OSError:
+            pass
@@ -0,0 +1,107 @@
+"""
+author: deadc0de6 (https://github.com/deadc0de6)
+Copyright (c) 2024, deadc0de6
+
+I/O budget of the indexing
+"""
+
+import os
+import time
+import threading
+from typing import Tuple, Any
+
+
+class Throttle:
+    """
+    token bucket limiting a rate (units per second),
+    may be shared by concurrent threads
+    """
+
+    def __init__(self, rate: float) -> None:
+        """
+        @rate: units allowed per second, the bucket
+               holds at most a second worth of units
+        """
+        self.rate = rate
+        self.tokens = rate
+        self.stamp = time.monotonic()
+        # total time spent waiting
+        self.waited = 0.0
+        self.lock = threading.Lock()
+
+    def consume(self, amount: float) -> float:
+        """take amount units and wait while over budget"""
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.rate,
+                              self.tokens + (now - self.stamp) * self.rate)
+            self.stamp = now
+            self.tokens -= amount
+            wait = 0.0
+            if self.tokens < 0:
+                wait = -self.tokens / self.rate
+                self.waited += wait
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+
+class IOLimit:
+    """
+    the I/O budget of indexing: read bandwidth for
+    hashing, files stat'ed per second and page cache hints
+    """
+
+    def __init__(self, maxread: float = 0,
+                 maxstat: float = 0,
+                 nocache: bool = False) -> None:
+        """
+        @maxread: max bytes read per second, 0 for no limit
+        @maxstat: max files stat'ed per second, 0 for no limit
+        @nocache: do not keep the hashed data in the page cache
+        """
+        self.maxread = maxread
+        self.maxstat = maxstat
+        self.nocache = nocache
+        self.reads = Throttle(maxread) if maxread > 0 else None
+        self.stats = Throttle(maxstat) if maxstat > 0 else None
+        self.fadvise = nocache and hasattr(os, 'posix_fadvise')
+
+    def __reduce__(self) -> Tuple[Any, ...]:
+        """recreate the budget when sent to a worker process"""
+        return (IOLimit, (self.maxread, self.maxstat, self.nocache))
+
+    def share(self, cnt: int) -> 'IOLimit':
+        """return the budget of one of cnt concurrent processes"""
+        cnt = max(1, cnt)
+        return IOLimit(self.maxread / cnt, self.maxstat / cnt,
+                       self.nocache)
+
+    def on_stat(self) -> None:
+        """a file is about to be stat'ed"""
+        if self.stats:
+            self.stats.consume(1)
+
+    def on_read(self, size: int) -> None:
+        """size bytes were read"""
+        if self.reads:
+            self.reads.consume(size)
+
+    def on_open(self, fd: int) -> None:
+        """a file was opened to be read once sequentially"""
+        if not self.fadvise:
+            return
+        try:
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_SEQUENTIAL)
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_NOREUSE)
+        except OSError:
+            pass
+
+    def on_close(self, fd: int) -> None:
+        """a file was read, drop its pages from the cache"""
+        if not self.fadvise:
+            return
+        try:
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+        except OSError:
+            pass
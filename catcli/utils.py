@@ -11,30 +11,41 @@ import tempfile
 import subprocess
 import datetime
 import string
+from typing import Optional
 
 # local imports
 from catcli.exceptions import CatcliException
+from catcli.throttle import IOLimit
 
 
 WILD = '*'
+# ascii characters removed by fix_badchars
+BADCHARS = bytes(x for x in range(128) if chr(x) not in string.printable)
 
 
-def md5sum(path: str) -> str:
+def md5sum(path: str, iolimit: Optional[IOLimit] = None) -> str:
     """
     calculate md5 sum of a file
     may raise exception
+    @iolimit: the I/O budget of the reads
     """
     rpath = os.path.realpath(path)
     if not os.path.exists(rpath):
         raise CatcliException(f'md5sum - file does not exist: {rpath}')
     try:
         with open(rpath, mode='rb') as file:
+            if iolimit:
+                iolimit.on_open(file.fileno())
             hashv = hashlib.md5()
             while True:
                 buf = file.read(4096)
                 if not buf:
                     break
+                if iolimit:
+                    iolimit.on_read(len(buf))
                 hashv.update(buf)
+            if iolimit:
+                iolimit.on_close(file.fileno())
             return hashv.hexdigest()
     except PermissionError:
         pass
@@ -88,5 +99,10 @@ def edit(data: str) -> str:
 
 def fix_badchars(data: str) -> str:
     """fix none utf-8 chars in string"""
-    data = "".join(x for x in data if x in string.printable)
-    return data.encode("utf-8", "ignore").decode("utf-8")
+    if data.isascii() and data.isprintable():
+        # fast path, nothing to remove
+        return data
+    # drop the non-ascii chars with the codec and the
+    # remaining bad ones with a bytes translate, both in C
+    raw = data.encode('ascii', 'ignore')
+    return raw.translate(None, BADCHARS).decode('ascii')
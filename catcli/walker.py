@@ -6,46 +6,193 @@ Catcli filesystem indexer
 """
 
 import os
-from typing import Tuple, Optional
+from concurrent.futures import ThreadPoolExecutor, Future
+from typing import Tuple, Optional, List, Any, Dict
 
 # local imports
-from catcli.noder import Noder
+from catcli.noder import Noder, FileInfo
 from catcli.logger import Logger
-from catcli.nodes import NodeAny, NodeTop
+from catcli import nodes
+from catcli.nodes import NodeAny, NodeTop, typcast_node
+from catcli.snapshot import FlatNode, flatten
+from catcli.archcache import ArchiveCache
+from catcli import metrics
+from catcli.progress import Progress, get_used_space
+from catcli.throttle import IOLimit
+from catcli.excludes import Excludes
+from catcli.checkpoint import StorageCheckpoint
+
+
+class DirScan:
+    """the content of a directory listed by a scan worker"""
+
+    def __init__(self, treepath: str) -> None:
+        # rel path of the directory in the storage
+        self.treepath = treepath
+        # (name, path, info)
+        self.files: List[Tuple[str, str, FileInfo]] = []
+        # (name, path, maccess, scan of the sub directory if any)
+        self.dirs: List[Tuple[str, str, float,
+                              Optional['Future[DirScan]']]] = []
 
 
 class Walker:
     """a filesystem walker"""
 
-    MAXLINELEN = 80 - 15
-
     def __init__(self, noder: Noder,
                  usehash: bool = True,
                  debug: bool = False,
-                 logpath: str = ''):
+                 logpath: str = '',
+                 progress: bool = True,
+                 workers: int = 0,
+                 patterns: Optional[List[str]] = None,
+                 onefs: bool = False,
+                 checkpoint: Optional[StorageCheckpoint] = None):
         """
         @noder: the noder to use
         @hash: calculate hash of nodes
         @debug: debug mode
         @logpath: path where to log catalog changes on reindex
+        @progress: show the indexing progress
+        @workers: number of threads scanning directories when
+                  indexing, 0 or 1 to walk from the current thread
+        @patterns: gitignore-style rules of the paths not to index
+                   added to the ones of the storage rules file
+        @onefs: do not walk directories on other filesystems
+        @checkpoint: where to periodically save the indexed tree
+                     and from which to resume
         """
         self.noder = noder
         self.usehash = usehash
         self.noder.do_hashing(self.usehash)
         self.debug = debug
         self.lpath = logpath
+        self.progress = progress
+        self.workers = workers
+        self.pool: Optional[ThreadPoolExecutor] = None
+        self.aborted = False
+        self.patterns = patterns or []
+        self.excludes = Excludes()
+        self.onefs = onefs
+        # device of the storage root with onefs
+        self.device: Optional[int] = None
+        self.checkpoint = checkpoint
+        self.reporter = Progress(enabled=False)
 
     def index(self,
               path: str,
               parent: NodeAny,
               name: str,
-              storagepath: str = '') -> Tuple[str, int]:
+              storagepath: str = '') -> Tuple[NodeAny, int]:
         """
         index a directory and store in tree
         @path: path to index
         @parent: parent node
         @name: this stoarge name
+        @storagepath: rel path of path in the storage,
+                      empty when path is the storage root
         """
+        if not storagepath:
+            self.load_storage(path, parent)
+        self.reporter = self._new_progress(path)
+        try:
+            with self.noder.metrics.timer(metrics.WALK):
+                return self._index_walk(path, parent, name, storagepath)
+        except KeyboardInterrupt:
+            # keep what was indexed so far
+            if self.checkpoint and self.checkpoint.interval > 0:
+                self.noder.attach_archives()
+                self.checkpoint.save()
+            raise
+        finally:
+            self.reporter.done()
+
+    def load_storage(self, path: str,
+                     storage: Optional[NodeAny] = None) -> None:
+        """
+        load the exclude rules and device of the storage at path
+        and track its hardlinks apart from the other storages
+        @path: the storage path
+        @storage: the storage node with the first links already indexed
+        """
+        self.noder.hardlinks.reset()
+        if storage:
+            self.noder.hardlinks.load(storage)
+        self.excludes = Excludes.for_storage(path, self.patterns)
+        if self.excludes:
+            self._debug(f'{self.excludes.cnt} exclude rule(s) '
+                        f'for {path}')
+        self.device = os.stat(path).st_dev if self.onefs else None
+
+    def other_fs(self, path: str) -> bool:
+        """is the directory at path on another filesystem (with onefs)"""
+        if self.device is None:
+            return False
+        try:
+            if os.lstat(path).st_dev == self.device:
+                return False
+        except OSError:
+            return False
+        self._debug(f'{path} is on another filesystem')
+        return True
+
+    def excluded(self, treepath: str, isdir: bool = False) -> bool:
+        """is a path relative to the storage root excluded"""
+        if not self.excludes:
+            return False
+        if self.excludes.match(treepath, isdir):
+            self._debug(f'excluded {treepath}')
+            return True
+        return False
+
+    def _new_progress(self, path: str) -> Progress:
+        """return the progress reporter for indexing path"""
+        if self.debug or not self.progress:
+            return Progress(enabled=False)
+        reporter = Progress()
+        if reporter.enabled:
+            # the used space of the storage is what is to be indexed
+            reporter.total = get_used_space(path)
+        return reporter
+
+    def _index_walk(self,
+                    path: str,
+                    parent: NodeAny,
+                    name: str,
+                    storagepath: str) -> Tuple[NodeAny, int]:
+        """index a directory with or without workers"""
+        if self.workers < 2 or self._resuming():
+            parent, cnt = self._index(path, parent, name, storagepath)
+            self.noder.attach_archives()
+            return parent, cnt
+        self._debug(f'indexing starting at {path} '
+                    f'with {self.workers} workers')
+        if not parent:
+            # create the parent
+            parent = self.noder.new_dir_node(name,
+                                             path,
+                                             parent)
+        if self._is_dir_link(path):
+            return parent, 0
+        cnt = self._index_concurrent(path, parent, storagepath)
+        self.noder.attach_archives()
+        return parent, cnt
+
+    @staticmethod
+    def _is_dir_link(path: str) -> bool:
+        """is path a symlink to a directory"""
+        if not os.path.islink(path):
+            return False
+        rel = os.readlink(path)
+        abspath = os.path.join(path, rel)
+        return os.path.isdir(abspath)
+
+    def _index(self,
+               path: str,
+               parent: NodeAny,
+               name: str,
+               storagepath: str = '') -> Tuple[NodeAny, int]:
+        """index a directory walking it from the current thread"""
         self._debug(f'indexing starting at {path}')
         if not parent:
             # create the parent
@@ -53,26 +200,30 @@ class Walker:
                                              path,
                                              parent)
 
-        if os.path.islink(path):
-            rel = os.readlink(path)
-            abspath = os.path.join(path, rel)
-            if os.path.isdir(abspath):
-                return parent, 0
+        if self._is_dir_link(path):
+            return parent, 0
 
         cnt = 0
+        resumed = self._get_resumed(parent)
         for (root, dirs, files) in os.walk(path):
             for file in files:
                 self._debug(f'found file {file} under {path}')
                 sub = os.path.join(root, file)
                 if not os.path.exists(sub):
                     continue
-                self._progress(file)
+                if self.excluded(os.path.join(storagepath, file)):
+                    continue
+                if self._pop_resumed(resumed, file, nodes.TYPE_FILE):
+                    # indexed before the checkpoint
+                    continue
                 self._debug(f'index file {sub}')
                 node = self.noder.new_file_node(os.path.basename(file),
                                                 sub,
                                                 parent)
                 if node:
+                    self.reporter.update(file, node.nodesize)
                     cnt += 1
+                self._checkpoint()
             for adir in dirs:
                 self._debug(f'found dir {adir} under {path}')
                 base = os.path.basename(adir)
@@ -80,25 +231,187 @@ class Walker:
                 self._debug(f'index directory {sub}')
                 if not os.path.exists(sub):
                     continue
-                dummy = self.noder.new_dir_node(base, sub, parent)
-                if not dummy:
+                if self.excluded(os.path.join(storagepath, adir), True) or \
+                        self.other_fs(sub):
                     continue
-                cnt += 1
                 nstoragepath = os.sep.join([storagepath, base])
                 if not storagepath:
                     nstoragepath = base
-                _, cnt2 = self.index(sub, dummy, base, nstoragepath)
+                dummy = self._pop_resumed(resumed, base, nodes.TYPE_DIR)
+                if not dummy:
+                    dummy = self.noder.new_dir_node(base, sub, parent)
+                    cnt += 1
+                elif self.checkpoint and \
+                        nstoragepath in self.checkpoint.done:
+                    # entirely indexed before the checkpoint
+                    continue
+                _, cnt2 = self._index(sub, dummy, base, nstoragepath)
                 cnt += cnt2
             break
-        self._progress('')
+        cnt -= self._rm_resumed(resumed)
+        self._dir_done(storagepath)
         return parent, cnt
 
+    def _resuming(self) -> bool:
+        """is the walk resumed from a checkpoint"""
+        return bool(self.checkpoint and self.checkpoint.resuming)
+
+    def _get_resumed(self, parent: NodeAny) -> Dict[str, NodeAny]:
+        """return the children of parent indexed before the checkpoint"""
+        if not self._resuming():
+            return {}
+        return {child.name: child for child in parent.children}
+
+    def _pop_resumed(self, resumed: Dict[str, NodeAny],
+                     name: str, ntype: str) -> Optional[NodeAny]:
+        """return the node of name indexed before the checkpoint if any"""
+        node = resumed.pop(name, None)
+        if node is None:
+            return None
+        typcast_node(node)
+        if node.type == ntype:
+            return node
+        # its type changed since
+        self.noder.rm_node(node)
+        return None
+
+    def _rm_resumed(self, resumed: Dict[str, NodeAny]) -> int:
+        """
+        remove the nodes indexed before the checkpoint which were
+        not found again (removed or excluded since), return the
+        number of nodes removed, counted when resuming
+        """
+        cnt = 0
+        for node in resumed.values():
+            self._debug(f'{node.get_fullpath()} no longer indexed')
+            cnt += 1 + len(node.descendants)
+            self.noder.rm_node(node)
+        return cnt
+
+    def _dir_done(self, treepath: str) -> None:
+        """a directory was entirely indexed"""
+        if not self.checkpoint:
+            return
+        self.checkpoint.dir_done(treepath)
+        self._checkpoint()
+
+    def _checkpoint(self) -> None:
+        """save a checkpoint if due"""
+        if not self.checkpoint or not self.checkpoint.due():
+            return
+        # the archives being listed are added to the tree first
+        self.noder.attach_archives()
+        if self.checkpoint.save():
+            self._debug(f'checkpoint saved to {self.checkpoint.path}')
+
+    def _index_concurrent(self, path: str, parent: NodeAny,
+                          storagepath: str) -> int:
+        """
+        index a directory with a pool of threads listing directories
+        and gathering the files info (stat, hash) ahead of the tree
+        building, which consumes the scans in the same order
+        as the sequential walk for an identical tree
+        """
+        self.aborted = False
+        self.pool = ThreadPoolExecutor(max_workers=self.workers)
+        try:
+            cnt = self._build(self._submit(path, storagepath), parent)
+        finally:
+            # drop the pending scans on error
+            self.aborted = True
+            self.pool.shutdown(wait=True)
+            self.pool = None
+        return cnt
+
+    def _submit(self, path: str, treepath: str) -> 'Future[DirScan]':
+        """queue the scan of a directory"""
+        if not self.pool:
+            raise RuntimeError('no worker pool')
+        return self.pool.submit(self._scan, path, treepath)
+
+    def _scan(self, path: str, treepath: str) -> DirScan:
+        """list a directory and get its entries info, run by the workers"""
+        scan = DirScan(treepath)
+        if self.aborted:
+            return scan
+        for (root, dirs, files) in os.walk(path):
+            # queue the sub directories first to keep the workers busy
+            for adir in dirs:
+                sub = os.path.join(root, adir)
+                if not os.path.exists(sub):
+                    continue
+                subtree = os.path.join(treepath, adir)
+                if self.excluded(subtree, True) or self.other_fs(sub):
+                    continue
+                maccess = os.path.getmtime(sub)
+                future = None
+                if not self._is_dir_link(sub):
+                    future = self._submit(sub, subtree)
+                scan.dirs.append((os.path.basename(adir), sub,
+                                  maccess, future))
+            for file in files:
+                sub = os.path.join(root, file)
+                if not os.path.exists(sub):
+                    continue
+                if self.excluded(os.path.join(treepath, file)):
+                    continue
+                info = self.noder.get_file_info(sub)
+                if info:
+                    scan.files.append((os.path.basename(file), sub, info))
+            break
+        return scan
+
+    def _build(self, future: 'Future[DirScan]', parent: NodeAny) -> int:
+        """add the content of a scanned directory to the tree"""
+        scan = future.result()
+        cnt = 0
+        for name, sub, info in scan.files:
+            self._debug(f'index file {sub}')
+            node = self.noder.new_file_node(name, sub, parent, info=info)
+            if node:
+                self.reporter.update(name, info[0])
+                cnt += 1
+            self._checkpoint()
+        for name, sub, maccess, subfuture in scan.dirs:
+            self._debug(f'index directory {sub}')
+            node = self.noder.new_dir_node(name, sub, parent,
+                                           maccess=maccess)
+            cnt += 1
+            if subfuture:
+                cnt += self._build(subfuture, node)
+        self._dir_done(scan.treepath)
+        return cnt
+
     def reindex(self, path: str, parent: NodeAny, top: NodeTop) -> int:
         """reindex a directory and store in tree"""
-        cnt = self._reindex(path, parent, top)
+        self.load_storage(path, parent)
+        self.reporter = self._new_progress(path)
+        try:
+            with self.noder.metrics.timer(metrics.WALK):
+                cnt = self._reindex(path, parent, top)
+                self.noder.attach_archives()
+        finally:
+            self.reporter.done()
         cnt += self.noder.clean_not_flagged(parent)
+        # the first link of a file may have been removed
+        for node, attrs in self.noder.hardlinks.promote(parent):
+            self._debug(f'{node.get_fullpath()} hardlink changed')
+            if self.noder.journal:
+                self.noder.journal.changed(node, attrs)
+        self._log_changes()
         return cnt
 
+    def _log_changes(self) -> None:
+        """append the recorded changes to the log file"""
+        if not self.lpath or not self.noder.journal:
+            return
+        try:
+            cnt = self.noder.journal.dump(self.lpath)
+        except OSError as exc:
+            Logger.err(f'Cannot log changes to \"{self.lpath}\": {exc}')
+            return
+        self._debug(f'{cnt} change(s) logged to {self.lpath}')
+
     def _reindex(self, path: str,
                  parent: NodeAny,
                  top: NodeTop,
@@ -116,23 +429,30 @@ class Walker:
                 self._debug(f'found file \"{file}\" under {path}')
                 sub = os.path.join(root, file)
                 treepath = os.path.join(storagepath, file)
+                if self.excluded(treepath):
+                    # not flagged, removed if indexed before
+                    continue
                 reindex, node = self._need_reindex(parent, sub, treepath)
                 if not reindex:
                     self._debug(f'\tskip file {sub}')
                     if node:
                         node.flag()
+                        self.reporter.update(file, node.nodesize)
                     continue
                 node = self.noder.new_file_node(os.path.basename(file),
                                                 sub,
                                                 parent)
                 if node:
                     node.flag()
+                    self.reporter.update(file, node.nodesize)
                     cnt += 1
             for adir in dirs:
                 self._debug(f'found dir \"{adir}\" under {path}')
                 base = os.path.basename(adir)
                 sub = os.path.join(root, adir)
                 treepath = os.path.join(storagepath, adir)
+                if self.excluded(treepath, True) or self.other_fs(sub):
+                    continue
                 reindex, dummy = self._need_reindex(parent, sub, treepath)
                 if reindex:
                     dummy = self.noder.new_dir_node(base, sub,
@@ -172,7 +492,7 @@ class Walker:
             # remove this node and re-add
             self._debug(f'\t{path} has changed')
             self._debug(f"\tremoving node {node.get_name()} for {path}")
-            node.parent = None
+            self.noder.rm_node(node)
         return True, node
 
     def _debug(self, string: str) -> None:
@@ -181,14 +501,72 @@ class Walker:
             return
         Logger.debug(string)
 
-    def _progress(self, string: str) -> None:
-        """print progress"""
-        if self.debug:
-            return
-        if not string:
-            # clean
-            Logger.progr(' ' * 80)
-            return
-        if len(string) > self.MAXLINELEN:
-            string = string[:self.MAXLINELEN] + '...'
-        Logger.progr(f'indexing: {string:80}')
+
+def index_storage(name: str,
+                  path: str,
+                  attrs: Any,
+                  usehash: bool = False,
+                  arc: bool = False,
+                  arcdepth: int = 0,
+                  debug: bool = False,
+                  workers: int = 0,
+                  arcworkers: int = 0,
+                  cache: bool = False,
+                  iolimit: Optional[IOLimit] = None,
+                  patterns: Optional[List[str]] = None,
+                  onefs: bool = False,
+                  checkpoint: Optional[StorageCheckpoint] = None) \
+            -> Tuple[List[FlatNode], int, Dict[str, Any]]:
+    """
+    index a path in a new standalone storage node, this is
+    run in worker processes to index storages concurrently
+    returns the flattened storage tree, the number of indexed nodes
+    and the metrics of the indexing
+    @name: the storage name
+    @path: path to index
+    @attrs: storage attributes
+    @usehash: calculate hash of nodes
+    @arc: handle archive
+    @arcdepth: levels of archives within archives to list
+    @debug: debug mode
+    @workers: number of threads scanning directories
+    @arcworkers: number of processes listing archives
+    @cache: use the archive listing cache
+    @iolimit: the I/O budget of this process
+    @patterns: gitignore-style rules of the paths not to index
+    @onefs: do not walk directories on other filesystems
+    @checkpoint: the checkpoint of the storage, resumed if it exists
+    """
+    arccache = ArchiveCache() if cache else None
+    noder = Noder(debug=debug, arc=arc, arccache=arccache,
+                  arcworkers=arcworkers, arcdepth=arcdepth, iolimit=iolimit)
+    walker = Walker(noder, usehash=usehash, debug=debug, progress=False,
+                    workers=workers, patterns=patterns, onefs=onefs,
+                    checkpoint=checkpoint)
+    storage, cnt = resume_storage(checkpoint)
+    if storage is None:
+        storage = noder.new_storage_node(name, path, None, attrs)
+        if checkpoint:
+            checkpoint.begin(storage)
+    if not checkpoint or not checkpoint.complete:
+        _, cnt2 = walker.index(path, storage, name)
+        cnt += cnt2
+        with noder.metrics.timer(metrics.FIXSIZES):
+            storage.nodesize = storage.get_rec_size()
+        if checkpoint:
+            checkpoint.finish()
+    return flatten(storage), cnt, noder.metrics.to_dict()
+
+
+def resume_storage(checkpoint: Optional[StorageCheckpoint]) \
+        -> Tuple[Optional[NodeAny], int]:
+    """
+    load the storage tree of checkpoint if it exists,
+    return it (if any) and its number of nodes,
+    may raise CatcliException
+    """
+    if not checkpoint or not checkpoint.exists():
+        return None, 0
+    checkpoint.load()
+    storage = checkpoint.tree
+    return storage, len(storage.descendants)
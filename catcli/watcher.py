@@ -0,0 +1,382 @@
+"""
+author: deadc0de6 (https://github.com/deadc0de6)
+Copyright (c) 2024, deadc0de6
+
+Keep a storage up to date in the catalog
+from the inotify events (linux only)
+"""
+
+import os
+import time
+import errno
+import select
+import struct
+import ctypes
+import ctypes.util
+from typing import Dict, List, Tuple, Optional
+
+# local imports
+from catcli import nodes
+from catcli.nodes import NodeAny, NodeTop, NodeStorage
+from catcli.noder import Noder
+from catcli.catalog import Catalog
+from catcli.walker import Walker
+from catcli.logger import Logger
+from catcli.exceptions import CatcliException
+
+
+# inotify flags (see inotify(7))
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_UNMOUNT = 0x00002000
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+# file content is only considered once written and closed
+MASK = IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | \
+    IN_CREATE | IN_DELETE | IN_DELETE_SELF
+# events bringing a new directory that needs to be walked
+NEWDIR = IN_CREATE | IN_MOVED_TO
+
+EVENT = struct.Struct('iIII')
+BUFSIZE = 64 * 1024
+
+# seconds without events before saving the changes
+DELAY = 2.0
+# max seconds changes are kept unsaved under constant activity
+MAXDELAY = 30.0
+
+# wd, mask, name
+Event = Tuple[int, int, str]
+
+
+class Inotify:
+    """minimal inotify binding with ctypes"""
+
+    def __init__(self) -> None:
+        libname = ctypes.util.find_library('c') or 'libc.so.6'
+        try:
+            libc = ctypes.CDLL(libname, use_errno=True)
+            self.init1 = libc.inotify_init1
+            self.add_watch = libc.inotify_add_watch
+            self.rm_watch = libc.inotify_rm_watch
+        except (OSError, AttributeError) as exc:
+            raise CatcliException(f'inotify is not available: {exc}') \
+                from exc
+        self.init1.argtypes = [ctypes.c_int]
+        self.add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p,
+                                   ctypes.c_uint32]
+        self.rm_watch.argtypes = [ctypes.c_int, ctypes.c_int]
+        self.fd = self.init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            err = ctypes.get_errno()
+            raise CatcliException(f'inotify init failed: '
+                                  f'{os.strerror(err)}')
+
+    def add(self, path: str, mask: int) -> int:
+        """watch a path, return the watch descriptor or -1"""
+        wd = self.add_watch(self.fd, os.fsencode(path), mask)
+        if wd < 0:
+            err = ctypes.get_errno()
+            if err == errno.ENOSPC:
+                Logger.err('inotify watches limit reached, '
+                           'see /proc/sys/fs/inotify/max_user_watches')
+            elif err != errno.ENOENT:
+                Logger.err(f'Cannot watch \"{path}\": {os.strerror(err)}')
+        return int(wd)
+
+    def rm(self, wd: int) -> None:
+        """stop watching"""
+        self.rm_watch(self.fd, wd)
+
+    def read(self, timeout: Optional[float] = None) -> List[Event]:
+        """wait up to timeout seconds and return the pending events"""
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return []
+        try:
+            data = os.read(self.fd, BUFSIZE)
+        except BlockingIOError:
+            return []
+        events = []
+        pos = 0
+        while pos + EVENT.size <= len(data):
+            wd, mask, _, size = EVENT.unpack_from(data, pos)
+            pos += EVENT.size
+            name = os.fsdecode(data[pos:pos + size].rstrip(b'\0'))
+            pos += size
+            events.append((wd, mask, name))
+        return events
+
+    def close(self) -> None:
+        """release the inotify instance"""
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
+
+
+class Watcher:
+    """
+    apply the filesystem events of a storage to the catalog,
+    bursts of events are coalesced by path and the changes
+    are saved once no event was received for delay seconds
+    (or after maxdelay seconds under constant activity)
+    """
+
+    def __init__(self, noder: Noder,
+                 catalog: Catalog,
+                 top: NodeTop,
+                 storage: NodeStorage,
+                 path: str,
+                 usehash: bool = False,
+                 debug: bool = False,
+                 delay: float = DELAY,
+                 maxdelay: float = MAXDELAY,
+                 patterns: Optional[List[str]] = None,
+                 onefs: bool = False) -> None:
+        """
+        @noder: the noder to use
+        @catalog: the catalog to save the changes to
+        @top: the top node
+        @storage: the storage node of path
+        @path: the path of the storage
+        @usehash: calculate hash of the files
+        @debug: debug mode
+        @delay: seconds without events before saving
+        @maxdelay: max seconds before saving
+        @patterns: gitignore-style rules of the paths not to index
+        @onefs: do not watch directories on other filesystems
+        """
+        self.noder = noder
+        self.catalog = catalog
+        self.top = top
+        self.storage = storage
+        self.path = os.path.abspath(path)
+        self.debug = debug
+        self.delay = delay
+        self.maxdelay = maxdelay
+        self.walker = Walker(noder, usehash=usehash, debug=debug,
+                             progress=False, patterns=patterns,
+                             onefs=onefs)
+        self.walker.load_storage(self.path, storage)
+        self.inotify = Inotify()
+        # watch descriptor to directory path
+        self.wds: Dict[int, str] = {}
+        # relative path to the events it received
+        self.pending: Dict[str, int] = {}
+        # the events were lost, the storage must be rescanned
+        self.rescan = False
+        self.stopped = False
+        self.first = 0.0
+        self.last = 0.0
+        if self.noder.journal is None:
+            self.noder.journal = catalog.new_journal()
+        self._watch_tree(self.path)
+
+    def run(self) -> None:
+        """watch until interrupted or the storage disappears"""
+        Logger.info(f'watching \"{self.path}\" ({len(self.wds)} '
+                    'directories), press ctrl-c to stop')
+        try:
+            while not self.stopped:
+                self.poll()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.flush()
+            self.close()
+
+    def poll(self, timeout: Optional[float] = None) -> None:
+        """wait for events and apply them once settled"""
+        if self.pending or self.rescan:
+            left = min(self.last + self.delay,
+                       self.first + self.maxdelay) - time.monotonic()
+            timeout = max(0.0, left if timeout is None
+                          else min(timeout, left))
+        for event in self.inotify.read(timeout):
+            self._event(*event)
+        if not self.pending and not self.rescan:
+            return
+        now = time.monotonic()
+        if now >= self.last + self.delay or \
+                now >= self.first + self.maxdelay:
+            self.flush()
+
+    def flush(self) -> int:
+        """apply the pending changes and save the catalog"""
+        pending = self.pending
+        self.pending = {}
+        if self.rescan:
+            self.rescan = False
+            pending = {}
+            self._debug(f'rescanning \"{self.path}\"')
+            self.walker.reindex(self.path, self.storage, self.top)
+            self._watch_tree(self.path)
+        for rel in self._coalesce(pending):
+            self._apply(rel, pending[rel])
+        self.noder.attach_archives()
+        if not self.noder.dirty:
+            return 0
+        self.noder.fixsizes(self.top)
+        self.noder.update_storage_path(self.top, self.storage.name,
+                                       self.path)
+        journal = self.noder.journal
+        cnt = len(journal.records) if journal else 0
+        if journal:
+            self.catalog.save_journal(self.top, journal)
+        else:
+            self.catalog.save(self.top)
+        self.noder.dirty = False
+        Logger.info(f'{cnt} change(s) saved to the catalog')
+        return cnt
+
+    def close(self) -> None:
+        """stop watching"""
+        self.inotify.close()
+        self.wds = {}
+
+    def _watch_tree(self, path: str) -> None:
+        """watch a directory and its sub-directories not excluded"""
+        for root, dirs, _ in os.walk(path):
+            wd = self.inotify.add(root, MASK | IN_ONLYDIR)
+            if wd >= 0:
+                self.wds[wd] = root
+            rel = os.path.relpath(root, self.path)
+            dirs[:] = [x for x in dirs if not self.walker.excluded(
+                os.path.normpath(os.path.join(rel, x)), True) and
+                not self.walker.other_fs(os.path.join(root, x))]
+
+    def _unwatch_tree(self, path: str) -> None:
+        """stop watching a directory and its sub-directories"""
+        prefix = path + os.sep
+        for wd, wpath in list(self.wds.items()):
+            if wpath == path or wpath.startswith(prefix):
+                self.inotify.rm(wd)
+                del self.wds[wd]
+
+    def _event(self, wd: int, mask: int, name: str) -> None:
+        """record an event"""
+        if mask & IN_Q_OVERFLOW:
+            Logger.err('inotify queue overflow, rescanning')
+            self._touch()
+            self.rescan = True
+            return
+        directory = self.wds.get(wd)
+        if directory is None:
+            return
+        if mask & IN_IGNORED:
+            del self.wds[wd]
+            return
+        if not name:
+            if directory == self.path and \
+                    mask & (IN_DELETE_SELF | IN_UNMOUNT):
+                Logger.err(f'\"{self.path}\" is gone, stop watching')
+                self.stopped = True
+            # events of the directory itself are
+            # received through its parent
+            return
+        path = os.path.join(directory, name)
+        rel = os.path.relpath(path, self.path)
+        if self.walker.excluded(rel, bool(mask & IN_ISDIR)):
+            return
+        self._debug(f'event {mask:#x} on \"{path}\"')
+        if mask & IN_ISDIR:
+            if mask & IN_MOVED_FROM:
+                self._unwatch_tree(path)
+            if mask & NEWDIR:
+                self._watch_tree(path)
+        self._touch()
+        self.pending[rel] = self.pending.get(rel, 0) | mask
+
+    def _touch(self) -> None:
+        """an event was received"""
+        now = time.monotonic()
+        if not self.pending and not self.rescan:
+            self.first = now
+        self.last = now
+
+    @staticmethod
+    def _coalesce(pending: Dict[str, int]) -> List[str]:
+        """
+        return the paths to apply, parents first,
+        without the ones under a new directory
+        that is walked entirely
+        """
+        paths = []
+        walked: List[str] = []
+        for rel in sorted(pending, key=lambda x: x.split(os.sep)):
+            if any(rel.startswith(x + os.sep) for x in walked):
+                continue
+            if pending[rel] & IN_ISDIR and pending[rel] & NEWDIR:
+                walked.append(rel)
+            paths.append(rel)
+        return paths
+
+    def _get_node(self, rel: str) -> Optional[NodeAny]:
+        """return the node of a relative path"""
+        node: Optional[NodeAny] = self.storage
+        for name in rel.split(os.sep):
+            if not node:
+                return None
+            node = self.noder.get_node(node, name, quiet=True)
+        return node
+
+    def _apply(self, rel: str, mask: int) -> None:
+        """bring the node of a path up to date"""
+        path = os.path.join(self.path, rel)
+        parentrel, name = os.path.split(rel)
+        parent = self._get_node(parentrel) if parentrel else self.storage
+        if not parent or parent.type not in nodes.CONTAINERS:
+            # the parent is not indexed (yet)
+            return
+        node = self.noder.get_node(parent, name, quiet=True)
+        if not os.path.exists(path):
+            if node:
+                self._debug(f'remove \"{rel}\"')
+                self.noder.rm_node(node)
+            return
+        if os.path.isdir(path):
+            self._apply_dir(path, name, parent, node, mask)
+            return
+        if node and node.type == nodes.TYPE_FILE:
+            _, changed = self.noder.get_node_if_changed(parent, path, name)
+            if not changed:
+                return
+        if node:
+            self.noder.rm_node(node)
+        self._debug(f'index file \"{rel}\"')
+        self.noder.new_file_node(name, path, parent)
+
+    def _apply_dir(self, path: str, name: str, parent: NodeAny,
+                   node: Optional[NodeAny], mask: int) -> None:
+        """bring the node of a directory up to date"""
+        if node and node.type == nodes.TYPE_DIR and not mask & NEWDIR:
+            # only its attributes changed
+            maccess = os.path.getmtime(path)
+            if node.maccess != maccess:
+                node.maccess = maccess
+                self.noder.dirty = True
+                if self.noder.journal:
+                    self.noder.journal.changed(node, {'maccess': maccess})
+            return
+        if node:
+            self.noder.rm_node(node)
+        self._debug(f'index directory \"{path}\"')
+        sub = self.noder.new_dir_node(name, path, parent)
+        self.walker.index(path, sub, name,
+                          storagepath=os.path.relpath(path, self.path))
+
+    def _debug(self, string: str) -> None:
+        """print to debug"""
+        if not self.debug:
+            return
+        Logger.debug(string)
@@ -13,6 +13,7 @@ echo "[+] pycodestyle"
 pycodestyle --version
 pycodestyle catcli/
 pycodestyle tests/
+pycodestyle benchmarks/
 pycodestyle setup.py
 
 # pyflakes
@@ -20,6 +21,7 @@ echo "[+] pyflakes"
 pyflakes --version
 pyflakes catcli/
 pyflakes tests/
+pyflakes benchmarks/
 pyflakes setup.py
 
 # pylint
@@ -0,0 +1,232 @@
+"""
+author: deadc0de6 (https://github.com/deadc0de6)
+Copyright (c) 2024, deadc0de6
+
+Basic unittest for catalog save/restore
+"""
+
+import io
+import os
+import unittest
+from unittest import mock
+from anytree.exporter import JsonExporter, DictExporter
+
+from catcli.catalog import Catalog, attriter, back_attriter
+from catcli.jsonstream import JsonStreamReader
+from catcli.exceptions import CatcliException
+from catcli.snapshot import Snapshot, flatten, unflatten
+from catcli import compress
+from catcli.noder import Noder
+from catcli.nodes import NodeFile, typcast_node
+from tests.helpers import get_tempdir, clean, get_fakecatalog, \
+    read_from_file
+
+
+class TestCatalog(unittest.TestCase):
+    """test catalog"""
+
+    def test_save(self):
+        """test streaming save"""
+        # init
+        workingdir = get_tempdir()
+        self.addCleanup(clean, workingdir)
+        path = os.path.join(workingdir, 'catalog.json')
+        catalog = Catalog(path, force=True, debug=False)
+        top = catalog._restore_json(get_fakecatalog())
+        noder = Noder()
+        meta = noder.update_metanode(top)
+        catalog.set_metanode(meta)
+
+        # save and ensure it is identical to the anytree exporter
+        self.assertTrue(catalog.save(top))
+        dexporter = DictExporter(attriter=attriter)
+        exp = JsonExporter(dictexporter=dexporter, indent=2, sort_keys=True)
+        self.assertEqual(read_from_file(path), exp.export(top))
+
+        # no temporary file left behind
+        self.assertEqual(os.listdir(workingdir), ['catalog.json'])
+
+        # mode of an existing catalog is kept
+        os.chmod(path, 0o640)
+        self.assertTrue(catalog.save(top))
+        self.assertEqual(os.stat(path).st_mode & 0o777, 0o640)
+
+        # restore it
+        top = Catalog(path, force=True, debug=False).restore()
+        self.assertTrue(top)
+        storage = noder.find_storage_node_by_name(top, 'tmpdir')
+        self.assertTrue(storage)
+        self.assertEqual(len(storage.children), 5)
+
+    def test_restore(self):
+        """test streaming restore"""
+        # parse with tiny chunks to exercise the buffering
+        content = get_fakecatalog()
+        for chunksize in [1, 3, 16, 4096]:
+            reader = JsonStreamReader(backattr=back_attriter,
+                                      chunksize=chunksize)
+            root = reader.read(io.StringIO(content))
+            self.assertEqual(reader.cnt, 10)
+            self.assertEqual(root.__dict__['name'], 'top')
+            storage = root.children[0]
+            self.assertEqual(storage.ts, 1500000000.0)
+            self.assertEqual(storage.free, 100000000000)
+            self.assertEqual(len(storage.children), 5)
+            self.assertEqual(storage.children[4].nodesize, 200)
+            self.assertNotIn('size', storage.children[4].__dict__)
+
+        # truncated catalog
+        reader = JsonStreamReader(backattr=back_attriter)
+        with self.assertRaises(CatcliException):
+            reader.read(io.StringIO(content[:-10]))
+
+    def test_compression(self):
+        """test compressed catalogs"""
+        workingdir = get_tempdir()
+        self.addCleanup(clean, workingdir)
+        top = Catalog('fake')._restore_json(get_fakecatalog())
+
+        # compression from the extension
+        path = os.path.join(workingdir, 'catalog.json.gz')
+        catalog = Catalog(path, force=True, debug=False)
+        self.assertTrue(catalog.save(top))
+        self.assertEqual(compress.detect(path), compress.GZIP)
+
+        # compression is detected on load and kept on save
+        for compression in [compress.BZ2, compress.LZMA, compress.NONE]:
+            path = os.path.join(workingdir, 'catalog')
+            catalog = Catalog(path, force=True, compression=compression,
+                              level=1)
+            self.assertTrue(catalog.save(top))
+            self.assertEqual(compress.detect(path), compression)
+            catalog = Catalog(path, force=True)
+            restored = catalog.restore()
+            self.assertEqual(len(restored.children[0].children), 5)
+            self.assertTrue(catalog.save(restored))
+            self.assertEqual(compress.detect(path), compression)
+
+        # bad settings
+        with self.assertRaises(CatcliException):
+            Catalog(path, compression='abc')
+        with self.assertRaises(CatcliException):
+            Catalog(path, compression=compress.GZIP, level=12)
+        with self.assertRaises(CatcliException):
+            Catalog(path, compression=compress.BZ2, level=0)
+        # compression from the extension, checked on save
+        path = os.path.join(workingdir, 'bad.json.bz2')
+        catalog = Catalog(path, force=True, level=0)
+        self.assertFalse(catalog.save(top))
+        self.assertFalse([x for x in os.listdir(workingdir)
+                          if x.endswith('.tmp')])
+        self.assertFalse(os.path.exists(path))
+
+    def test_snapshot(self):
+        """test the snapshot cache"""
+        workingdir = get_tempdir()
+        self.addCleanup(clean, workingdir)
+        cachedir = os.path.join(workingdir, 'cache')
+        path = os.path.join(workingdir, 'catalog.json')
+        top = Catalog('fake')._restore_json(get_fakecatalog())
+        exp = JsonExporter(dictexporter=DictExporter(attriter=attriter),
+                           indent=2, sort_keys=True)
+
+        # flatten round trip
+        root = unflatten(flatten(top))
+        self.assertEqual(exp.export(root), exp.export(top))
+
+        with mock.patch.dict(os.environ, {'XDG_CACHE_HOME': cachedir}):
+            snapshot = Snapshot(path)
+            # snapshot written on save
+            catalog = Catalog(path, force=True, cache=True)
+            self.assertTrue(catalog.save(top))
+            self.assertTrue(os.path.exists(snapshot.snappath))
+            self.assertTrue(snapshot.load())
+
+            # snapshot used on restore
+            with mock.patch.object(Catalog, '_restore_json_stream') as mod:
+                restored = Catalog(path, cache=True).restore()
+                mod.assert_not_called()
+            self.assertEqual(exp.export(restored), exp.export(top))
+
+            # catalog changed behind our back
+            top.children[0].children[0].parent = None
+            self.assertTrue(Catalog(path, force=True).save(top))
+            self.assertIsNone(snapshot.load())
+            restored = Catalog(path, cache=True).restore()
+            self.assertEqual(len(restored.children[0].children), 4)
+            # and the snapshot was rebuilt
+            self.assertTrue(snapshot.load())
+
+            # corrupted snapshot falls back to json
+            with open(snapshot.snappath, 'r+b') as file:
+                file.truncate(os.path.getsize(snapshot.snappath) // 2)
+            self.assertIsNone(snapshot.load())
+            restored = Catalog(path, cache=True).restore()
+            self.assertEqual(len(restored.children[0].children), 4)
+
+    def test_journal(self):
+        """test the journal replay"""
+        workingdir = get_tempdir()
+        self.addCleanup(clean, workingdir)
+        path = os.path.join(workingdir, 'catalog.json')
+        catalog = Catalog(path, force=True)
+        top = catalog._restore_json(get_fakecatalog())
+        self.assertTrue(catalog.save(top))
+        storage = top.children[0]
+
+        # record some changes
+        noder = Noder()
+        noder.journal = catalog.new_journal()
+        typcast_node(storage)
+        old = storage.children[0]
+        noder.rm_node(old)
+        NodeFile(old.name, 1234, '', 0.0, parent=storage)
+        noder._added(storage.children[-1])
+        noder.rm_node(storage.children[0])
+        noder.fixsizes(top)
+        ops = [x['op'] for x in noder.journal.records]
+        self.assertEqual(ops, ['mod', 'rm', 'set', 'set'])
+        self.assertTrue(catalog.save_journal(top, noder.journal))
+        self.assertTrue(os.path.exists(catalog.journal_path))
+
+        # replayed on restore
+        restored = Catalog(path).restore()
+        names = [x.name for x in restored.children[0].children]
+        self.assertEqual(names, [x.name for x in storage.children])
+        self.assertEqual(restored.children[0].nodesize, storage.nodesize)
+
+        # an interrupted write is ignored
+        with open(catalog.journal_path, 'a', encoding='UTF-8') as file:
+            file.write('{"op":"rm","pa')
+        restored = Catalog(path).restore()
+        self.assertEqual(len(restored.children[0].children),
+                         len(storage.children))
+
+        # a journal not matching the catalog is ignored
+        with open(path, 'a', encoding='UTF-8') as file:
+            file.write('\n')
+        restored = Catalog(path).restore()
+        self.assertEqual(len(restored.children[0].children), 5)
+
+        # later changes are not appended to the stale journal
+        top = Catalog(path).restore()
+        storage = top.children[0]
+        noder = Noder()
+        noder.journal = catalog.new_journal()
+        noder.rm_node(storage.children[0])
+        self.assertTrue(catalog.save_journal(top, noder.journal))
+        self.assertFalse(os.path.exists(catalog.journal_path))
+        noder.rm_node(storage.children[0])
+        self.assertTrue(catalog.save_journal(top, noder.journal))
+        self.assertTrue(os.path.exists(catalog.journal_path))
+        restored = Catalog(path).restore()
+        self.assertEqual(len(restored.children[0].children), 3)
+
+
+def main():
+    """entry point"""
+    unittest.main()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,136 @@
+"""
+author: deadc0de6 (https://github.com/deadc0de6)
+Copyright (c) 2024, deadc0de6
+
+Basic unittest for the indexing checkpoints
+"""
+
+import os
+import shutil
+import unittest
+
+from catcli.catcli import cmd_index
+from catcli.noder import Noder
+from catcli.walker import Walker
+from catcli.catalog import Catalog
+from catcli.checkpoint import StorageCheckpoint, SUFFIX
+from tests.helpers import create_dir, create_rnd_file, get_tempdir, \
+    clean
+
+
+def get_names(node):
+    """return the relative paths of the nodes under node"""
+    depth = len(node.path)
+    return sorted(os.path.join(*[x.name for x in n.path[depth:]])
+                  for n in node.descendants)
+
+
+class TestCheckpoint(unittest.TestCase):
+    """test the indexing checkpoints"""
+
+    def test_save(self):
+        """test the checkpoint is periodically saved"""
+        workingdir = get_tempdir()
+        self.addCleanup(clean, workingdir)
+        dirpath = create_dir(workingdir, 'disk')
+        create_rnd_file(create_dir(dirpath, 'sub'), 'file')
+        path = os.path.join(workingdir, 'catalog.json' + SUFFIX + '.0')
+
+        for interval in [0, 0.000001]:
+            noder = Noder()
+            top = noder.new_top_node()
+            checkpoint = StorageCheckpoint(path, interval=interval)
+            walker = Walker(noder, usehash=False, progress=False,
+                            checkpoint=checkpoint)
+            storage = noder.new_storage_node('disk', dirpath, top, '')
+            checkpoint.begin(storage)
+            walker.index(dirpath, storage, 'disk')
+            self.assertEqual(checkpoint.exists(), interval > 0)
+
+        loaded = StorageCheckpoint(path)
+        loaded.load()
+        self.assertTrue(loaded.resuming)
+        self.assertLessEqual(loaded.done, {'', 'sub'})
+        self.assertEqual(checkpoint.done, {'', 'sub'})
+        checkpoint.save()
+        loaded.load()
+        self.assertEqual(loaded.done, {'', 'sub'})
+        self.assertEqual(get_names(loaded.tree), ['sub', 'sub/file'])
+
+        # a completed storage is not resumed
+        checkpoint.finish()
+        loaded.load()
+        self.assertTrue(loaded.complete)
+        self.assertFalse(loaded.resuming)
+        # the delay grows with the cost of a checkpoint
+        self.assertGreater(checkpoint.delay, checkpoint.interval)
+
+    def test_resume(self):
+        """test an interrupted index is resumed"""
+        workingdir = get_tempdir()
+        self.addCleanup(clean, workingdir)
+        catalogpath = os.path.join(workingdir, 'catalog.json')
+        disk0 = create_dir(workingdir, 'disk0')
+        create_rnd_file(disk0, 'a')
+        create_rnd_file(disk0, 'f3')
+        sub1 = create_dir(disk0, 'sub1')
+        create_rnd_file(sub1, 'f1')
+        sub2 = create_dir(disk0, 'sub2')
+        create_rnd_file(sub2, 'f2')
+        sub3 = create_dir(disk0, 'sub3')
+        create_rnd_file(sub3, 'f5')
+        disk1 = create_dir(workingdir, 'disk1')
+        create_rnd_file(disk1, 'b')
+        storages = [('disk0', disk0), ('disk1', disk1)]
+
+        # interrupted within disk0 once sub1 was indexed
+        noder = Noder()
+        top = noder.new_top_node()
+        checkpoint = Catalog(catalogpath).new_checkpoint(300)
+        checkpoint.start(storages, ['meta'])
+        storagecp = checkpoint.get_storage(0)
+        walker = Walker(noder, usehash=False, progress=False)
+        storage = noder.new_storage_node('disk0', disk0, top, ['meta'])
+        storagecp.begin(storage)
+        walker.index(disk0, storage, 'disk0')
+        noder.get_node(storage, 'f3').parent = None
+        subnode = noder.get_node(storage, 'sub2')
+        noder.get_node(subnode, 'f2').parent = None
+        storagecp.done = {'sub1'}
+        self.assertTrue(storagecp.save())
+
+        # completed directories are not walked again
+        create_rnd_file(sub1, 'new')
+        create_rnd_file(sub2, 'f4')
+        # removed since the interruption
+        os.remove(os.path.join(disk0, 'a'))
+        shutil.rmtree(sub3)
+
+        noder = Noder()
+        top = noder.new_top_node()
+        catalog = Catalog(catalogpath, force=True, debug=False)
+        args = {'--resume': True, '--checkpoint': '300', '--jobs': '2',
+                '--hash': False, '--archive': False, '--meta': [],
+                '--verbose': False}
+        cmd_index(args, noder, catalog, top)
+
+        self.assertFalse(checkpoint.exists())
+        self.assertFalse(storagecp.exists())
+        top = Catalog(catalogpath).restore()
+        self.assertEqual(noder.get_storage_names(top), ['disk0', 'disk1'])
+        storage = noder.find_storage_node_by_name(top, 'disk0')
+        self.assertEqual(get_names(storage),
+                         ['f3', 'sub1', 'sub1/f1',
+                          'sub2', 'sub2/f2', 'sub2/f4'])
+        self.assertEqual(storage.attr, 'meta')
+        storage = noder.find_storage_node_by_name(top, 'disk1')
+        self.assertEqual(get_names(storage), ['b'])
+
+
+def main():
+    """entry point"""
+    unittest.main()
+
+
+if __name__ == '__main__':
+    main()
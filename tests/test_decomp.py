@@ -5,9 +5,21 @@ Copyright (c) 2017, deadc0de6
 Basic unittest for ls
 """
 
+import io
+import os
+import json
+import lzma
+import tarfile
+import zipfile
 import unittest
+from unittest import mock
 
 from catcli.decomp import Decomp
+from catcli.noder import Noder
+from catcli.walker import Walker
+from catcli.archcache import ArchiveCache
+from tests.helpers import get_tempdir, clean, create_dir, create_rnd_file, \
+    md5sum
 
 
 class TestDecomp(unittest.TestCase):
@@ -19,6 +31,190 @@ class TestDecomp(unittest.TestCase):
         formats = dec.get_formats()
         self.assertTrue('zip' in formats)
 
+    def test_archive_tree(self):
+        """test the archive tree building"""
+        workingdir = get_tempdir()
+        self.addCleanup(clean, workingdir)
+        path = os.path.join(workingdir, 'arc.tar')
+        with tarfile.open(path, 'w') as tar:
+            for name, data in [('d/a', b'aaa'), ('d/e/b', b'bb'),
+                               ('./c', b'c')]:
+                info = tarfile.TarInfo(name)
+                info.size = len(data)
+                info.mtime = 1000
+                tar.addfile(info, io.BytesIO(data))
+            info = tarfile.TarInfo('d')
+            info.type = tarfile.DIRTYPE
+            tar.addfile(info)
+        members = Decomp().get_members(path)
+        self.assertEqual(len(members), 4)
+        self.assertIn(('d/a', 3, 1000.0, False), members)
+
+        noder = Noder(arc=True)
+        top = noder.new_top_node()
+        storage = noder.new_storage_node('tmp', workingdir, top, '')
+        node = noder.new_file_node('arc.tar', path, storage)
+        self.assertEqual(sorted(x.name for x in node.children), ['c', 'd'])
+        sizes = {x.name: x.nodesize for x in node.descendants}
+        self.assertEqual(sizes, {'d': 5, 'a': 3, 'e': 2, 'b': 2, 'c': 1})
+        # the archive content is not counted twice
+        self.assertEqual(storage.get_rec_size(), os.path.getsize(path))
+
+        # du works within archives
+        noder.out.stream = io.StringIO()
+        noder.diskusage(top, 'tmp/arc.tar/d', fmt='jsonl')
+        lines = noder.out.stream.getvalue().splitlines()
+        self.assertEqual([(x['name'], x['size'])
+                          for x in map(json.loads, lines)],
+                         [('d', 5), ('e', 2)])
+
+    def test_limits(self):
+        """test the archive listing limits"""
+        workingdir = get_tempdir()
+        self.addCleanup(clean, workingdir)
+        srcdir = create_dir(workingdir, 'src')
+        for idx in range(5):
+            create_rnd_file(srcdir, f'f{idx}')
+        path = os.path.join(workingdir, 'arc.tar.gz')
+        with tarfile.open(path, 'w:gz') as tar:
+            tar.add(srcdir, arcname='src')
+
+        dec = Decomp(maxmembers=6)
+        self.assertEqual(len(dec.get_members(path)), 6)
+        self.assertEqual(dec.truncated, '')
+        dec = Decomp(maxmembers=3)
+        self.assertEqual(len(dec.get_members(path)), 3)
+        self.assertIn('3 members', dec.truncated)
+
+        # a truncated stream returns the members read so far
+        with open(path, 'rb') as file:
+            data = file.read()
+        with open(path, 'wb') as file:
+            file.write(data[:len(data) // 2])
+        dec = Decomp()
+        self.assertLess(len(dec.get_members(path)), 6)
+        self.assertIn('error', dec.truncated)
+
+    def test_legacy_lzma(self):
+        """test a tar compressed with the legacy lzma format"""
+        workingdir = get_tempdir()
+        self.addCleanup(clean, workingdir)
+        raw = io.BytesIO()
+        with tarfile.open(fileobj=raw, mode='w') as tar:
+            info = tarfile.TarInfo('f')
+            info.size = 3
+            tar.addfile(info, io.BytesIO(b'abc'))
+        data = lzma.compress(raw.getvalue(), format=lzma.FORMAT_ALONE)
+        for name in ['arc.tar.lzma', 'arc.tlz']:
+            path = os.path.join(workingdir, name)
+            with open(path, 'wb') as file:
+                file.write(data)
+            dec = Decomp()
+            self.assertEqual([x[0] for x in dec.get_members(path)], ['f'])
+            self.assertEqual(dec.truncated, '')
+
+    def test_nested(self):
+        """test archives within archives"""
+        workingdir = get_tempdir()
+        self.addCleanup(clean, workingdir)
+        srcdir = create_dir(workingdir, 'src')
+        create_rnd_file(srcdir, 'a')
+        inner = os.path.join(workingdir, 'inner.tar')
+        with tarfile.open(inner, 'w') as tar:
+            tar.add(os.path.join(srcdir, 'a'), arcname='a')
+        middle = os.path.join(workingdir, 'middle.zip')
+        with zipfile.ZipFile(middle, 'w') as zfile:
+            zfile.write(inner, arcname='sub/inner.tar')
+        path = os.path.join(workingdir, 'outer.tar.gz')
+        with tarfile.open(path, 'w:gz') as tar:
+            tar.add(middle, arcname='middle.zip')
+
+        def names(**kwargs):
+            dec = Decomp(**kwargs)
+            return [x[0] for x in dec.get_members(path)], dec.truncated
+
+        self.assertEqual(names(), (['middle.zip'], ''))
+        self.assertEqual(names(depth=1),
+                         (['middle.zip', 'middle.zip/sub/inner.tar'], ''))
+        self.assertEqual(names(depth=2),
+                         (['middle.zip', 'middle.zip/sub/inner.tar',
+                           'middle.zip/sub/inner.tar/a'], ''))
+        found, truncated = names(depth=2, maxbytes=10)
+        self.assertEqual(found, ['middle.zip'])
+        self.assertIn('bytes', truncated)
+
+        # an encrypted or unsupported member is only skipped
+        for exc in [RuntimeError('encrypted'), NotImplementedError('lzw')]:
+            with mock.patch.object(zipfile.ZipFile, 'open', side_effect=exc):
+                self.assertEqual(names(depth=2),
+                                 (['middle.zip', 'middle.zip/sub/inner.tar'],
+                                  ''))
+
+        # the nested archive keeps its own size
+        noder = Noder(arc=True, arcdepth=2)
+        top = noder.new_top_node()
+        storage = noder.new_storage_node('tmp', workingdir, top, '')
+        node = noder.new_file_node('outer.tar.gz', path, storage)
+        zipnode = node.children[0]
+        self.assertEqual(zipnode.nodesize, os.path.getsize(middle))
+        self.assertEqual(zipnode.children[0].name, 'sub')
+
+    def test_index_archives(self):
+        """test archives listed by workers and cached"""
+        workingdir = get_tempdir()
+        self.addCleanup(clean, workingdir)
+        cachedir = os.path.join(workingdir, 'cache')
+        srcdir = create_dir(workingdir, 'src')
+        create_rnd_file(srcdir, 'a')
+        create_rnd_file(srcdir, 'b')
+        dirpath = create_dir(workingdir, 'data')
+        with tarfile.open(os.path.join(dirpath, 'arc.tar.gz'), 'w:gz') as tar:
+            tar.add(srcdir, arcname='src')
+        with zipfile.ZipFile(os.path.join(dirpath, 'arc.zip'), 'w') as zfile:
+            zfile.write(os.path.join(srcdir, 'a'), arcname='a')
+        # not an actual archive
+        create_rnd_file(dirpath, 'bad.tar')
+
+        def index(workers):
+            noder = Noder(arc=True, arcworkers=workers,
+                          arccache=ArchiveCache(cachedir))
+            top = noder.new_top_node()
+            storage = noder.new_storage_node('tmp', dirpath, top, '')
+            Walker(noder, progress=False).index(dirpath, storage, 'tmp')
+            return {x.name: sorted(y.name for y in x.descendants)
+                    for x in storage.children}
+
+        content = index(2)
+        self.assertEqual(content['arc.tar.gz'], ['a', 'b', 'src'])
+        self.assertEqual(content['arc.zip'], ['a'])
+        self.assertEqual(content['bad.tar'], [])
+
+        # unchanged archives are not listed again
+        with mock.patch.object(Decomp, 'get_members') as mod:
+            self.assertEqual(index(0), content)
+            mod.assert_not_called()
+
+        # keyed on the limits, truncated listings are not cached
+        cache = ArchiveCache(cachedir)
+        path = os.path.join(dirpath, 'arc.zip')
+        limits = Decomp().get_limits()
+        listing = cache.get(path, os.path.getsize(path),
+                            os.path.getmtime(path), md5sum(path),
+                            limits=limits)
+        self.assertEqual(len(listing[0]), 1)
+        limits['maxmembers'] = 1
+        self.assertIsNone(cache.get(path, 1, 0.0, '', limits=limits))
+        self.assertFalse(cache.put(path, 1, 0.0, '', ([], 'too many'),
+                                   limits=limits))
+        self.assertTrue(cache.put(path, 1, 0.0, '', ([], ''),
+                                  limits=limits))
+        self.assertIsNotNone(cache.get(path, 1, 0.0, '', limits=limits))
+
+        # unused listings are evicted
+        cnt = len(os.listdir(cachedir))
+        self.assertEqual(ArchiveCache(cachedir).prune(), 0)
+        self.assertEqual(ArchiveCache(cachedir, maxage=-1).prune(), cnt)
+
 
 def main():
     """entry point"""
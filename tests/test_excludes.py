@@ -0,0 +1,97 @@
+"""
+author: deadc0de6 (https://github.com/deadc0de6)
+Copyright (c) 2024, deadc0de6
+
+Basic unittest for the exclude rules
+"""
+
+import os
+import unittest
+
+from catcli.noder import Noder
+from catcli.walker import Walker
+from catcli.excludes import Excludes, IGNOREFILE
+from tests.helpers import create_dir, create_rnd_file, get_tempdir, \
+    clean, write_to_file
+
+
+def get_names(node):
+    """return the relative paths of the nodes under node"""
+    return sorted(os.path.join(*[x.name for x in n.path[2:]])
+                  for n in node.descendants)
+
+
+class TestExcludes(unittest.TestCase):
+    """test the exclude rules"""
+
+    def test_match(self):
+        """test the gitignore-style rules"""
+        excl = Excludes(['# comment', '', '*.o', 'build/', '/top',
+                         'doc/*.txt', '**/cache/**', 'a/**/z',
+                         '!keep.o', 'file[0-9]', '\\!bang'])
+        self.assertEqual(excl.cnt, 9)
+        self.assertTrue(excl.match('x.o'))
+        self.assertTrue(excl.match('sub/dir/x.o'))
+        self.assertFalse(excl.match('keep.o'))
+        self.assertFalse(excl.match('sub/keep.o'))
+        self.assertTrue(excl.match('build', True))
+        self.assertTrue(excl.match('sub/build', True))
+        self.assertFalse(excl.match('build'))
+        self.assertTrue(excl.match('top'))
+        self.assertFalse(excl.match('sub/top'))
+        self.assertTrue(excl.match('doc/a.txt'))
+        self.assertFalse(excl.match('doc/sub/a.txt'))
+        self.assertFalse(excl.match('sub/doc/a.txt'))
+        self.assertTrue(excl.match('x/cache/y'))
+        self.assertFalse(excl.match('x/cache', True))
+        self.assertTrue(excl.match('a/z'))
+        self.assertTrue(excl.match('a/b/c/z'))
+        self.assertTrue(excl.match('file1'))
+        self.assertFalse(excl.match('file12'))
+        self.assertTrue(excl.match('!bang'))
+        self.assertFalse(excl.match('other'))
+        self.assertFalse(Excludes())
+
+    def test_walk(self):
+        """test excluded paths are not indexed"""
+        dirpath = get_tempdir()
+        self.addCleanup(clean, dirpath)
+        write_to_file(os.path.join(dirpath, IGNOREFILE),
+                      'node_modules/\n*.tmp\n')
+        create_rnd_file(dirpath, 'file1')
+        create_rnd_file(dirpath, 'file1.tmp')
+        mods = create_dir(dirpath, 'node_modules')
+        create_rnd_file(mods, 'mod1')
+        git = create_dir(dirpath, '.git')
+        create_rnd_file(git, 'HEAD')
+        sub = create_dir(dirpath, 'sub')
+        create_rnd_file(sub, 'file2')
+        create_rnd_file(sub, 'keep.tmp')
+        create_rnd_file(create_dir(sub, 'node_modules'), 'mod2')
+
+        expected = [IGNOREFILE, 'file1', 'sub', 'sub/file2', 'sub/keep.tmp']
+        patterns = ['.git', '!keep.tmp']
+        for workers in [0, 4]:
+            noder = Noder()
+            top = noder.new_top_node()
+            walker = Walker(noder, usehash=False, progress=False,
+                            workers=workers, patterns=patterns)
+            storage = noder.new_storage_node('storage', dirpath, top, '')
+            walker.index(dirpath, storage, 'storage')
+            self.assertEqual(get_names(storage), expected)
+
+        # previously indexed paths are removed on update
+        walker = Walker(noder, usehash=False, progress=False,
+                        patterns=patterns + ['sub/file2'])
+        walker.reindex(dirpath, storage, top)
+        expected.remove('sub/file2')
+        self.assertEqual(get_names(storage), expected)
+
+
+def main():
+    """entry point"""
+    unittest.main()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,145 @@
+"""
+author: deadc0de6 (https://github.com/deadc0de6)
+Copyright (c) 2024, deadc0de6
+
+Basic unittest for hardlinks and filesystem boundaries
+"""
+
+import os
+import unittest
+
+from catcli.catcli import cmd_index, cmd_update
+from catcli.noder import Noder
+from catcli.walker import Walker
+from catcli.catalog import Catalog
+from catcli import metrics
+from tests.helpers import create_dir, create_rnd_file, get_tempdir, \
+    clean
+
+
+class TestHardlinks(unittest.TestCase):
+    """test hardlinks and filesystem boundaries"""
+
+    def test_hardlinks(self):
+        """test hardlinked files are hashed and counted once"""
+        dirpath = get_tempdir()
+        self.addCleanup(clean, dirpath)
+        orig = create_rnd_file(dirpath, 'a', content='x' * 1000)
+        sub = create_dir(dirpath, 'sub')
+        os.link(orig, os.path.join(sub, 'b'))
+        os.link(orig, os.path.join(sub, 'c'))
+        create_rnd_file(sub, 'd', content='y' * 10)
+
+        for workers in [0, 4]:
+            noder = Noder()
+            top = noder.new_top_node()
+            walker = Walker(noder, usehash=True, progress=False,
+                            workers=workers)
+            storage = noder.new_storage_node('storage', dirpath, top, '')
+            walker.index(dirpath, storage, 'storage')
+            noder.fixsizes(top)
+            self.assertEqual(storage.nodesize, 1010)
+            self.assertEqual(storage.get_rec_size(), 1010)
+            self.assertEqual(noder.metrics.counters[metrics.HASHED], 1010)
+            first = noder.get_node(storage, 'a')
+            self.assertEqual(first.nlink, 3)
+            self.assertFalse(first.has_attr('hardlink'))
+            subnode = noder.get_node(storage, 'sub')
+            self.assertEqual(subnode.nodesize, 10)
+            for name in ['b', 'c']:
+                node = noder.get_node(subnode, name)
+                self.assertEqual(node.nodesize, 1000)
+                self.assertEqual(node.md5, first.md5)
+                self.assertEqual(node.inode, first.inode)
+                self.assertEqual(node.hardlink, 'storage/a')
+
+        # a new link found on update
+        os.link(orig, os.path.join(dirpath, 'e'))
+        noder = Noder()
+        noder.do_hashing(False)
+        walker = Walker(noder, usehash=False, progress=False)
+        walker.reindex(dirpath, storage, top)
+        noder.fixsizes(top)
+        self.assertEqual(noder.get_node(storage, 'e').hardlink, 'storage/a')
+        self.assertEqual(storage.nodesize, 1010)
+
+        # the first link removed, another one is promoted
+        os.remove(orig)
+        noder = Noder()
+        noder.do_hashing(False)
+        walker = Walker(noder, usehash=False, progress=False)
+        walker.reindex(dirpath, storage, top)
+        noder.fixsizes(top)
+        self.assertEqual(storage.nodesize, 1010)
+        subnode = noder.get_node(storage, 'sub')
+        first = noder.get_node(subnode, 'b')
+        self.assertFalse(first.has_attr('hardlink'))
+        self.assertEqual(first.get_rec_size(), 1000)
+        self.assertEqual(noder.get_node(subnode, 'c').hardlink,
+                         'storage/sub/b')
+        self.assertEqual(noder.get_node(storage, 'e').hardlink,
+                         'storage/sub/b')
+
+    def test_storages(self):
+        """test hardlinks across storages are not tracked"""
+        workingdir = get_tempdir()
+        self.addCleanup(clean, workingdir)
+        disk0 = create_dir(workingdir, 'disk0')
+        disk1 = create_dir(workingdir, 'disk1')
+        orig = create_rnd_file(disk0, 'a', content='x' * 1000)
+        os.link(orig, os.path.join(disk1, 'b'))
+        catalogpath = os.path.join(workingdir, 'catalog.json')
+
+        for jobs in [1, 2]:
+            noder = Noder()
+            top = noder.new_top_node()
+            catalog = Catalog(catalogpath, force=True, debug=False)
+            args = {'<name>': 'disk0', '<path>': disk0,
+                    '<pairs>': ['disk1', disk1], '--jobs': str(jobs),
+                    '--hash': False, '--meta': [], '--archive': False,
+                    '--verbose': False}
+            cmd_index(args, noder, catalog, top)
+            top = Catalog(catalogpath).restore()
+            storage = noder.find_storage_node_by_name(top, 'disk1')
+            self.assertFalse(noder.get_node(storage, 'b').has_attr('hardlink'))
+            self.assertEqual(storage.nodesize, 1000)
+
+        # unchanged by an update
+        noder = Noder()
+        catalog = Catalog(catalogpath, force=True, debug=False)
+        args = {'<path>': disk1, '<name>': 'disk1', '--hash': False,
+                '--verbose': False, '--lpath': None}
+        cmd_update(args, noder, catalog, top)
+        top = Catalog(catalogpath).restore()
+        storage = noder.find_storage_node_by_name(top, 'disk1')
+        self.assertEqual(storage.nodesize, 1000)
+
+    def test_onefs(self):
+        """test directories on other filesystems are skipped"""
+        dirpath = get_tempdir()
+        self.addCleanup(clean, dirpath)
+        sub = create_dir(dirpath, 'sub')
+        create_rnd_file(sub, 'file')
+
+        noder = Noder()
+        top = noder.new_top_node()
+        walker = Walker(noder, usehash=False, progress=False, onefs=True)
+        storage = noder.new_storage_node('storage', dirpath, top, '')
+        walker.index(dirpath, storage, 'storage')
+        self.assertEqual(len(storage.descendants), 2)
+        self.assertFalse(walker.other_fs(sub))
+        # as if the storage root was another filesystem
+        walker.device = -1
+        self.assertTrue(walker.other_fs(sub))
+        walker.onefs = False
+        walker.load_storage(dirpath)
+        self.assertFalse(walker.other_fs(sub))
+
+
+def main():
+    """entry point"""
+    unittest.main()
+
+
+if __name__ == '__main__':
+    main()
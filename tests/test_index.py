@@ -7,14 +7,23 @@ Basic unittest for indexing
 
 import os
 import unittest
+from unittest import mock
+
+from anytree.exporter import JsonExporter, DictExporter
 
 from catcli.catcli import cmd_index
 from catcli.noder import Noder
-from catcli.catalog import Catalog
+from catcli.walker import Walker
+from catcli.catalog import Catalog, attriter
 from tests.helpers import get_tempdir, create_rnd_file, clean, \
         get_rnd_string, create_dir
 
 
+def index_failing(*_args, **_kwargs):
+    """an index worker failing"""
+    raise OSError('failing worker')
+
+
 class TestIndexing(unittest.TestCase):
     """test index"""
 
@@ -75,6 +84,88 @@ class TestIndexing(unittest.TestCase):
             elif node.get_name() == os.path.basename(dir2):
                 self.assertTrue(len(node.children) == 1)
 
+    def test_index_multiple(self):
+        """test indexing multiple storages at once"""
+        workingdir = get_tempdir()
+        self.addCleanup(clean, workingdir)
+        catalogpath = os.path.join(workingdir, 'catalog.json')
+        dirs = []
+        for cnt in range(3):
+            dirpath = create_dir(workingdir, f'disk{cnt}')
+            for _ in range(cnt + 1):
+                create_rnd_file(dirpath, get_rnd_string(5))
+            dirs.append(dirpath)
+        manifest = create_rnd_file(workingdir, 'manifest',
+                                   content=f'# a comment\ndisk2  {dirs[2]}\n')
+
+        for jobs in [1, 3]:
+            noder = Noder()
+            top = noder.new_top_node()
+            catalog = Catalog(catalogpath, force=True, debug=False)
+            args = {'<name>': 'disk0', '<path>': dirs[0],
+                    '<pairs>': ['disk1', dirs[1]],
+                    '--manifest': manifest, '--jobs': str(jobs),
+                    '--hash': True, '--meta': [], '--archive': False,
+                    '--verbose': False}
+            cmd_index(args, noder, catalog, top)
+
+            # storages are in the given order with their content
+            names = noder.get_storage_names(top)
+            self.assertEqual(names, ['disk2', 'disk0', 'disk1'])
+            for cnt in range(3):
+                storage = noder.find_storage_node_by_name(top, f'disk{cnt}')
+                self.assertEqual(len(storage.children), cnt + 1)
+                self.assertTrue(all(x.md5 for x in storage.children))
+
+            # saved once with all of them
+            top = Catalog(catalogpath).restore()
+            self.assertEqual(noder.get_storage_names(top), names)
+
+        # storages whose re-indexing failed are kept
+        with mock.patch('catcli.catcli.index_storage', new=index_failing), \
+                mock.patch('catcli.catcli.ask', return_value=True):
+            cmd_index(args, noder, catalog, top)
+        self.assertEqual(noder.get_storage_names(top), names)
+        for cnt in range(3):
+            storage = noder.find_storage_node_by_name(top, f'disk{cnt}')
+            self.assertEqual(len(storage.children), cnt + 1)
+
+    def test_index_workers(self):
+        """test the concurrent directory traversal"""
+        dirpath = get_tempdir()
+        self.addCleanup(clean, dirpath)
+        for _ in range(5):
+            create_rnd_file(dirpath, get_rnd_string(5))
+        for _ in range(3):
+            sub = create_dir(dirpath, get_rnd_string(4))
+            for _ in range(4):
+                create_rnd_file(sub, get_rnd_string(5))
+            subsub = create_dir(sub, get_rnd_string(4))
+            create_rnd_file(subsub, get_rnd_string(5))
+        os.symlink(sub, os.path.join(dirpath, 'link'))
+
+        exp = JsonExporter(dictexporter=DictExporter(attriter=attriter))
+        outs = []
+        for workers in [0, 4]:
+            noder = Noder()
+            top = noder.new_top_node()
+            storage = noder.new_storage_node('tmp', dirpath, top, '')
+            walker = Walker(noder, usehash=True, workers=workers,
+                            progress=False)
+            _, cnt = walker.index(dirpath, storage, 'tmp')
+            self.assertEqual(cnt, 5 + 3 * 7 + 1)
+            mets = noder.metrics.to_dict()
+            self.assertEqual(mets['counters']['files'], 5 + 3 * 5)
+            self.assertEqual(mets['counters']['dirs'], 3 * 2 + 1)
+            self.assertEqual(mets['counters']['bytes_hashed'],
+                             storage.get_rec_size())
+            self.assertIn('walk', mets['timers'])
+            storage.ts = 0
+            storage.free = 0
+            outs.append(exp.export(top))
+        # same tree in the same order
+        self.assertEqual(outs[0], outs[1])
+
 
 def main():
     """entry point"""
@@ -0,0 +1,84 @@
+"""
+author: deadc0de6 (https://github.com/deadc0de6)
+Copyright (c) 2024, deadc0de6
+
+Basic unittest for the jsonl format
+"""
+
+import io
+import json
+import unittest
+from contextlib import redirect_stdout
+
+from catcli.catcli import cmd_ls, cmd_find, cmd_du
+from catcli.noder import Noder
+from catcli.catalog import Catalog
+from tests.helpers import get_fakecatalog
+
+
+class TestJsonl(unittest.TestCase):
+    """test jsonl format"""
+
+    def _run(self, func, args, noder, top):
+        """run command and return parsed lines"""
+        out = io.StringIO()
+        with redirect_stdout(out):
+            found = func(args, noder, top)
+        lines = [json.loads(x) for x in out.getvalue().splitlines()]
+        return found, lines
+
+    def test_jsonl(self):
+        """test jsonl"""
+        # init
+        catalog = Catalog('fake', force=True, debug=False)
+        top = catalog._restore_json(get_fakecatalog())
+        noder = Noder()
+
+        # ls the storage
+        args = {'<path>': '/tmpdir', '--recursive': False,
+                '--verbose': True,
+                '--format': 'jsonl',
+                '--raw-size': False}
+        found, lines = self._run(cmd_ls, args, noder, top)
+        self.assertEqual(len(found), 5)
+        self.assertEqual(len(lines), 5)
+        entry = next(x for x in lines if x['name'] == 'P4C')
+        self.assertEqual(entry['type'], 'dir')
+        self.assertEqual(entry['path'], 'tmpdir/P4C')
+        self.assertEqual(entry['size'], 200)
+        self.assertEqual(entry['nbfiles'], 2)
+        self.assertEqual(entry['storage'], 'tmpdir')
+
+        # whole tree
+        args['<path>'] = ''
+        args['--recursive'] = True
+        _, lines = self._run(cmd_ls, args, noder, top)
+        self.assertEqual(len(lines), 9)
+        self.assertEqual(lines[0]['type'], 'storage')
+        self.assertEqual(lines[0]['free'], 100000000000)
+
+        # find
+        args = {'<term>': '7544G', '--script': False,
+                '--verbose': False, '--directory': False,
+                '--path': None, '--format': 'jsonl',
+                '--raw-size': False}
+        found, lines = self._run(cmd_find, args, noder, top)
+        self.assertEqual(len(found), 1)
+        self.assertEqual(lines, [{'name': '7544G', 'type': 'file',
+                                  'path': 'tmpdir/7544G', 'size': 100,
+                                  'storage': 'tmpdir', 'md5': None}])
+
+        # du
+        args = {'<path>': 'tmpdir', '--format': 'jsonl',
+                '--raw-size': False}
+        _, lines = self._run(cmd_du, args, noder, top)
+        self.assertEqual(sorted(x['name'] for x in lines), ['P4C', 'VNN'])
+
+
+def main():
+    """entry point"""
+    unittest.main()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+"""
+author: deadc0de6 (https://github.com/deadc0de6)
+Copyright (c) 2024, deadc0de6
+
+Basic unittest for the profiler
+"""
+
+import os
+import pstats
+import unittest
+from unittest import mock
+
+from catcli.profiler import Profiler, CPU, MEM
+from tests.helpers import get_tempdir, clean
+
+
+class TestProfiler(unittest.TestCase):
+    """test the profiler"""
+
+    def test_argv(self):
+        """test extracting the profiling options"""
+        with mock.patch.dict(os.environ, clear=True):
+            argv, prof = Profiler.from_argv(['ls', '-r'])
+            self.assertEqual(argv, ['ls', '-r'])
+            self.assertIsNone(prof)
+            argv, prof = Profiler.from_argv(['ls', '--profile', '-r'])
+            self.assertEqual(argv, ['ls', '-r'])
+            self.assertEqual(prof.mode, CPU)
+            self.assertTrue(prof.path)
+            argv, prof = Profiler.from_argv(['--profile-mem=/a/b', 'du'])
+            self.assertEqual(argv, ['du'])
+            self.assertEqual((prof.mode, prof.path), (MEM, '/a/b'))
+            # anywhere before "--"
+            argv, prof = Profiler.from_argv(['find', '-b', '--profile',
+                                             'term', '--profile'])
+            self.assertEqual(argv, ['find', '-b', 'term'])
+            self.assertEqual(prof.mode, CPU)
+            argv, prof = Profiler.from_argv(['ls', '--catalog', '/x',
+                                             '--profile'])
+            self.assertEqual(argv, ['ls', '--catalog', '/x'])
+            self.assertEqual(prof.mode, CPU)
+            argv, prof = Profiler.from_argv(['find', '--', '--profile'])
+            self.assertEqual(argv, ['find', '--', '--profile'])
+            self.assertIsNone(prof)
+        with mock.patch.dict(os.environ, {'CATCLI_PROFILE': '/c'}):
+            argv, prof = Profiler.from_argv(['ls'])
+            self.assertEqual((prof.mode, prof.path), (CPU, '/c'))
+
+    def test_run(self):
+        """test profiling a function"""
+        workingdir = get_tempdir()
+        self.addCleanup(clean, workingdir)
+        path = os.path.join(workingdir, 'cpu')
+        with mock.patch('sys.stderr'):
+            ret = Profiler(CPU, path).run(lambda: sorted(range(10)))
+        self.assertEqual(ret, list(range(10)))
+        self.assertTrue(pstats.Stats(path).total_calls > 0)
+
+        path = os.path.join(workingdir, 'mem')
+        with mock.patch('sys.stderr'):
+            Profiler(MEM, path).run(lambda: [0] * 1000)
+        self.assertTrue(os.path.exists(path))
+
+
+def main():
+    """entry point"""
+    unittest.main()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,61 @@
+"""
+author: deadc0de6 (https://github.com/deadc0de6)
+Copyright (c) 2024, deadc0de6
+
+Basic unittest for the progress reporting
+"""
+
+import io
+import unittest
+from unittest import mock
+
+from catcli.progress import Progress, LINELEN
+
+
+class TestProgress(unittest.TestCase):
+    """test the progress reporting"""
+
+    def test_throttle(self):
+        """test the progress line is throttled"""
+        stream = io.StringIO()
+        prog = Progress(total=1000, rate=1, stream=stream, enabled=True)
+        with mock.patch('time.monotonic', return_value=prog.start + 1):
+            for i in range(10):
+                prog.update(f'file{i}', 10)
+        self.assertEqual(prog.files, 10)
+        self.assertEqual(prog.size, 100)
+        lines = stream.getvalue().split('\r')[:-1]
+        self.assertEqual(len(lines), 1)
+        self.assertTrue(lines[0].startswith('indexing: 1 files'))
+        self.assertIn('ETA', lines[0])
+        self.assertIn('file0', lines[0])
+        self.assertEqual(len(lines[0]), LINELEN)
+
+        # next update once the interval is elapsed
+        with mock.patch('time.monotonic', return_value=prog.start + 2):
+            prog.update('last', 10)
+        lines = stream.getvalue().split('\r')[:-1]
+        self.assertEqual(len(lines), 2)
+        self.assertIn('11 files', lines[1])
+
+        prog.done()
+        lines = stream.getvalue().split('\r')[:-1]
+        self.assertEqual(lines[-1], ' ' * LINELEN)
+
+    def test_disabled(self):
+        """test nothing is printed when disabled"""
+        stream = io.StringIO()
+        prog = Progress(stream=stream)
+        self.assertFalse(prog.enabled)
+        prog.update('file', 10)
+        prog.done()
+        self.assertEqual(stream.getvalue(), '')
+
+
+def main():
+    """entry point"""
+    unittest.main()
+
+
+if __name__ == '__main__':
+    main()
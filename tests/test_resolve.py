@@ -0,0 +1,69 @@
+"""
+author: deadc0de6 (https://github.com/deadc0de6)
+Copyright (c) 2024, deadc0de6
+
+Basic unittest for the path resolution
+"""
+
+import unittest
+
+from anytree.resolver import Resolver, ResolverError, ChildResolverError
+
+from catcli.noder import Noder
+from catcli.catalog import Catalog
+from catcli.nodes import get_child
+from catcli.nodes_utils import resolve, glob
+from tests.helpers import get_fakecatalog, clean
+
+
+class TestResolve(unittest.TestCase):
+    """test the path resolution"""
+
+    def test_resolve(self):
+        """test resolve and glob match anytree's resolver"""
+        path = 'fake'
+        self.addCleanup(clean, path)
+        catalog = Catalog(path, force=True, debug=False)
+        top = catalog._restore_json(get_fakecatalog())
+        storage = top.children[0]
+        resolver = Resolver('name')
+
+        for path in ['/top', '/top/tmpdir', '/top/tmpdir/P4C', 'tmpdir',
+                     'tmpdir/P4C/..', './tmpdir//', '/top/tmpdir/..']:
+            self.assertIs(resolve(top, path), resolver.get(top, path))
+        for path in ['/top/*', '/top/tmpdir/*', '/top/*/P4C/*', '*/?4C',
+                     'tmpdir/**', '/top/**/*.txt', '/top/nope*']:
+            self.assertEqual(glob(top, path), resolver.glob(top, path))
+        for path in ['/top/nope', 'tmpdir/nope', '/top/nope/*']:
+            with self.assertRaises(ChildResolverError):
+                resolve(top, path)
+            with self.assertRaises(ChildResolverError):
+                glob(top, path)
+        for path in ['/', '/other', '/top/..']:
+            with self.assertRaises(ResolverError):
+                resolve(top, path)
+
+        # the children index follows the tree changes
+        noder = Noder()
+        node = noder.new_dir_node('new', '/tmp', storage)
+        self.assertIs(get_child(storage, 'new'), node)
+        node.set_name('renamed')
+        self.assertIsNone(get_child(storage, 'new'))
+        self.assertIs(get_child(storage, 'renamed'), node)
+        node.parent = None
+        self.assertIsNone(get_child(storage, 'renamed'))
+        # renamed without the hooks
+        child = storage.children[0]
+        oldname = child.name
+        child.name = 'other'
+        self.assertIsNone(get_child(storage, oldname))
+        self.assertIs(get_child(storage, 'other'), child)
+
+
+def main():
+    """entry point"""
+    unittest.main()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+"""
+author: deadc0de6 (https://github.com/deadc0de6)
+Copyright (c) 2024, deadc0de6
+
+Basic unittest for the I/O budget
+"""
+
+import os
+import pickle
+import unittest
+from unittest import mock
+
+from catcli.throttle import Throttle, IOLimit
+from catcli.utils import md5sum
+from tests.helpers import get_tempdir, clean, create_rnd_file, \
+    md5sum as helper_md5sum
+
+
+class TestThrottle(unittest.TestCase):
+    """test the I/O budget"""
+
+    def test_throttle(self):
+        """test the token bucket"""
+        with mock.patch('time.monotonic', return_value=100.0), \
+                mock.patch('time.sleep') as sleep:
+            throttle = Throttle(1000)
+            # a second worth is allowed at once
+            self.assertEqual(throttle.consume(1000), 0.0)
+            sleep.assert_not_called()
+            # then the rate applies
+            self.assertAlmostEqual(throttle.consume(500), 0.5)
+            sleep.assert_called_once_with(0.5)
+            self.assertAlmostEqual(throttle.consume(500), 1.0)
+            self.assertAlmostEqual(throttle.waited, 1.5)
+        with mock.patch('time.monotonic', return_value=102.0), \
+                mock.patch('time.sleep'):
+            # the debt was paid back after 2 seconds
+            self.assertEqual(throttle.consume(1), 0.0)
+
+    def test_iolimit(self):
+        """test hashing within a budget"""
+        workingdir = get_tempdir()
+        self.addCleanup(clean, workingdir)
+        path = create_rnd_file(workingdir, 'file', content='x' * 10000)
+        iolimit = IOLimit(maxread=1024, maxstat=10, nocache=True)
+        with mock.patch('time.sleep') as sleep:
+            self.assertEqual(md5sum(path, iolimit=iolimit),
+                             helper_md5sum(path))
+            self.assertTrue(sleep.called)
+        self.assertTrue(iolimit.reads.waited > 0)
+        self.assertIsNone(IOLimit().reads)
+        self.assertEqual(IOLimit().fadvise, False)
+        self.assertEqual(iolimit.fadvise, hasattr(os, 'posix_fadvise'))
+
+        # shared by concurrent processes
+        shared = pickle.loads(pickle.dumps(iolimit.share(4)))
+        self.assertEqual((shared.maxread, shared.maxstat, shared.nocache),
+                         (256, 2.5, True))
+
+
+def main():
+    """entry point"""
+    unittest.main()
+
+
+if __name__ == '__main__':
+    main()
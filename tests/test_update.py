@@ -7,11 +7,13 @@ Basic unittest for updating an index
 
 import unittest
 import os
+import json
 import anytree
+from anytree.exporter import JsonExporter, DictExporter
 
 from catcli.catcli import cmd_index, cmd_update
 from catcli.noder import Noder
-from catcli.catalog import Catalog
+from catcli.catalog import Catalog, attriter
 from tests.helpers import create_dir, create_rnd_file, get_tempdir, \
         clean, unix_tree, edit_file, read_from_file, md5sum
 
@@ -212,6 +214,50 @@ class TestUpdate(unittest.TestCase):
             elif node.get_name() == os.path.basename(new3):
                 self.assertTrue(len(node.children) == 0)
 
+        # sizes are consistent and stable
+        self.assertEqual(storage.nodesize,
+                         sum(x.nodesize for x in storage.children))
+        self.assertFalse(noder.fixsizes(top))
+
+        # nothing changed, the catalog is not rewritten
+        before = os.stat(catalogpath)
+        noder = Noder(debug=True)
+        logpath = os.path.join(workingdir, 'changes.log')
+        args['--lpath'] = logpath
+        cmd_update(args, noder, catalog, top)
+        self.assertFalse(noder.dirty)
+        self.assertFalse(os.path.exists(logpath))
+        after = os.stat(catalogpath)
+        self.assertEqual(before.st_ino, after.st_ino)
+        self.assertEqual(before.st_mtime_ns, after.st_mtime_ns)
+
+        # a new file is appended to the journal
+        new6 = create_rnd_file(dirpath, 'newf6')
+        cmd_update(args, noder, catalog, top)
+        self.assertTrue(noder.dirty)
+        self.assertEqual(os.stat(catalogpath).st_ino, after.st_ino)
+        self.assertTrue(os.path.exists(catalog.journal_path))
+        with open(logpath, 'r', encoding='UTF-8') as file:
+            records = [json.loads(line) for line in file]
+        self.assertEqual([(x['op'], x['path']) for x in records],
+                         [('add', [tmpdirname, 'newf6'])])
+
+        # the journal is replayed on load
+        exp = JsonExporter(dictexporter=DictExporter(attriter=attriter),
+                           sort_keys=True)
+        restored = Catalog(catalogpath).restore()
+        storage = noder.find_storage_node_by_name(restored, tmpdirname)
+        names = [node.name for node in storage.children]
+        self.assertTrue(os.path.basename(new6) in names)
+        self.assertEqual(exp.export(storage),
+                         exp.export(noder.find_storage_node_by_name(
+                             top, tmpdirname)))
+
+        # and compacted into the catalog on save
+        catalog.save(top)
+        self.assertFalse(os.path.exists(catalog.journal_path))
+        self.assertNotEqual(os.stat(catalogpath).st_ino, after.st_ino)
+
 
 def main():
     """entry point"""
@@ -0,0 +1,100 @@
+"""
+author: deadc0de6 (https://github.com/deadc0de6)
+Copyright (c) 2024, deadc0de6
+
+Basic unittest for watching a storage
+"""
+
+import os
+import sys
+import shutil
+import unittest
+
+from catcli.catcli import cmd_index
+from catcli.noder import Noder
+from catcli.catalog import Catalog
+from catcli.watcher import Watcher
+from tests.helpers import create_dir, create_rnd_file, get_tempdir, \
+    clean, edit_file
+
+
+def get_names(node):
+    """return the relative paths of the nodes under node"""
+    return sorted(os.path.join(*[x.name for x in n.path[2:]])
+                  for n in node.descendants)
+
+
+@unittest.skipUnless(sys.platform.startswith('linux'), 'inotify only')
+class TestWatch(unittest.TestCase):
+    """test watch"""
+
+    def test_watch(self):
+        """test changes are applied from the events"""
+        workingdir = get_tempdir()
+        self.addCleanup(clean, workingdir)
+        catalogpath = os.path.join(workingdir, 'catalog.json')
+        dirpath = get_tempdir()
+        self.addCleanup(clean, dirpath)
+
+        file1 = create_rnd_file(dirpath, 'file1')
+        file2 = create_rnd_file(dirpath, 'file2')
+        dir1 = create_dir(dirpath, 'dir1')
+        create_rnd_file(dir1, 'dir1file1')
+        dir2 = create_dir(dirpath, 'dir2')
+        create_rnd_file(dir2, 'dir2file1')
+
+        noder = Noder()
+        top = noder.new_top_node()
+        catalog = Catalog(catalogpath, force=True)
+        args = {'<path>': dirpath, '<name>': 'tmpdir',
+                '--hash': False, '--meta': [],
+                '--verbose': False, '--lpath': None}
+        cmd_index(args, noder, catalog, top)
+        storage = noder.find_storage_node_by_name(top, 'tmpdir')
+
+        noder.journal = catalog.new_journal()
+        watcher = Watcher(noder, catalog, top, storage, dirpath,
+                          delay=60)
+        self.addCleanup(watcher.close)
+        self.assertEqual(len(watcher.wds), 3)
+
+        # changes
+        edit_file(file1, 'edited content')
+        os.remove(file2)
+        create_rnd_file(dir1, 'dir1file2')
+        shutil.rmtree(dir2)
+        new = create_dir(dirpath, 'new')
+        create_rnd_file(create_dir(new, 'sub'), 'subfile')
+        os.rename(dir1, os.path.join(dirpath, 'moved'))
+        create_rnd_file(os.path.join(dirpath, 'moved'), 'dir1file3')
+
+        for _ in range(5):
+            watcher.poll(0.1)
+        self.assertTrue(watcher.pending)
+        self.assertTrue(watcher.flush() > 0)
+        self.assertFalse(watcher.pending)
+
+        expected = ['file1', 'moved', 'moved/dir1file1',
+                    'moved/dir1file2', 'moved/dir1file3',
+                    'new', 'new/sub', 'new/sub/subfile']
+        self.assertEqual(get_names(storage), expected)
+        node = noder.get_node(storage, 'file1')
+        self.assertEqual(node.nodesize, os.path.getsize(file1))
+        self.assertEqual(storage.nodesize,
+                         sum(os.path.getsize(os.path.join(r, f))
+                             for r, _, fs in os.walk(dirpath) for f in fs))
+
+        # the journal holds the changes
+        self.assertTrue(catalog.new_journal().exists())
+        restored = Catalog(catalogpath).restore()
+        storage = noder.find_storage_node_by_name(restored, 'tmpdir')
+        self.assertEqual(get_names(storage), expected)
+
+
+def main():
+    """entry point"""
+    unittest.main()
+
+
+if __name__ == '__main__':
+    main()